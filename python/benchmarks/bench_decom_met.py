@@ -0,0 +1,70 @@
+"""
+Benchmark of the TreeSHAP attribution of `decom_met` (`method='shap'`) against the resampling one.
+
+A LightGBM and an XGBoost model of PM2.5 are trained on the MY1 data shipped with the notebooks. Both
+attribution methods are timed on every model, and their components are compared by their correlation and
+mean absolute difference.
+
+Usage:
+    python benchmarks/bench_decom_met.py [--n-samples 300] [--n-cores 1] [--time-budget 30]
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import normet as nm
+
+
+DATA = os.path.join(os.path.dirname(__file__), '..', 'docs', 'notebooks', 'data', 'MY1.csv')
+FEATURES = ['temp', 'ws', 'wd', 'AT10', 'AP10', 'date_unix', 'day_julian', 'weekday', 'hour']
+
+
+def timed(function):
+    """Wall time of one call of `function`, and its result."""
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+def compare_components(resample, shap):
+    """Correlation and mean absolute difference of every component shared by the two decompositions."""
+    rows = []
+    for column in [col for col in resample.columns if col in shap.columns and col != 'observed']:
+        pair = pd.concat([resample[column], shap[column]], axis=1).dropna()
+        rows.append({'component': column,
+                     'correlation': np.corrcoef(pair.iloc[:, 0], pair.iloc[:, 1])[0, 1],
+                     'mean_abs_diff': (pair.iloc[:, 0] - pair.iloc[:, 1]).abs().mean(),
+                     'resample_std': pair.iloc[:, 0].std()})
+    return pd.DataFrame(rows).set_index('component')
+
+
+def main(n_samples=300, n_cores=1, time_budget=30):
+    my1 = pd.read_csv(DATA, parse_dates=['date'])
+
+    for estimator in ['lgbm', 'xgboost']:
+        df, model = nm.prepare_train_model(my1, 'PM2.5', FEATURES, 'random', 0.75,
+                                           {'time_budget': time_budget, 'estimator_list': [estimator],
+                                            'n_jobs': n_cores, 'verbose': 0},
+                                           seed=7654321, verbose=False)
+
+        resample_time, (resample, _) = timed(lambda: nm.decom_met(df, model=model, feature_names=FEATURES,
+                                                                   n_samples=n_samples, n_cores=n_cores,
+                                                                   method='resample', verbose=False))
+        shap_time, (shap, _) = timed(lambda: nm.decom_met(df, model=model, feature_names=FEATURES,
+                                                           method='shap', verbose=False))
+
+        print(f"\n{estimator}: {len(df)} rows, resample ({n_samples} samples) {resample_time:.2f} s, "
+              f"shap {shap_time:.2f} s, speedup {resample_time / shap_time:.1f}x")
+        print(compare_components(resample, shap).round(3).to_string())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--n-samples', type=int, default=300, help='Number of samples of the resampling method.')
+    parser.add_argument('--n-cores', type=int, default=1, help='Number of cores used for training and resampling.')
+    parser.add_argument('--time-budget', type=int, default=30, help='FLAML time budget of every model, in seconds.')
+    args = parser.parse_args()
+    main(n_samples=args.n_samples, n_cores=args.n_cores, time_budget=args.time_budget)
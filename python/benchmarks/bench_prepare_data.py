@@ -0,0 +1,123 @@
+"""
+Benchmark of `prepare_data` against the row-wise pipeline it replaced.
+
+The MY1 data shipped with the notebooks is repeated along the time axis to build a long hourly series, with
+missing values injected in the target and the features. Both pipelines are timed for every split method and
+their outputs are checked to be identical.
+
+Usage:
+    python benchmarks/bench_prepare_data.py [--repeats 16] [--runs 3]
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import normet as nm
+
+
+DATA = os.path.join(os.path.dirname(__file__), '..', 'docs', 'notebooks', 'data', 'MY1.csv')
+VARIABLES = ['temp', 'ws', 'wd', 'AT10', 'AP10']
+
+
+def rowwise_impute_values(df, na_rm):
+    """Per-column in-place fills of the previous `impute_values`."""
+    if na_rm:
+        df = df.dropna(subset=['value']).reset_index(drop=True)
+    for col in df.select_dtypes(include=[np.number]).columns:
+        df.fillna({col: df[col].median()}, inplace=True)
+    for col in df.select_dtypes(include=['object', 'category']).columns:
+        df.fillna({col: df[col].mode()[0]}, inplace=True)
+    return df
+
+
+def rowwise_add_date_variables(df):
+    """`Series.apply` date variables of the previous `add_date_variables` with `replace=False`."""
+    df['date_unix'] = df['date'].apply(lambda x: x.timestamp())
+    df['day_julian'] = df['date'].apply(lambda x: x.timetuple().tm_yday)
+    df['weekday'] = df['date'].apply(lambda x: x.weekday() + 1).astype('category')
+    df['hour'] = df['date'].apply(lambda x: x.hour)
+    return df
+
+
+def rowwise_split_into_sets(df, split_method, fraction, seed):
+    """Copy-and-concatenate split of the previous `split_into_sets`."""
+    df = df.reset_index().rename(columns={'index': 'rowid'})
+    if split_method == 'random':
+        df_training = df.sample(frac=fraction, random_state=seed).reset_index(drop=True).assign(set='training')
+        df_testing = df[~df['rowid'].isin(df_training['rowid'])].assign(set='testing')
+    elif split_method == 'ts':
+        split_index = int(fraction * len(df))
+        df_training = df.iloc[:split_index].reset_index(drop=True).assign(set='training')
+        df_testing = df.iloc[split_index:].reset_index(drop=True).assign(set='testing')
+    else:
+        month = df['date'].dt.month
+        groups = month.apply(lambda m: (m % 12) // 3) if split_method == 'season' else month
+        training_list, testing_list = [], []
+        for group in sorted(groups.unique()):
+            group_df = df[groups == group]
+            split_index = int(fraction * len(group_df))
+            training_list.append(group_df.iloc[:split_index].reset_index(drop=True).assign(set='training'))
+            testing_list.append(group_df.iloc[split_index:].reset_index(drop=True).assign(set='testing'))
+        df_training = pd.concat(training_list).reset_index(drop=True)
+        df_testing = pd.concat(testing_list).reset_index(drop=True)
+    return pd.concat([df_training, df_testing]).sort_values(by='date').reset_index(drop=True)
+
+
+def rowwise_prepare_data(df, value, feature_names, na_rm=True, split_method='random', fraction=0.75, seed=7654321):
+    """The row-wise `prepare_data` pipeline replaced by the vectorised one."""
+    df = nm.check_data(nm.process_date(df), feature_names, value)
+    df = rowwise_impute_values(df, na_rm)
+    df = rowwise_add_date_variables(df)
+    return rowwise_split_into_sets(df, split_method, fraction, seed)
+
+
+def long_series(repeats):
+    """MY1 repeated `repeats` times one after the other, with missing targets and features."""
+    my1 = pd.read_csv(DATA, parse_dates=['date'])
+    span = my1['date'].max() - my1['date'].min() + pd.Timedelta(hours=1)
+    df = pd.concat([my1.assign(date=my1['date'] + k * span) for k in range(repeats)], ignore_index=True)
+    df.loc[df.index[::13], 'PM2.5'] = np.nan
+    df.loc[df.index[::5], 'temp'] = np.nan
+    df.loc[df.index[::17], 'ws'] = np.nan
+    return df
+
+
+def best_time(function, runs):
+    """Best wall time of `runs` calls of `function`, and its last result."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main(repeats=16, runs=3):
+    df = long_series(repeats)
+    print(f"{len(df)} rows, {len(VARIABLES)} features, best of {runs} runs")
+    print(f"{'split_method':>12} {'row-wise (s)':>13} {'prepare_data (s)':>17} {'speedup':>8} {'identical':>10}")
+
+    for split_method in ['random', 'ts', 'season', 'month']:
+        old_time, expected = best_time(lambda: rowwise_prepare_data(df, 'PM2.5', VARIABLES, split_method=split_method),
+                                       runs)
+        new_time, result = best_time(lambda: nm.prepare_data(df, 'PM2.5', VARIABLES, split_method=split_method), runs)
+
+        result = result.assign(set=result['set'].astype(str))[expected.columns]
+        try:
+            pd.testing.assert_frame_equal(result, expected, check_dtype=False, check_categorical=False)
+            identical = True
+        except AssertionError:
+            identical = False
+
+        print(f"{split_method:>12} {old_time:>13.3f} {new_time:>17.3f} {old_time / new_time:>7.1f}x {str(identical):>10}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeats', type=int, default=16, help='Number of copies of the MY1 series.')
+    parser.add_argument('--runs', type=int, default=3, help='Number of timed runs of each pipeline.')
+    args = parser.parse_args()
+    main(repeats=args.repeats, runs=args.runs)
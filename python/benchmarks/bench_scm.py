@@ -0,0 +1,96 @@
+"""
+Benchmark of the closed-form SCM solver over a synthetic 100-site panel.
+
+Every site of the panel is a mix of a few shared factors plus noise. Every site is treated in turn with all the
+other sites as controls, with three solvers:
+
+- the `GridSearchCV(Ridge())` fit over alphas 0.1 to 10.0 that `scm` used before the closed-form solver,
+- `scm` called for every target, which fits each target with `scm_fit`,
+- `scm_all`, which solves all the targets together with `scm_fit_batch`.
+
+The synthetic series of every solver are compared with the grid search ones.
+
+Usage:
+    python benchmarks/bench_scm.py [--n-sites 100] [--n-days 1096] [--n-cores 1]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import Ridge
+from sklearn.model_selection import GridSearchCV
+
+import normet as nm
+
+
+def synthetic_panel(n_sites=100, n_days=1096, n_factors=4, seed=0):
+    """Long-format daily panel with columns 'date', 'code' and 'poll'."""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2018-01-01', periods=n_days, freq='D')
+    factors = np.cumsum(rng.normal(size=(n_days, n_factors)), axis=0) / 10 + rng.normal(size=(n_days, n_factors))
+    loadings = rng.gamma(2.0, size=(n_factors, n_sites))
+    poll = 20 + factors @ loadings + rng.normal(scale=2.0, size=(n_days, n_sites))
+    codes = [f"S{i:03d}" for i in range(n_sites)]
+    return pd.DataFrame({'date': np.repeat(dates, n_sites), 'code': np.tile(codes, n_days),
+                         'poll': poll.ravel()})
+
+
+def grid_search_scm(df, poll_col, code_col, treat_target, control_pool, cutoff_date):
+    """The `GridSearchCV` fit of the previous `scm`."""
+    pre_treatment_df = df[df['date'] < cutoff_date]
+    x_pre_control = (pre_treatment_df.loc[(pre_treatment_df[code_col] != treat_target) &
+                                          (pre_treatment_df[code_col].isin(control_pool))]
+                     .pivot(index='date', columns=code_col, values=poll_col).values)
+    y_pre_treat_mean = pre_treatment_df.loc[pre_treatment_df[code_col] == treat_target].groupby('date')[poll_col].mean()
+
+    grid_search = GridSearchCV(Ridge(), {'alpha': [i / 10 for i in range(1, 101)]}, cv=5)
+    grid_search.fit(x_pre_control, y_pre_treat_mean.values.reshape(-1, 1))
+    ridge_final = Ridge(alpha=grid_search.best_params_['alpha']).fit(x_pre_control, y_pre_treat_mean.values.reshape(-1, 1))
+
+    sc = (df[(df[code_col] != treat_target) & (df[code_col].isin(control_pool))]
+          .pivot_table(index='date', columns=code_col, values=poll_col).values) @ ridge_final.coef_.flatten()
+    data = df[df[code_col] == treat_target][['date', code_col, poll_col]].assign(
+        synthetic=sc + ridge_final.intercept_.item()).set_index('date')
+    data['effects'] = data[poll_col] - data['synthetic']
+    return data
+
+
+def timed(function):
+    """Wall time of one call of `function`, and its result."""
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+def main(n_sites=100, n_days=1096, n_cores=1):
+    df = synthetic_panel(n_sites=n_sites, n_days=n_days)
+    codes = list(df['code'].unique())
+    cutoff_date = str(df['date'].iloc[int(len(df) * 2 / 3)].date())
+    print(f"{n_sites} sites x {n_days} days, cutoff {cutoff_date}, {n_sites - 1} controls per target")
+
+    solvers = {
+        'GridSearchCV': lambda: pd.concat([grid_search_scm(df, 'poll', 'code', code, codes, cutoff_date)
+                                           for code in codes]),
+        'scm per target': lambda: pd.concat([nm.scm(df, 'poll', 'code', code, codes, cutoff_date)
+                                             for code in codes]),
+        'scm_all': lambda: nm.scm_all(df, 'poll', 'code', codes, cutoff_date, n_cores=n_cores),
+    }
+
+    results = {}
+    print(f"{'solver':>15} {'time (s)':>9} {'speedup':>8} {'max |synthetic diff|':>21}")
+    for name, solver in solvers.items():
+        elapsed, result = timed(solver)
+        results[name] = (elapsed, result.reset_index().set_index(['code', 'date'])['synthetic'].sort_index())
+        reference_time, reference = results['GridSearchCV']
+        difference = (results[name][1] - reference).abs().max()
+        print(f"{name:>15} {elapsed:>9.2f} {reference_time / elapsed:>7.1f}x {difference:>21.2e}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--n-sites', type=int, default=100, help='Number of sites of the panel.')
+    parser.add_argument('--n-days', type=int, default=1096, help='Number of days of the panel.')
+    parser.add_argument('--n-cores', type=int, default=1, help='Number of cores used by scm_all.')
+    args = parser.parse_args()
+    main(n_sites=args.n_sites, n_days=args.n_days, n_cores=args.n_cores)
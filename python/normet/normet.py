@@ -4,13 +4,23 @@ from datetime import datetime
 from random import sample
 from scipy import stats
 from flaml import AutoML
-from joblib import Parallel, delayed
+from joblib import Parallel, delayed, effective_n_jobs
 import statsmodels.api as sm
-from sklearn.inspection import partial_dependence
-from sklearn.linear_model import Ridge
-from sklearn.model_selection import GridSearchCV
+from sklearn.model_selection import KFold, TimeSeriesSplit
+from sklearn.neighbors import BallTree
 import os
 import time
+import warnings
+import json
+import weakref
+import shutil
+import tempfile
+import uuid
+import pickle
+import hashlib
+from collections import OrderedDict
+from itertools import chain
+from contextlib import contextmanager
 
 
 def prepare_data(df, value, feature_names, na_rm=True, split_method='random', replace=False, fraction=0.75, seed=7654321):
@@ -146,15 +156,18 @@ def impute_values(df, na_rm):
     """
     # Remove missing values if na_rm is True
     if na_rm:
-        df = df.dropna(subset=['value']).reset_index(drop=True)
+        df = df[df['value'].notna().to_numpy()].reset_index(drop=True)
 
-    # Impute missing values for numeric variables
-    for col in df.select_dtypes(include=[np.number]).columns:
-        df.fillna({col: df[col].median()}, inplace=True)
+    # Fill values: medians of numeric variables, modes of character and categorical variables
+    numeric = [col for col in df.select_dtypes(include=[np.number]).columns if df[col].hasnans]
+    categorical = [col for col in df.select_dtypes(include=['object', 'category']).columns if df[col].hasnans]
+    fill_values = df[numeric].median().to_dict() if numeric else {}
+    if categorical:
+        fill_values.update(df[categorical].mode().iloc[0].to_dict())
 
-    # Impute missing values for character and categorical variables
-    for col in df.select_dtypes(include=['object', 'category']).columns:
-        df.fillna({col: df[col].mode()[0]}, inplace=True)
+    # Impute all the columns in a single call
+    if fill_values:
+        df = df.fillna(fill_values)
 
     return df
 
@@ -170,26 +183,25 @@ def add_date_variables(df, replace):
     Returns:
         DataFrame: DataFrame with added date-related variables.
     """
-    if replace:
-        # Replace existing date-related variables if they exist
-        df['date_unix'] = df['date'].astype(np.int64) // 10**9
-        df['day_julian'] = pd.DatetimeIndex(df['date']).dayofyear
-        df['weekday'] = pd.DatetimeIndex(df['date']).weekday + 1
-        df['weekday'] = df['weekday'].astype("category")
-        df['hour'] = pd.DatetimeIndex(df['date']).hour
-    else:
-        # Add date-related variables only if they don't already exist
-        if 'date_unix' not in df.columns:
-            df['date_unix'] = df['date'].apply(lambda x: x.timestamp())
-        if 'day_julian' not in df.columns:
-            df['day_julian'] = df['date'].apply(lambda x: x.timetuple().tm_yday)
-        if 'weekday' not in df.columns:
-            df['weekday'] = df['date'].apply(lambda x: x.weekday() + 1)
-            df['weekday'] = df['weekday'].astype("category")
-        if 'hour' not in df.columns:
-            df['hour'] = df['date'].apply(lambda x: x.hour)
-
-    return df
+    dates = pd.DatetimeIndex(df['date'])
+    missing = [var for var in ['date_unix', 'day_julian', 'weekday', 'hour'] if replace or var not in df.columns]
+    if not missing:
+        return df
+
+    # Derive the variables in one vectorised pass over the int64 timestamps (UTC nanoseconds)
+    variables = {}
+    if 'date_unix' in missing:
+        nanoseconds = dates.as_unit('ns').asi8
+        # Whole seconds when replacing, otherwise fractional seconds like `Timestamp.timestamp()`
+        variables['date_unix'] = nanoseconds // 10**9 if replace else np.round(nanoseconds / 10**9, 6)
+    if 'day_julian' in missing:
+        variables['day_julian'] = dates.dayofyear.to_numpy(dtype=np.int64)
+    if 'weekday' in missing:
+        variables['weekday'] = pd.Categorical(dates.weekday.to_numpy(dtype=np.int64) + 1)
+    if 'hour' in missing:
+        variables['hour'] = dates.hour.to_numpy(dtype=np.int64)
+
+    return df.assign(**variables)
 
 
 def split_into_sets(df, split_method, fraction, seed):
@@ -205,78 +217,64 @@ def split_into_sets(df, split_method, fraction, seed):
 
     Returns:
         DataFrame: DataFrame with a 'set' column indicating the training or testing set.
+
+    Notes:
+        The rows keep their order. The split is computed as a boolean mask and exposed as a categorical 'set'
+        column with the categories 'training' and 'testing', see `set_mask`. 'season' and 'month' take the first
+        `fraction` of the rows of each season or month.
     """
-    # Add row number
-    df = df.reset_index().rename(columns={'index': 'rowid'})
+    n_rows = len(df)
 
     if split_method == 'random':
-        # Sample to get training set
-        df_training = df.sample(frac=fraction, random_state=seed).reset_index(drop=True).assign(set="training")
-        # Remove training set from input to get testing set
-        df_testing = df[~df['rowid'].isin(df_training['rowid'])].assign(set="testing")
+        # Same rows as sampling the DataFrame itself
+        training = np.zeros(n_rows, dtype=bool)
+        training[pd.RangeIndex(n_rows).to_series().sample(frac=fraction, random_state=seed).to_numpy()] = True
 
     elif split_method == 'ts':
         # Time series split
-        split_index = int(fraction * len(df))
-        df_training = df.iloc[:split_index].reset_index(drop=True).assign(set="training")
-        df_testing = df.iloc[split_index:].reset_index(drop=True).assign(set="testing")
-
-    elif split_method == 'season':
-        # Function to map month to season
-        def get_season(month):
-            if month in [12, 1, 2]:
-                return 'DJF'
-            elif month in [3, 4, 5]:
-                return 'MAM'
-            elif month in [6, 7, 8]:
-                return 'JJA'
-            else:
-                return 'SON'
-
-        df['season'] = df['date'].dt.month.apply(get_season)
-
-        df_training_list = []
-        df_testing_list = []
+        training = np.arange(n_rows) < int(fraction * n_rows)
 
-        for season in ['DJF', 'MAM', 'JJA', 'SON']:
-            season_df = df[df['season'] == season]
-            split_index = int(fraction * len(season_df))
-            season_training = season_df.iloc[:split_index].reset_index(drop=True).assign(set="training")
-            season_testing = season_df.iloc[split_index:].reset_index(drop=True).assign(set="testing")
+    elif split_method in ('season', 'month'):
+        month = pd.DatetimeIndex(df['date']).month.to_numpy()
+        # Seasons DJF, MAM, JJA and SON, or the months themselves
+        groups = (month % 12) // 3 if split_method == 'season' else month
 
-            df_training_list.append(season_training)
-            df_testing_list.append(season_testing)
+        # Rank of every row within its group and the number of training rows of the group
+        rank = pd.Series(groups).groupby(groups).cumcount().to_numpy()
+        sizes = np.bincount(groups, minlength=13)
+        training = rank < (fraction * sizes).astype(np.int64)[groups]
 
-        df_training = pd.concat(df_training_list).reset_index(drop=True)
-        df_testing = pd.concat(df_testing_list).reset_index(drop=True)
-
-    elif split_method == 'month':
-        # Extract month from date column
-        df['month'] = df['date'].dt.month
+    else:
+        raise ValueError("`split_method` must be one of 'random', 'ts', 'season' or 'month'.")
 
-        df_training_list = []
-        df_testing_list = []
+    df_split = df.assign(set=pd.Categorical.from_codes(np.where(training, 0, 1).astype(np.int8),
+                                                       categories=['training', 'testing']))
+    df_split.insert(0, 'rowid', df.index.to_numpy())
 
-        # Iterate over each month
-        for month in range(1, 13):
-            month_df = df[df['month'] == month]
-            split_index = int(fraction * len(month_df))
-            month_training = month_df.iloc[:split_index].reset_index(drop=True).assign(set="training")
-            month_testing = month_df.iloc[split_index:].reset_index(drop=True).assign(set="testing")
+    return df_split.reset_index(drop=True)
 
-            df_training_list.append(month_training)
-            df_testing_list.append(month_testing)
 
-        df_training = pd.concat(df_training_list).reset_index(drop=True)
-        df_testing = pd.concat(df_testing_list).reset_index(drop=True)
+def set_mask(df, set_name='training'):
+    """
+    Returns the boolean mask of the rows of a prepared DataFrame belonging to a set.
 
-    # Combine training and testing sets
-    df_split = pd.concat([df_training, df_testing]).sort_values(by='date').reset_index(drop=True)
+    Parameters:
+        df (pandas.DataFrame): DataFrame with a 'set' column, see `split_into_sets`.
+        set_name (str, optional): Name of the set. Default is 'training'.
 
-    return df_split
+    Returns:
+        numpy.ndarray: Boolean mask of the rows of the set.
+    """
+    sets = df['set']
+    if isinstance(sets.dtype, pd.CategoricalDtype):
+        if set_name not in sets.cat.categories:
+            return np.zeros(len(df), dtype=bool)
+        return sets.cat.codes.to_numpy() == sets.cat.categories.get_loc(set_name)
+    return (sets == set_name).to_numpy()
 
 
-def train_model(df, value='value', variables=None, model_config=None, seed=7654321, verbose=True):
+def train_model(df, value='value', variables=None, model_config=None, seed=7654321, verbose=True, warm_start=None,
+                fixed_config=False):
     """
     Trains a machine learning model using the provided dataset and parameters.
 
@@ -289,12 +287,18 @@ def train_model(df, value='value', variables=None, model_config=None, seed=76543
         model_config (dict, optional): Configuration dictionary for model training parameters.
         seed (int, optional): Random seed for reproducibility. Default is 7654321.
         verbose (bool, optional): If True, print progress messages. Default is True.
+        warm_start (object or dict, optional): Trained AutoML model, or mapping of estimator name to config such as
+                                               its `best_config_per_estimator`, whose configs are used as the
+                                               `starting_points` of the search. Default is None.
+        fixed_config (bool, optional): If True, skip the search and fit the best estimator of `warm_start` once with
+                                       its config. Default is False.
 
     Returns:
         object: Trained ML model object.
 
     Raises:
-        ValueError: If `variables` contains duplicates or if any `variables` are not present in the DataFrame.
+        ValueError: If `variables` contains duplicates or if any `variables` are not present in the DataFrame,
+                    or if `fixed_config` is set without a single best estimator in `warm_start`.
     """
 
     # Check for duplicate variables
@@ -307,11 +311,57 @@ def train_model(df, value='value', variables=None, model_config=None, seed=76543
 
     # Extract relevant data for training
     if 'set' in df.columns:
-        df_train = df[df['set'] == 'training'][[value] + variables]
+        df_train = df[[value] + variables][set_mask(df, 'training')]
     else:
         df_train = df[[value] + variables]
 
-    # Default configuration for model training
+    # Default configuration for model training, updated with user-provided config
+    default_model_config = merge_model_config(model_config, verbose)
+
+    # Start the search from the configs of a previous search, or fit the best one only
+    if fixed_config and warm_start is None:
+        raise ValueError("`fixed_config` requires a `warm_start` model or configs.")
+    if warm_start is not None:
+        starting_points = {estimator: config for estimator, config in
+                           getattr(warm_start, 'best_config_per_estimator', warm_start).items() if config is not None}
+        if fixed_config:
+            estimator = getattr(warm_start, 'best_estimator', None)
+            if estimator is None and len(starting_points) == 1:
+                estimator = next(iter(starting_points))
+            if estimator not in starting_points:
+                raise ValueError("`fixed_config` requires a single best estimator in `warm_start`.")
+            default_model_config.update(estimator_list=[estimator], max_iter=1, time_budget=-1)
+        estimator_list = default_model_config['estimator_list']
+        default_model_config['starting_points'] = {estimator: config for estimator, config in starting_points.items()
+                                                   if estimator_list == 'auto' or estimator in estimator_list}
+
+    # Initialize and train AutoML model
+    model = AutoML()
+    if verbose:
+        print(pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'),
+              ": Training AutoML..." if not fixed_config else ": Fitting AutoML with a fixed config...")
+
+    model.fit(X_train=df_train[variables], y_train=df_train[value],
+                **default_model_config, seed=seed)
+
+    if verbose:
+        print(pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'), ": Best model is",
+            model.best_estimator, "with best model parameters of", model.best_config)
+
+    return model
+
+
+def merge_model_config(model_config=None, verbose=True):
+    """
+    Returns the default AutoML configuration of `train_model` updated with a user-provided config.
+
+    Parameters:
+        model_config (dict, optional): Configuration dictionary for model training parameters. Default is None.
+        verbose (bool, optional): Whether FLAML prints progress messages. Default is True.
+
+    Returns:
+        dict: Merged configuration.
+    """
     default_model_config = {
         'time_budget': 90,                     # Total running time in seconds
         'metric': 'r2',                        # Primary metric for regression, 'mae', 'mse', 'r2', 'mape',...
@@ -321,140 +371,1434 @@ def train_model(df, value='value', variables=None, model_config=None, seed=76543
         'verbose': verbose                     # Print progress messages
     }
 
-    # Update default configuration with user-provided config
-    if model_config is not None:
-        default_model_config.update(model_config)
+    if model_config is not None:
+        default_model_config.update(model_config)
+
+    return default_model_config
+
+
+def prepare_train_model(df, value, feature_names, split_method, fraction, model_config, seed, verbose=True,
+                        warm_start=None, fixed_config=False):
+    """
+    Prepares the data and trains a machine learning model using the specified configuration.
+
+    Parameters:
+        df (pandas.DataFrame): The input DataFrame containing the data to be used for training.
+        value (str): The name of the target variable to be predicted.
+        feature_names (list of str): A list of feature column names to be used in the training.
+        split_method (str): The method to split the data ('random' or other supported methods).
+        fraction (float): The fraction of data to be used for training.
+        model_config (dict): The configuration dictionary for the AutoML model training.
+        seed (int): The random seed for reproducibility.
+        verbose (bool, optional): If True, print progress messages. Default is True.
+        warm_start (object or dict, optional): Model or configs to warm-start the search from, see `train_model`.
+                                               Default is None.
+        fixed_config (bool, optional): Whether to fit the best config of `warm_start` without searching.
+                                       Default is False.
+
+    Returns:
+        tuple:
+            - pd.DataFrame: The prepared DataFrame ready for model training.
+            - object: The trained machine learning model.
+
+    Raises:
+        ValueError: If there are any issues with the data preparation or model training.
+
+    Example:
+        >>> data = {
+        ...     'feature1': [1, 2, 3, 4, 5],
+        ...     'feature2': [5, 4, 3, 2, 1],
+        ...     'target': [2, 3, 4, 5, 6],
+        ...     'set': ['training', 'training', 'training', 'testing', 'testing']
+        ... }
+        >>> df = pd.DataFrame(data)
+        >>> feature_names = ['feature1', 'feature2']
+        >>> split_method = 'random'
+        >>> fraction = 0.75
+        >>> model_config = {'time_budget': 90, 'metric': 'r2'}
+        >>> seed = 7654321
+        >>> df_prepared, model = prepare_train_model(df, value='target', feature_names=feature_names, split_method=split_method, fraction=fraction, model_config=model_config, seed=seed, verbose=True)
+    """
+
+    vars = list(set(feature_names) - set(['date_unix', 'day_julian', 'weekday', 'hour']))
+
+    # Prepare the data
+    df = prepare_data(df, value=value, feature_names=vars, split_method=split_method, fraction=fraction, seed=seed)
+
+    # Train the model using AutoML
+    model = train_model(df, value='value', variables=feature_names, model_config=model_config, seed=seed, verbose=verbose,
+                        warm_start=warm_start, fixed_config=fixed_config)
+
+    return df, model
+
+
+_model_cache_stats = {'hits': 0, 'misses': 0}
+
+
+def model_cache_key(df, feature_names, split_method, fraction, model_config, seed):
+    """
+    Computes the content hash identifying a trained model in the on-disk model cache.
+
+    The key covers the prepared training data (values, dtypes and column names, in sorted column order),
+    the feature names, the split, the merged model configuration without its execution-only settings
+    ('verbose', 'n_jobs'), and the seed.
+
+    Parameters:
+        df (pandas.DataFrame): Prepared DataFrame from `prepare_data`.
+        feature_names (list of str): Feature names of the model.
+        split_method (str): Method used to split the data.
+        fraction (float): Fraction of data used for training.
+        model_config (dict): Configuration dictionary for model training parameters.
+        seed (int): Random seed.
+
+    Returns:
+        str: Hexadecimal SHA-256 key.
+    """
+    df = df[sorted(df.columns)]
+    config = {key: val for key, val in merge_model_config(model_config).items() if key not in ('verbose', 'n_jobs')}
+
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    digest.update(json.dumps({
+        'columns': [str(col) for col in df.columns],
+        'dtypes': [str(dtype) for dtype in df.dtypes],
+        'feature_names': list(feature_names),
+        'split_method': split_method,
+        'fraction': fraction,
+        'model_config': config,
+        'seed': int(seed)
+    }, sort_keys=True, default=str).encode())
+
+    return digest.hexdigest()
+
+
+def cached_prepare_train_model(df, value, feature_names, split_method, fraction, model_config, seed, verbose=True,
+                               cache_dir=None, max_models=None, max_bytes=None):
+    """
+    Prepares the data and trains a model like `prepare_train_model`, reusing a model cached on disk when possible.
+
+    Models are stored with their `modStats` output in `cache_dir` under the key of `model_cache_key`. Files
+    are written atomically, reading a model marks it as recently used, and the least recently used models
+    are evicted when the cache holds more than `max_models` models or `max_bytes` bytes.
+
+    Parameters:
+        df (pandas.DataFrame): The input DataFrame containing the data to be used for training.
+        value (str): The name of the target variable to be predicted.
+        feature_names (list of str): A list of feature column names to be used in the training.
+        split_method (str): The method to split the data ('random' or other supported methods).
+        fraction (float): The fraction of data to be used for training.
+        model_config (dict): The configuration dictionary for the AutoML model training.
+        seed (int): The random seed for reproducibility.
+        verbose (bool, optional): If True, print progress messages. Default is True.
+        cache_dir (str, optional): Directory of the model cache. If None, the model is trained without caching.
+                                   Default is None.
+        max_models (int, optional): Maximum number of models kept in the cache. Default is None (no limit).
+        max_bytes (int, optional): Maximum total size of the cache in bytes. Default is None (no limit).
+
+    Returns:
+        tuple:
+            - pd.DataFrame: The prepared DataFrame.
+            - object: The trained machine learning model.
+            - pd.DataFrame: The model statistics from `modStats`.
+    """
+    if cache_dir is None:
+        df, model = prepare_train_model(df, value, feature_names, split_method, fraction, model_config, seed, verbose)
+        return df, model, modStats(df, model)
+
+    vars = list(set(feature_names) - set(['date_unix', 'day_julian', 'weekday', 'hour']))
+    df = prepare_data(df, value=value, feature_names=vars, split_method=split_method, fraction=fraction, seed=seed)
+
+    key = model_cache_key(df, feature_names, split_method, fraction, model_config, seed)
+    entry = read_model_cache(cache_dir, key, verbose=verbose)
+    if entry is not None:
+        return df, entry['model'], entry['mod_stats']
+
+    model = train_model(df, value='value', variables=feature_names, model_config=model_config, seed=seed, verbose=verbose)
+    mod_stats = modStats(df, model)
+    write_model_cache(cache_dir, key, {'model': model, 'mod_stats': mod_stats}, max_models=max_models,
+                      max_bytes=max_bytes)
+
+    return df, model, mod_stats
+
+
+def read_model_cache(cache_dir, key, min_time_budget=None, verbose=True):
+    """
+    Reads an entry of the on-disk model cache and marks it as recently used.
+
+    Parameters:
+        cache_dir (str): Directory of the model cache.
+        key (str): Key of the entry, see `model_cache_key`.
+        min_time_budget (float, optional): Smallest time budget of a reusable entry. Entries trained with a shorter
+                                           'time_budget' are treated as not cached. Default is None (any entry).
+        verbose (bool, optional): If True, print progress messages. Default is True.
+
+    Returns:
+        dict or None: The cached entry with its 'model', or None when the key is not cached.
+    """
+    path = os.path.join(cache_dir, key + '.pkl')
+
+    try:
+        with open(path, 'rb') as f:
+            entry = pickle.load(f)
+        os.utime(path)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        entry = None
+
+    if not isinstance(entry, dict) or 'model' not in entry:
+        _model_cache_stats['misses'] += 1
+        return None
+
+    if min_time_budget is not None and entry.get('time_budget', 0) < min_time_budget:
+        _model_cache_stats['misses'] += 1
+        if verbose:
+            print(pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'), ": The cached model", key[:12],
+                  "was trained with a time budget of", entry.get('time_budget'), "s, retraining...")
+        return None
+
+    _model_cache_stats['hits'] += 1
+    if verbose:
+        print(pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'), ": Loaded the cached model", key[:12])
+    return entry
+
+
+def write_model_cache(cache_dir, key, entry, max_models=None, max_bytes=None):
+    """
+    Writes an entry to the on-disk model cache atomically, then evicts the least recently used entries.
+
+    Parameters:
+        cache_dir (str): Directory of the model cache.
+        key (str): Key of the entry, see `model_cache_key`.
+        entry (dict): Entry holding the 'model'.
+        max_models (int, optional): Maximum number of models kept in the cache. Default is None (no limit).
+        max_bytes (int, optional): Maximum total size of the cache in bytes. Default is None (no limit).
+
+    Returns:
+        str: Path of the entry.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, key + '.pkl')
+
+    # Write to a temporary file in the cache directory, then move it into place in one step
+    fd, temp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    evict_model_cache(cache_dir, max_models=max_models, max_bytes=max_bytes, keep=path)
+
+    return path
+
+
+def evict_model_cache(cache_dir, max_models=None, max_bytes=None, keep=None):
+    """
+    Removes the least recently used models from the on-disk model cache until it fits its limits.
+
+    Parameters:
+        cache_dir (str): Directory of the model cache.
+        max_models (int, optional): Maximum number of models kept. Default is None (no limit).
+        max_bytes (int, optional): Maximum total size in bytes. Default is None (no limit).
+        keep (str, optional): Path of a model that is never evicted. Default is None.
+
+    Returns:
+        list of str: Paths of the evicted models.
+    """
+    entries = model_cache_report(cache_dir)
+    evicted = []
+    n_models, n_bytes = len(entries), entries['bytes'].sum()
+
+    for path, size in zip(entries['path'], entries['bytes']):
+        if (max_models is None or n_models <= max_models) and (max_bytes is None or n_bytes <= max_bytes):
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        evicted.append(path)
+        n_models, n_bytes = n_models - 1, n_bytes - size
+
+    return evicted
+
+
+def model_cache_report(cache_dir):
+    """
+    Lists the models of the on-disk model cache, least recently used first.
+
+    Parameters:
+        cache_dir (str): Directory of the model cache.
+
+    Returns:
+        pd.DataFrame: One row per model with its 'key', 'path', size in 'bytes' and 'last_used' time. The numbers
+                      of cache 'hits' and 'misses' of the current process are given in `attrs`.
+    """
+    paths = [os.path.join(cache_dir, name) for name in os.listdir(cache_dir) if name.endswith('.pkl')] \
+        if os.path.isdir(cache_dir) else []
+    stats = [os.stat(path) for path in paths]
+
+    report = pd.DataFrame({
+        'key': [os.path.basename(path)[:-4] for path in paths],
+        'path': paths,
+        'bytes': np.array([stat.st_size for stat in stats], dtype=np.int64),
+        'last_used': pd.to_datetime([stat.st_mtime for stat in stats], unit='s')
+    }).sort_values('last_used', kind='stable').reset_index(drop=True)
+    report.attrs.update(_model_cache_stats)
+
+    return report
+
+
+def normalise_worker(index, df, model, variables_resample, replace, seed, verbose, weather_df=None):
+    """
+    Worker function for parallel normalisation of data using randomly resampled meteorological parameters
+    from another weather DataFrame within its date range. If no weather DataFrame is provided,
+    it defaults to using the input DataFrame.
+
+    Parameters:
+        index (int): Index of the worker.
+        df (pandas.DataFrame): Input DataFrame containing the dataset.
+        model (ML): Trained ML model.
+        variables_resample (list of str): List of resampling variables.
+        replace (bool): Whether to sample with replacement.
+        seed (int): Random seed of the sample, e.g. one of `spawn_seeds`. The draws are the same as those of
+                    `generate_resample_indices` for this seed.
+        verbose (bool): Whether to print progress messages.
+        weather_df (pandas.DataFrame, optional): Weather DataFrame containing the meteorological parameters.
+                                             Defaults to None.
+
+    Returns:
+        pd.DataFrame: DataFrame containing normalised predictions.
+    """
+    if weather_df is None:
+        weather_df = df
+
+    # Print progress message every fifth prediction if verbose is enabled
+    if verbose and index % 5 == 0:
+        # Calculate and format the progress percentage
+        message_percent = round((index / len(df)) * 100, 2)
+        message_percent = "{:.1f} %".format(message_percent)
+        print(pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'),
+              ": Predicting", index, "of", len(df), "times (", message_percent, ")...")
+
+    # Draw the weather rows from the sample's own generator, leaving the global random state untouched
+    index_rows = generate_resample_indices(len(df), len(weather_df), [seed], replace)[0]
+
+    # Resample the specified variables on a copy of the input DataFrame
+    df = df.copy()
+    for var in variables_resample:
+        df[var] = weather_df[var].to_numpy()[index_rows]
+
+    # Predict values using the model
+    value_predict = model.predict(df)
+
+    # Build a DataFrame containing the predictions along with the original dates, observed values, and seed
+    predictions = pd.DataFrame({
+        'date': df['date'],
+        'observed': df['value'],
+        'normalised': value_predict,
+        'seed': seed
+    })
+
+    return predictions
+
+
+def encode_features(df, columns, categories=None):
+    """
+    Encodes the selected columns of a DataFrame into a contiguous float block.
+
+    Categorical columns are stored as their integer codes so that the block can be gathered with NumPy
+    fancy indexing and decoded back into a DataFrame with `decode_features`.
+
+    Parameters:
+        df (pandas.DataFrame): Input DataFrame containing the dataset.
+        columns (list of str): Columns to encode, in the order of the block.
+        categories (dict, optional): Mapping of column name to categories. Columns listed here are encoded
+                                     against these categories. Default is None.
+
+    Returns:
+        tuple:
+            - numpy.ndarray: Float64 array of shape (len(df), len(columns)).
+            - dict: Mapping of categorical column name to its categories.
+    """
+    categories = dict(categories) if categories is not None else {}
+    block = np.empty((len(df), len(columns)), dtype=np.float64)
+
+    for j, col in enumerate(columns):
+        values = df[col]
+        if col in categories:
+            block[:, j] = pd.Categorical(values, categories=categories[col]).codes
+        elif isinstance(values.dtype, pd.CategoricalDtype):
+            categories[col] = values.cat.categories
+            block[:, j] = values.cat.codes
+        else:
+            block[:, j] = values.to_numpy(dtype=np.float64, na_value=np.nan)
+
+    return block, categories
+
+
+def decode_features(block, columns, categories):
+    """
+    Decodes a float block produced by `encode_features` back into a DataFrame.
+
+    Parameters:
+        block (numpy.ndarray): Float array of shape (n_rows, len(columns)).
+        columns (list of str): Column names of the block.
+        categories (dict): Mapping of categorical column name to its categories.
+
+    Returns:
+        pd.DataFrame: DataFrame with categorical columns restored.
+    """
+    data = {}
+    for j, col in enumerate(columns):
+        if col in categories:
+            data[col] = pd.Categorical.from_codes(block[:, j].astype(np.int64), categories=categories[col])
+        else:
+            data[col] = block[:, j]
+
+    return pd.DataFrame(data, columns=columns)
+
+
+@contextmanager
+def shared_folder(temp_folder=None):
+    """
+    Context manager providing a temporary folder for arrays shared with parallel workers.
+
+    The folder is created in `temp_folder`, or in the RAM-backed /dev/shm when it is available with at least
+    2 GB free, and is removed with everything published into it when the context exits.
+
+    Parameters:
+        temp_folder (str, optional): Parent directory of the temporary folder. Default is None.
+
+    Yields:
+        str: Path of the temporary folder.
+    """
+    if temp_folder is None and os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        shm_stats = os.statvfs('/dev/shm')
+        if shm_stats.f_bavail * shm_stats.f_frsize >= 2e9:
+            temp_folder = '/dev/shm'
+    folder = tempfile.mkdtemp(prefix='normet_', dir=temp_folder)
+    try:
+        yield folder
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def share_array(array, folder, dtype=None):
+    """
+    Publishes an array as a memory-mapped .npy file so that workers can attach it without copies.
+
+    Parameters:
+        array (numpy.ndarray): Array to publish.
+        folder (str): Folder created by `shared_folder`.
+        dtype (numpy.dtype, optional): Data type to store the array as, e.g. np.float32. Default is None.
+
+    Returns:
+        dict: Handle of the shared array, to be passed to `load_shared` in the workers.
+    """
+    path = os.path.join(folder, f"{uuid.uuid4().hex}.npy")
+    np.save(path, np.ascontiguousarray(array, dtype=dtype))
+    return {'path': path}
+
+
+def share_frame(df, columns, folder, categories=None, dtype=None):
+    """
+    Publishes the selected columns of a DataFrame as a single shared float block.
+
+    Parameters:
+        df (pandas.DataFrame): Input DataFrame containing the dataset.
+        columns (list of str): Columns to publish.
+        folder (str): Folder created by `shared_folder`.
+        categories (dict, optional): Mapping of column name to categories, see `encode_features`. Default is None.
+        dtype (numpy.dtype, optional): Data type to store the block as. Default is None.
+
+    Returns:
+        dict: Handle of the shared DataFrame, to be passed to `load_shared` in the workers.
+    """
+    block, categories = encode_features(df, columns, categories)
+    handle = share_array(block, folder, dtype=dtype)
+    handle.update(columns=list(columns), categories=categories)
+    return handle
+
+
+def load_shared(handle):
+    """
+    Attaches an array or DataFrame published by `share_array` or `share_frame`.
+
+    Objects that are not handles are returned unchanged, so workers accept both shared and in-memory data.
+
+    Parameters:
+        handle (dict or object): Handle of the shared data.
+
+    Returns:
+        numpy.ndarray or pandas.DataFrame: Read-only memory-mapped array, or the decoded DataFrame.
+    """
+    if not (isinstance(handle, dict) and 'path' in handle):
+        return handle
+
+    array = np.load(handle['path'], mmap_mode='r')
+    if 'columns' in handle:
+        return decode_features(array, handle['columns'], handle['categories'])
+    return array
+
+
+# Models kept warm in the current (worker) process, keyed by content hash, least recently used first
+_model_cache = OrderedDict()
+
+
+@contextmanager
+def model_session(model, max_models=4, max_bytes=None, temp_folder=None):
+    """
+    Context manager keeping a trained model resident in the parallel workers across calls.
+
+    The model is pickled once, keyed by the hash of its content, and the yielded handle can be passed as
+    `model` to `normalise`, `do_all`, `decom_emi`, `decom_met`, `rolling`, `modStats` and `pdp`. Each
+    worker process loads the model the first time it meets the handle and keeps it in memory for the
+    following tasks and calls, since joblib reuses its worker processes while `n_cores` is unchanged.
+
+    Parameters:
+        model (object): Trained ML model, or a handle from an enclosing session which is yielded unchanged.
+        max_models (int, optional): Maximum number of models kept in memory per process. The least recently
+                                    used models are evicted first. Default is 4.
+        max_bytes (int, optional): Maximum total pickled size of the models kept in memory per process.
+                                   Default is None.
+        temp_folder (str, optional): Parent directory of the temporary folder holding the model.
+                                     Default is None.
+
+    Yields:
+        dict: Handle of the resident model.
+
+    Example Usage:
+        # Keep the model warm across several decompositions
+        with model_session(model) as session:
+            df_dewc, mod_stats = decom_emi(df, model=session, feature_names=feature_names)
+            df_dewwc, mod_stats = decom_met(df, model=session, feature_names=feature_names)
+    """
+    if isinstance(model, dict) and 'model_hash' in model:
+        yield model
+        return
+
+    with shared_folder(temp_folder) as folder:
+        yield share_model(model, folder, max_models=max_models, max_bytes=max_bytes)
+
+
+def share_model(model, folder, max_models=4, max_bytes=None):
+    """
+    Publishes a trained model as a pickle file keyed by the hash of its content.
+
+    Parameters:
+        model (object): Trained ML model.
+        folder (str): Folder created by `shared_folder`.
+        max_models (int, optional): Maximum number of models kept in memory per process. Default is 4.
+        max_bytes (int, optional): Maximum total pickled size of the models kept in memory per process.
+                                   Default is None.
+
+    Returns:
+        dict: Handle of the model, to be passed to `load_model` in the workers.
+    """
+    payload = pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)
+    model_hash = hashlib.sha256(payload).hexdigest()
+    path = os.path.join(folder, f"{model_hash}.pkl")
+    with open(path, 'wb') as f:
+        f.write(payload)
+
+    handle = {'model_hash': model_hash, 'model_path': path, 'nbytes': len(payload),
+              'max_models': max_models, 'max_bytes': max_bytes}
+
+    # The current process already holds the model
+    cache_model(handle, model)
+
+    return handle
+
+
+def cache_model(handle, model):
+    """
+    Stores a model in the per-process cache and evicts the least recently used models beyond the limits
+    given by the handle.
+
+    Parameters:
+        handle (dict): Handle of the model from `share_model`.
+        model (object): Trained ML model.
+    """
+    _model_cache[handle['model_hash']] = (model, handle['nbytes'])
+    _model_cache.move_to_end(handle['model_hash'])
+
+    while len(_model_cache) > 1:
+        total_bytes = sum(nbytes for _, nbytes in _model_cache.values())
+        if len(_model_cache) > handle['max_models'] or (handle['max_bytes'] is not None and total_bytes > handle['max_bytes']):
+            _model_cache.popitem(last=False)
+        else:
+            break
+
+
+def load_model(handle):
+    """
+    Returns the model behind a handle from `share_model`, loading it into the per-process cache if needed.
+
+    Objects that are not model handles are returned unchanged, so functions accept both models and handles.
+
+    Parameters:
+        handle (dict or object): Handle of the model, or the model itself.
+
+    Returns:
+        object: Trained ML model.
+    """
+    if not (isinstance(handle, dict) and 'model_hash' in handle):
+        return handle
+
+    entry = _model_cache.get(handle['model_hash'])
+    if entry is not None:
+        _model_cache.move_to_end(handle['model_hash'])
+        return entry[0]
+
+    with open(handle['model_path'], 'rb') as f:
+        model = pickle.load(f)
+    cache_model(handle, model)
+
+    return model
+
+
+def clear_model_cache():
+    """
+    Removes every model kept in memory by the current process.
+    """
+    _model_cache.clear()
+
+
+def native_predictor(model, feature_names=None, categories=None, engine='booster'):
+    """
+    Extracts the underlying estimator of a FLAML AutoML model for direct prediction on NumPy blocks.
+
+    The returned predictor records the estimator's feature order, the category codes seen by FLAML at fit
+    time and the medians used to impute missing numeric values, so that `predict_native` gives the same
+    predictions as `AutoML.predict` without its DataFrame preprocessing. LightGBM, XGBoost and scikit-learn
+    random forest / extra trees estimators are supported.
+
+    With `engine` set to 'numpy' or 'numpy32' the trees of the estimator are compiled once with
+    `flatten_trees` and evaluated with `predict_trees` instead of the estimator's own predict call.
+
+    Parameters:
+        model (object): Trained AutoML model, or its handle from `model_session`.
+        feature_names (list of str, optional): Column names of the blocks to predict. Default is the
+                                               feature names of the model.
+        categories (dict, optional): Mapping of categorical column name to the categories used to encode
+                                     the blocks, see `encode_features`. Default is None.
+        engine (str, optional): Prediction engine, 'booster' for the estimator's own predict, 'numpy' for
+                                the flattened trees in float64 or 'numpy32' for the flattened trees in
+                                float32. Default is 'booster'.
+
+    Returns:
+        dict or None: Native predictor, or None if the model is not supported and `AutoML.predict` should be used.
+    """
+    if engine not in ('booster', 'numpy', 'numpy32'):
+        raise ValueError("`engine` must be one of 'booster', 'numpy' or 'numpy32'.")
+
+    model = load_model(model)
+    transformer = getattr(model, '_transformer', None)
+    estimator = getattr(getattr(model, 'model', None), 'estimator', None)
+    if transformer is None or estimator is None or getattr(model, '_label_transformer', None) is not None:
+        return None
+
+    try:
+        if transformer._task.is_ts_forecast() or transformer._task.is_nlp() or transformer._datetime_columns:
+            return None
+        cat_columns, num_columns = list(transformer._cat_columns), list(transformer._num_columns)
+        saved_categories = getattr(transformer, '_cat_categories', None) or {}
+    except AttributeError:
+        return None
+
+    # The estimator must be one we can call on a plain float matrix
+    module = type(estimator).__module__
+    if module.startswith('lightgbm'):
+        estimator_columns = list(estimator.feature_name_)
+    elif module.startswith('xgboost'):
+        if any(t == 'c' for t in (estimator.get_booster().feature_types or [])):
+            return None
+        estimator_columns = list(estimator.get_booster().feature_names or [])
+    elif type(estimator).__name__ in ('RandomForestRegressor', 'ExtraTreesRegressor'):
+        estimator_columns = list(estimator.feature_names_in_)
+    else:
+        return None
+
+    feature_names = list(model.feature_names_in_) if feature_names is None else list(feature_names)
+    categories = categories if categories is not None else {}
+    if estimator_columns != cat_columns + num_columns or not set(estimator_columns) <= set(feature_names):
+        return None
+    if any(col not in saved_categories for col in cat_columns):
+        return None
+
+    # Map the block's category codes (or raw values) onto the codes seen at fit time, unseen values to '__NAN__'
+    lookups = {}
+    for j, col in enumerate(cat_columns):
+        saved = pd.Index(saved_categories[col])
+        nan_code = saved.get_loc('__NAN__')
+        if col in categories:
+            lookup = saved.get_indexer(pd.Index(categories[col]))
+            lookups[j] = np.append(np.where(lookup < 0, nan_code, lookup), nan_code).astype(np.float64)
+        else:
+            lookups[j] = (saved, nan_code)
+
+    # Medians imputed by FLAML for missing numeric values
+    medians = None
+    if num_columns:
+        try:
+            medians = transformer.transformer.named_transformers_['continuous'].statistics_.astype(np.float64)
+        except (AttributeError, KeyError):
+            return None
+
+    # Fall back to the estimator's own predict if its trees cannot be compiled
+    trees = compiled_trees(estimator, float32=engine == 'numpy32') if engine != 'booster' else None
+
+    return {
+        'estimator': estimator,
+        'trees': trees,
+        'positions': np.array([feature_names.index(col) for col in estimator_columns], dtype=np.intp),
+        'n_cat': len(cat_columns),
+        'lookups': lookups,
+        'medians': medians
+    }
+
+
+def predict_native(predictor, block, out=None):
+    """
+    Predicts an encoded float block directly with the underlying estimator of a native predictor.
+
+    Parameters:
+        predictor (dict): Native predictor from `native_predictor`.
+        block (numpy.ndarray): Float block encoded with `encode_features` in the predictor's feature order.
+        out (numpy.ndarray, optional): Preallocated C-contiguous float64 buffer of shape
+                                       (len(block), n_features) reused between calls. Default is None.
+
+    Returns:
+        numpy.ndarray: Predictions.
+    """
+    out = native_block(predictor, block, out=out)
+
+    if predictor.get('trees') is not None:
+        return predict_trees(predictor['trees'], out)
+
+    with warnings.catch_warnings():
+        # scikit-learn estimators fitted on DataFrames warn about the missing feature names
+        warnings.simplefilter('ignore', UserWarning)
+        return np.asarray(predictor['estimator'].predict(out), dtype=np.float64).reshape(-1)
+
+
+def native_block(predictor, block, out=None):
+    """
+    Arranges an encoded float block as the design matrix of the underlying estimator of a native predictor.
+
+    The columns are put in the estimator's order, category codes are mapped onto the codes seen by FLAML at
+    fit time and missing numeric values are imputed with the FLAML medians.
+
+    Parameters:
+        predictor (dict): Native predictor from `native_predictor`.
+        block (numpy.ndarray): Float block encoded with `encode_features` in the predictor's feature order.
+        out (numpy.ndarray, optional): Preallocated C-contiguous float64 buffer of shape
+                                       (len(block), n_features) reused between calls. Default is None.
+
+    Returns:
+        numpy.ndarray: Design matrix of shape (len(block), n_features).
+    """
+    n_features = len(predictor['positions'])
+    if out is None or out.shape != (len(block), n_features):
+        out = np.empty((len(block), n_features), dtype=np.float64)
+    np.take(block, predictor['positions'], axis=1, out=out)
+
+    for j, lookup in predictor['lookups'].items():
+        if isinstance(lookup, tuple):
+            saved, nan_code = lookup
+            codes = saved.get_indexer(out[:, j])
+            out[:, j] = np.where(codes < 0, nan_code, codes)
+        else:
+            out[:, j] = lookup[np.where(np.isnan(out[:, j]), -1, out[:, j]).astype(np.intp)]
+
+    if predictor['medians'] is not None:
+        numeric = out[:, predictor['n_cat']:]
+        missing = np.isnan(numeric)
+        if missing.any():
+            numeric[missing] = np.broadcast_to(predictor['medians'], numeric.shape)[missing]
+
+    return out
+
+
+def native_contributions(model, df, feature_names=None):
+    """
+    Computes the per-row TreeSHAP contributions of every feature with the booster of the best estimator.
+
+    The contributions come from LightGBM's `pred_contrib` or XGBoost's `pred_contribs` output in a single
+    pass over the rows. For every row they sum, with the bias, to the model prediction.
+
+    Parameters:
+        model (object): Trained AutoML model with a LightGBM or XGBoost best estimator, or its handle from
+                        `model_session`.
+        df (pandas.DataFrame): Input DataFrame containing the features of the model.
+        feature_names (list of str, optional): Feature columns of `df`. Default is the feature names of the model.
+
+    Returns:
+        pd.DataFrame: Contribution of every feature of the model, and the 'bias', with the index of `df`.
+    """
+    model = load_model(model)
+    feature_names = list(model.feature_names_in_) if feature_names is None else list(feature_names)
+    block, categories = encode_features(df, feature_names)
+    predictor = native_predictor(model, feature_names, categories)
+
+    module = type(predictor['estimator']).__module__ if predictor is not None else ''
+    if not (module.startswith('lightgbm') or module.startswith('xgboost')):
+        raise ValueError("Native contributions require a LightGBM or XGBoost best estimator.")
+
+    X = native_block(predictor, block)
+    if module.startswith('lightgbm'):
+        with warnings.catch_warnings():
+            # The estimator was fitted on a DataFrame and warns about the missing feature names
+            warnings.simplefilter('ignore', UserWarning)
+            contributions = predictor['estimator'].predict(X, pred_contrib=True)
+    else:
+        import xgboost
+        booster = predictor['estimator'].get_booster()
+        contributions = booster.predict(xgboost.DMatrix(X, feature_names=booster.feature_names), pred_contribs=True)
+    contributions = np.asarray(contributions, dtype=np.float64)
+
+    # Contributions are on the raw score, which is the prediction only for identity-link objectives. XGBoost
+    # sums them in float32, so the tolerance scales with the size of the contributions of every row.
+    residual = np.abs(contributions.sum(axis=1) - predict_native(predictor, block))
+    if not (residual <= 1e-5 * (np.abs(contributions).sum(axis=1) + 1)).all():
+        raise ValueError("Native contributions require an objective whose raw score is the prediction.")
+
+    columns = [str(feature_names[position]) for position in predictor['positions']] + ['bias']
+    return pd.DataFrame(contributions, columns=columns, index=df.index)
+
+
+def model_predict(model, df, native=True, engine='booster'):
+    """
+    Predicts a DataFrame with a trained model, through the native estimator when possible.
+
+    Parameters:
+        model (object): Trained AutoML model, or its handle from `model_session`.
+        df (pandas.DataFrame): Input DataFrame containing the features of the model.
+        native (bool, optional): Whether to bypass `AutoML.predict` when the estimator is supported.
+                                 Default is True.
+        engine (str, optional): Prediction engine of the native estimator, see `native_predictor`.
+                                Default is 'booster'.
+
+    Returns:
+        numpy.ndarray: Predictions.
+    """
+    model = load_model(model)
+    feature_names = list(getattr(model, 'feature_names_in_', []))
+
+    if native and feature_names and all(col in df.columns for col in feature_names):
+        block, categories = encode_features(df, feature_names)
+        predictor = native_predictor(model, feature_names, categories, engine=engine)
+        if predictor is not None:
+            return predict_native(predictor, block)
+
+    return model.predict(df)
+
+
+def flatten_trees(estimator, float32=False):
+    """
+    Compiles the trees of a fitted LightGBM, XGBoost or scikit-learn forest regressor into flat,
+    array-backed node tables for `predict_trees`.
+
+    Every node of every tree is stored once in arrays of split feature, threshold, left and right child,
+    default direction for missing values and leaf value. Leaves point to themselves, so all rows can be
+    walked down all trees level by level with vectorised gathers.
+
+    Parameters:
+        estimator (object): Fitted LGBMRegressor, XGBRegressor, RandomForestRegressor or ExtraTreesRegressor.
+        float32 (bool, optional): Whether to evaluate in float32. This is faster and uses half the memory but
+                                  may differ slightly from the estimator for LightGBM models. Default is False.
+
+    Returns:
+        dict or None: Node tables, or None if the estimator or its objective is not supported.
+    """
+    module = type(estimator).__module__
+    if module.startswith('lightgbm'):
+        trees = flatten_lightgbm(estimator)
+    elif module.startswith('xgboost'):
+        trees = flatten_xgboost(estimator)
+    elif type(estimator).__name__ in ('RandomForestRegressor', 'ExtraTreesRegressor'):
+        trees = flatten_sklearn(estimator)
+    else:
+        trees = None
+
+    if trees is None:
+        return None
+
+    nodes = trees['nodes']
+    tables = {
+        'feature': np.array(nodes['feature'], dtype=np.intp),
+        'threshold': np.array(nodes['threshold'], dtype=trees['threshold_dtype']),
+        'left': np.array(nodes['left'], dtype=np.intp),
+        'right': np.array(nodes['right'], dtype=np.intp),
+        'value': np.array(nodes['value'], dtype=np.float32 if float32 else np.float64),
+        'default_left': np.array(nodes['default_left'], dtype=bool),
+        'nan_to_zero': np.array(nodes['nan_to_zero'], dtype=bool),
+        'zero_missing': np.array(nodes['zero_missing'], dtype=bool),
+        'category': np.array(nodes['category'], dtype=np.intp),
+        'roots': np.array(trees['roots'], dtype=np.intp),
+        'depth': trees['depth'],
+        'strict': trees['strict'],
+        'scale': trees['scale'],
+        'base': trees['base'],
+        'dtype': np.float32 if float32 else trees['input_dtype']
+    }
+
+    # Round float32 thresholds to the nearest float32, which keeps the comparisons of float64 inputs cast to
+    # float32 on the same side. Estimators that compare float32 inputs themselves (scikit-learn) are matched
+    # exactly by rounding towards the side of the comparison instead.
+    if float32:
+        threshold = tables['threshold'].astype(np.float64)
+        rounded = threshold.astype(np.float32)
+        if trees['input_dtype'] == np.float32:
+            if trees['strict']:
+                rounded = np.where(rounded < threshold, np.nextafter(rounded, np.float32(np.inf)), rounded)
+            else:
+                rounded = np.where(rounded > threshold, np.nextafter(rounded, np.float32(-np.inf)), rounded)
+        tables['threshold'] = rounded.astype(np.float32)
+
+    # Categorical splits are stored as one row of a boolean table per split: True sends the category left
+    width = max([max(c) + 1 for c in trees['categories']] + [1])
+    tables['bitset'] = np.zeros((max(len(trees['categories']), 1), width), dtype=bool)
+    for i, cats in enumerate(trees['categories']):
+        tables['bitset'][i, cats] = True
+
+    return tables
+
+
+_tree_cache = weakref.WeakKeyDictionary()
+
+
+def compiled_trees(estimator, float32=False):
+    """
+    Returns the flattened trees of an estimator, compiling them with `flatten_trees` on first use.
+
+    The node tables are kept for as long as the estimator is alive, so that repeated calls in the same
+    process, e.g. one per rolling window, compile every model only once.
+
+    Parameters:
+        estimator (object): Fitted estimator supported by `flatten_trees`.
+        float32 (bool, optional): Whether to evaluate in float32. Default is False.
+
+    Returns:
+        dict or None: Node tables, or None if the estimator is not supported.
+    """
+    try:
+        compiled = _tree_cache.setdefault(estimator, {})
+    except TypeError:
+        return flatten_trees(estimator, float32=float32)
+
+    if float32 not in compiled:
+        compiled[float32] = flatten_trees(estimator, float32=float32)
+    return compiled[float32]
+
+
+def new_node_table():
+    """
+    Returns empty node columns for the tree flattening functions.
+    """
+    return {key: [] for key in ('feature', 'threshold', 'left', 'right', 'value', 'default_left',
+                                'nan_to_zero', 'zero_missing', 'category')}
+
+
+def flatten_lightgbm(estimator):
+    """
+    Flattens the trees of a fitted LightGBM regressor from its `dump_model` output.
+
+    Returns:
+        dict or None: Raw node columns and metadata, or None if the model is not supported.
+    """
+    dump = estimator.booster_.dump_model()
+    objective = str(dump.get('objective', '')).split(' ')[0]
+    if objective not in ('regression', 'regression_l1', 'huber', 'fair', 'quantile', 'mape') or dump.get('num_class', 1) != 1:
+        return None
+
+    nodes, categories, roots, depth = new_node_table(), [], [], 0
+    for tree in dump['tree_info']:
+        roots.append(len(nodes['feature']))
+        stack = [(tree['tree_structure'], None, None, 1)]
+        while stack:
+            node, parent, side, level = stack.pop()
+            index = len(nodes['feature'])
+            if parent is not None:
+                nodes[side][parent] = index
+            depth = max(depth, level)
+
+            if 'leaf_value' in node or 'split_feature' not in node:
+                if 'leaf_coeff' in node:
+                    return None
+                for key, value in (('feature', 0), ('threshold', 0.0), ('left', index), ('right', index),
+                                   ('value', node.get('leaf_value', 0.0)), ('default_left', False),
+                                   ('nan_to_zero', False), ('zero_missing', False), ('category', -1)):
+                    nodes[key].append(value)
+                continue
+
+            missing_type = node.get('missing_type', 'None')
+            if node['decision_type'] == '==':
+                category = len(categories)
+                categories.append([int(c) for c in str(node['threshold']).split('||')])
+                threshold = 0.0
+            else:
+                category = -1
+                threshold = float(node['threshold'])
+            for key, value in (('feature', node['split_feature']), ('threshold', threshold), ('left', -1),
+                               ('right', -1), ('value', 0.0), ('default_left', bool(node.get('default_left', False))),
+                               ('nan_to_zero', missing_type != 'NaN'), ('zero_missing', missing_type == 'Zero'),
+                               ('category', category)):
+                nodes[key].append(value)
+            stack.append((node['right_child'], index, 'right', level + 1))
+            stack.append((node['left_child'], index, 'left', level + 1))
+
+    return {'nodes': nodes, 'categories': categories, 'roots': roots, 'depth': depth, 'strict': False,
+            'scale': 1.0, 'base': 0.0, 'threshold_dtype': np.float64, 'input_dtype': np.float64}
+
+
+def flatten_xgboost(estimator):
+    """
+    Flattens the trees of a fitted XGBoost regressor from its JSON model.
+
+    Returns:
+        dict or None: Raw node columns and metadata, or None if the model is not supported.
+    """
+    booster = estimator.get_booster()
+    learner = json.loads(booster.save_raw(raw_format='json'))['learner']
+    objective = learner['objective']['name']
+    gradient_booster = learner['gradient_booster']
+    if gradient_booster['name'] != 'gbtree' or objective not in ('reg:squarederror', 'reg:absoluteerror',
+                                                                 'reg:pseudohubererror', 'reg:quantileerror'):
+        return None
+
+    model = gradient_booster['model']
+    trees = model['trees']
+    best_iteration = getattr(booster, 'best_iteration', None)
+    if best_iteration is not None and booster.attr('best_iteration') is not None:
+        num_parallel_tree = int(model['gbtree_model_param'].get('num_parallel_tree', 1))
+        trees = trees[:(int(best_iteration) + 1) * num_parallel_tree]
+
+    nodes, roots, depth = new_node_table(), [], 0
+    for tree in trees:
+        if any(int(t) != 0 for t in tree.get('split_type', [])):
+            return None
+        offset = len(nodes['feature'])
+        roots.append(offset)
+        left, right = np.array(tree['left_children']), np.array(tree['right_children'])
+        is_leaf = left == -1
+
+        # Depth of every node from its parent
+        levels = np.ones(len(left), dtype=int)
+        for i in range(len(left)):
+            if not is_leaf[i]:
+                levels[left[i]] = levels[right[i]] = levels[i] + 1
+        depth = max(depth, int(levels.max()))
+
+        nodes['feature'].extend(np.where(is_leaf, 0, tree['split_indices']).tolist())
+        nodes['threshold'].extend(np.where(is_leaf, 0.0, tree['split_conditions']).tolist())
+        nodes['left'].extend((np.where(is_leaf, np.arange(len(left)), left) + offset).tolist())
+        nodes['right'].extend((np.where(is_leaf, np.arange(len(left)), right) + offset).tolist())
+        nodes['value'].extend(np.where(is_leaf, tree['split_conditions'], 0.0).tolist())
+        nodes['default_left'].extend(np.asarray(tree['default_left'], dtype=bool).tolist())
+        nodes['nan_to_zero'].extend([False] * len(left))
+        nodes['zero_missing'].extend([False] * len(left))
+        nodes['category'].extend([-1] * len(left))
+
+    base_score = float(str(learner['learner_model_param']['base_score']).strip('[]').split(',')[0])
+
+    return {'nodes': nodes, 'categories': [], 'roots': roots, 'depth': depth, 'strict': True,
+            'scale': 1.0, 'base': base_score, 'threshold_dtype': np.float32, 'input_dtype': np.float32}
+
+
+def flatten_sklearn(estimator):
+    """
+    Flattens the trees of a fitted scikit-learn random forest or extra trees regressor.
+
+    Returns:
+        dict or None: Raw node columns and metadata, or None if the model is not supported.
+    """
+    if getattr(estimator, 'n_outputs_', 1) != 1:
+        return None
+
+    nodes, roots, depth = new_node_table(), [], 0
+    for tree_estimator in estimator.estimators_:
+        tree = tree_estimator.tree_
+        offset = len(nodes['feature'])
+        roots.append(offset)
+        is_leaf = tree.children_left == -1
+        index = np.arange(tree.node_count)
+        depth = max(depth, int(tree.max_depth) + 1)
+        missing_left = getattr(tree, 'missing_go_to_left', np.zeros(tree.node_count, dtype=np.uint8))
+
+        nodes['feature'].extend(np.where(is_leaf, 0, tree.feature).tolist())
+        nodes['threshold'].extend(np.where(is_leaf, 0.0, tree.threshold).tolist())
+        nodes['left'].extend((np.where(is_leaf, index, tree.children_left) + offset).tolist())
+        nodes['right'].extend((np.where(is_leaf, index, tree.children_right) + offset).tolist())
+        nodes['value'].extend(tree.value[:, 0, 0].tolist())
+        nodes['default_left'].extend(np.asarray(missing_left, dtype=bool).tolist())
+        nodes['nan_to_zero'].extend([False] * tree.node_count)
+        nodes['zero_missing'].extend([False] * tree.node_count)
+        nodes['category'].extend([-1] * tree.node_count)
+
+    return {'nodes': nodes, 'categories': [], 'roots': roots, 'depth': depth, 'strict': False,
+            'scale': 1.0 / len(roots), 'base': 0.0, 'threshold_dtype': np.float64, 'input_dtype': np.float32}
+
+
+def predict_trees(trees, X, max_cells=4000000):
+    """
+    Predicts a float matrix with flattened trees from `flatten_trees`.
+
+    All (row, tree) pairs descend together, one level per step, using NumPy gathers on the node tables.
+    Pairs that reach a leaf add its value to their row and drop out, so the work follows the actual path
+    lengths rather than the deepest tree. Rows are processed in chunks so that at most `max_cells`
+    (row, tree) pairs are held at once.
+
+    Parameters:
+        trees (dict): Node tables from `flatten_trees`.
+        X (numpy.ndarray): Float matrix in the estimator's feature order.
+        max_cells (int, optional): Maximum number of (row, tree) pairs evaluated per chunk. Default is 4000000.
+
+    Returns:
+        numpy.ndarray: Predictions.
+    """
+    X = np.ascontiguousarray(X, dtype=trees['dtype'])
+    n_rows, n_features = X.shape
+    roots = trees['roots']
+    is_leaf = trees['left'] == np.arange(len(trees['left']))
+    has_missing = np.isnan(X).any()
+    has_zero_missing = trees['zero_missing'].any()
+    has_category = (trees['category'] >= 0).any()
+
+    predictions = np.empty(n_rows, dtype=np.float64)
+    chunk_rows = max(1, max_cells // len(roots))
+
+    for start in range(0, n_rows, chunk_rows):
+        block = X[start:start + chunk_rows].ravel()
+        n_block = len(block) // n_features
+        row = np.repeat(np.arange(n_block), len(roots))
+        node = np.tile(roots, n_block)
+        total = np.zeros(n_block, dtype=np.float64)
+
+        while len(node):
+            # Collect the pairs that reached a leaf
+            leaf = is_leaf[node]
+            if leaf.any():
+                total += np.bincount(row[leaf], weights=trees['value'][node[leaf]], minlength=n_block)
+                row, node = row[~leaf], node[~leaf]
+                if not len(node):
+                    break
+
+            value = block[row * n_features + trees['feature'][node]]
+            threshold = trees['threshold'][node]
+            go_left = value < threshold if trees['strict'] else value <= threshold
+
+            # Numerical splits, with missing values sent to the default child
+            if has_missing or has_zero_missing:
+                value = np.where(trees['nan_to_zero'][node] & np.isnan(value), 0, value)
+                missing = np.isnan(value)
+                if has_zero_missing:
+                    missing |= trees['zero_missing'][node] & (np.abs(value) <= 1e-35)
+                go_left = np.where(missing, trees['default_left'][node],
+                                   value < threshold if trees['strict'] else value <= threshold)
+
+            # Categorical splits: negative and missing categories go right
+            if has_category:
+                category = trees['category'][node]
+                is_category = category >= 0
+                if is_category.any():
+                    codes = np.where(np.isnan(value), -1, value).astype(np.intp)
+                    valid = is_category & (codes >= 0) & (codes < trees['bitset'].shape[1])
+                    in_set = trees['bitset'][np.maximum(category, 0), np.where(valid, codes, 0)] & valid
+                    go_left = np.where(is_category, in_set, go_left)
+
+            node = np.where(go_left, trees['left'][node], trees['right'][node])
+
+        predictions[start:start + n_block] = total * trees['scale'] + trees['base']
+
+    return predictions
+
+
+def spawn_seeds(seed, n):
+    """
+    Derives independent child seeds from a root seed with `numpy.random.SeedSequence.spawn`.
+
+    The i-th child seed depends only on `seed` and i, so the seed of a sample (or model) is the same
+    whatever the total number drawn and however the work is later split into batches or processes.
+    No global random state is used.
+
+    Parameters:
+        seed (int): Root random seed.
+        n (int): Number of child seeds.
+
+    Returns:
+        numpy.ndarray: Integer array of `n` seeds in [0, 2**32).
+    """
+    children = np.random.SeedSequence(seed).spawn(n)
+    return np.array([child.generate_state(1, np.uint32)[0] for child in children], dtype=np.int64)
+
+
+def generate_resample_indices(n_rows, n_weather, seeds, replace=True):
+    """
+    Draws the weather row indices of a group of resamples as an integer matrix.
+
+    Every row is drawn from its own `numpy.random.Generator` seeded with the sample's seed, so a sample
+    gets the same indices in `normalise_worker`, in any batch of `normalise_batch_worker` and with any
+    number of cores. With replacement the rows are drawn uniformly from the weather data; without
+    replacement they are a permutation when the lengths match, otherwise a draw without repetition.
+
+    Parameters:
+        n_rows (int): Number of rows in the input DataFrame.
+        n_weather (int): Number of rows in the weather DataFrame.
+        seeds (array-like of int): One random seed per sample.
+        replace (bool, optional): Whether to sample with replacement. Default is True.
+
+    Returns:
+        numpy.ndarray: Integer array of shape (len(seeds), n_rows) indexing rows of the weather data.
+    """
+    dtype = np.int32 if n_weather < np.iinfo(np.int32).max else np.int64
+    indices = np.empty((len(seeds), n_rows), dtype=dtype)
+
+    for i, seed in enumerate(seeds):
+        rng = np.random.default_rng(seed)
+        if replace:
+            indices[i] = rng.integers(0, n_weather, size=n_rows)
+        elif n_weather == n_rows:
+            indices[i] = rng.permutation(n_rows)
+        else:
+            indices[i] = rng.choice(n_weather, size=n_rows, replace=False)
+
+    return indices
+
+
+def init_accumulator(date_codes, n_dates, edges=None):
+    """
+    Creates an empty per-date accumulator for streaming aggregation of normalised predictions.
 
-    # Initialize and train AutoML model
-    model = AutoML()
-    if verbose:
-        print(pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'), ": Training AutoML...")
+    The accumulator keeps running counts, means and sums of squared deviations (M2, Welford) per date and,
+    optionally, a fixed-bin histogram per date that serves as a mergeable quantile sketch.
 
-    model.fit(X_train=df_train[variables], y_train=df_train[value],
-                **default_model_config, seed=seed)
+    Parameters:
+        date_codes (numpy.ndarray): Integer date code of every input row.
+        n_dates (int): Number of unique dates.
+        edges (numpy.ndarray, optional): Histogram bin edges. If None, no quantile sketch is kept. Default is None.
 
-    if verbose:
-        print(pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'), ": Best model is",
-            model.best_estimator, "with best model parameters of", model.best_config)
+    Returns:
+        dict: Accumulator with 'codes', 'count', 'mean', 'M2', 'edges' and 'hist' entries.
+    """
+    return {
+        'codes': date_codes,
+        'count': np.zeros(n_dates, dtype=np.float64),
+        'mean': np.zeros(n_dates, dtype=np.float64),
+        'M2': np.zeros(n_dates, dtype=np.float64),
+        'edges': edges,
+        'hist': np.zeros((n_dates, len(edges) - 1), dtype=np.uint32) if edges is not None else None
+    }
 
-    return model
 
+def merge_moments(count_a, mean_a, M2_a, count_b, mean_b, M2_b):
+    """
+    Merges two sets of per-date counts, means and M2 using the parallel Welford update.
 
-def prepare_train_model(df, value, feature_names, split_method, fraction, model_config, seed, verbose=True):
+    Returns:
+        tuple: Merged (count, mean, M2) arrays.
     """
-    Prepares the data and trains a machine learning model using the specified configuration.
+    count = count_a + count_b
+    delta = mean_b - mean_a
+    ratio = np.divide(count_b, count, out=np.zeros_like(count), where=count > 0)
+    mean = mean_a + delta * ratio
+    M2 = M2_a + M2_b + delta ** 2 * count_a * ratio
+    return count, mean, M2
+
+
+def update_accumulator(acc, rows, values):
+    """
+    Folds a chunk of predictions into a per-date accumulator.
 
     Parameters:
-        df (pandas.DataFrame): The input DataFrame containing the data to be used for training.
-        value (str): The name of the target variable to be predicted.
-        feature_names (list of str): A list of feature column names to be used in the training.
-        split_method (str): The method to split the data ('random' or other supported methods).
-        fraction (float): The fraction of data to be used for training.
-        model_config (dict): The configuration dictionary for the AutoML model training.
-        seed (int): The random seed for reproducibility.
-        verbose (bool, optional): If True, print progress messages. Default is True.
+        acc (dict): Accumulator created by `init_accumulator`.
+        rows (numpy.ndarray): Input row position of every prediction in the chunk.
+        values (numpy.ndarray): Predictions of the chunk.
 
     Returns:
-        tuple:
-            - pd.DataFrame: The prepared DataFrame ready for model training.
-            - object: The trained machine learning model.
+        dict: The updated accumulator.
+    """
+    codes = acc['codes'][rows]
+    n_dates = len(acc['count'])
 
-    Raises:
-        ValueError: If there are any issues with the data preparation or model training.
+    # Moments of the chunk, computed in two passes for numerical stability
+    count = np.bincount(codes, minlength=n_dates).astype(np.float64)
+    mean = np.divide(np.bincount(codes, weights=values, minlength=n_dates), count,
+                     out=np.zeros(n_dates), where=count > 0)
+    M2 = np.bincount(codes, weights=(values - mean[codes]) ** 2, minlength=n_dates)
+    acc['count'], acc['mean'], acc['M2'] = merge_moments(acc['count'], acc['mean'], acc['M2'], count, mean, M2)
 
-    Example:
-        >>> data = {
-        ...     'feature1': [1, 2, 3, 4, 5],
-        ...     'feature2': [5, 4, 3, 2, 1],
-        ...     'target': [2, 3, 4, 5, 6],
-        ...     'set': ['training', 'training', 'training', 'testing', 'testing']
-        ... }
-        >>> df = pd.DataFrame(data)
-        >>> feature_names = ['feature1', 'feature2']
-        >>> split_method = 'random'
-        >>> fraction = 0.75
-        >>> model_config = {'time_budget': 90, 'metric': 'r2'}
-        >>> seed = 7654321
-        >>> df_prepared, model = prepare_train_model(df, value='target', feature_names=feature_names, split_method=split_method, fraction=fraction, model_config=model_config, seed=seed, verbose=True)
-    """
+    if acc['hist'] is not None:
+        n_bins = acc['hist'].shape[1]
+        bins = np.clip(np.searchsorted(acc['edges'], values, side='right') - 1, 0, n_bins - 1)
+        acc['hist'] = acc['hist'] + np.bincount(codes * n_bins + bins,
+                                               minlength=n_dates * n_bins).reshape(n_dates, n_bins).astype(np.uint32)
 
-    vars = list(set(feature_names) - set(['date_unix', 'day_julian', 'weekday', 'hour']))
+    return acc
 
-    # Prepare the data
-    df = prepare_data(df, value=value, feature_names=vars, split_method=split_method, fraction=fraction, seed=seed)
 
-    # Train the model using AutoML
-    model = train_model(df, value='value', variables=feature_names, model_config=model_config, seed=seed, verbose=verbose)
+def merge_accumulators(acc_a, acc_b):
+    """
+    Merges two per-date accumulators built over the same dates and histogram edges.
 
-    return df, model
+    Returns:
+        dict: The merged accumulator.
+    """
+    acc = dict(acc_a)
+    acc['count'], acc['mean'], acc['M2'] = merge_moments(acc_a['count'], acc_a['mean'], acc_a['M2'],
+                                                         acc_b['count'], acc_b['mean'], acc_b['M2'])
+    if acc_a['hist'] is not None:
+        acc['hist'] = acc_a['hist'] + acc_b['hist']
+    return acc
 
 
-def normalise_worker(index, df, model, variables_resample, replace, seed, verbose, weather_df=None):
+def finalise_accumulator(acc, quantiles=(0.05, 0.5, 0.95)):
     """
-    Worker function for parallel normalisation of data using randomly resampled meteorological parameters
-    from another weather DataFrame within its date range. If no weather DataFrame is provided,
-    it defaults to using the input DataFrame.
+    Computes the per-date mean, standard deviation and approximate quantiles from an accumulator.
+
+    Quantiles are interpolated linearly within the histogram bins, so they are only available when the
+    accumulator was created with histogram edges.
 
     Parameters:
-        index (int): Index of the worker.
-        df (pandas.DataFrame): Input DataFrame containing the dataset.
-        model (ML): Trained ML model.
-        variables_resample (list of str): List of resampling variables.
-        replace (bool): Whether to sample with replacement.
-        seed (int): Random seed.
-        verbose (bool): Whether to print progress messages.
-        weather_df (pandas.DataFrame, optional): Weather DataFrame containing the meteorological parameters.
-                                             Defaults to None.
+        acc (dict): Accumulator created by `init_accumulator`.
+        quantiles (tuple of float, optional): Quantiles to estimate. Default is (0.05, 0.5, 0.95).
 
     Returns:
-        pd.DataFrame: DataFrame containing normalised predictions.
+        dict: Arrays of 'mean' and 'std' and, if a histogram is kept, one entry per quantile keyed by
+              'p5', 'p50', 'p95', etc.
+    """
+    result = {'mean': acc['mean'], 'std': np.sqrt(np.divide(acc['M2'], acc['count'],
+                                                            out=np.full_like(acc['M2'], np.nan),
+                                                            where=acc['count'] > 0))}
+    if acc['hist'] is not None:
+        edges = acc['edges']
+        cumulative = np.cumsum(acc['hist'], axis=1)
+        for q in quantiles:
+            target = q * acc['count']
+            bins = np.minimum((cumulative < target[:, None]).sum(axis=1), len(edges) - 2)
+            bin_count = acc['hist'][np.arange(len(bins)), bins]
+            below = cumulative[np.arange(len(bins)), bins] - bin_count
+            fraction = np.clip(np.divide(target - below, bin_count, out=np.zeros_like(target),
+                                         where=bin_count > 0), 0, 1)
+            result[f"p{100 * q:g}"] = edges[bins] + fraction * (edges[bins + 1] - edges[bins])
+
+    return result
+
+
+def normalise_batch_worker(X, X_weather, seeds, model, feature_names, resample_columns, categories,
+                           replace=True, chunk_size=500000, accumulator=None, native=True, engine='booster',
+                           levels=None):
     """
+    Worker function predicting a batch of resamples with one model call per chunk of rows.
 
-    # Print progress message every fifth prediction if verbose is enabled
-    if verbose and index % 5 == 0:
-        # Calculate and format the progress percentage
-        message_percent = round((index / len(df)) * 100, 2)
-        message_percent = "{:.1f} %".format(message_percent)
-        print(pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'),
-              ": Predicting", index, "of", len(df), "times (", message_percent, ")...")
+    The blocks may be handles published with `share_array`, in which case the worker attaches them.
 
-    # Set the random seed for reproducibility
-    np.random.seed(seed)
+    The weather row indices of every sample are drawn inside the worker from the sample's seed, with the
+    draws of `generate_resample_indices`, and only for the samples of the current chunk, so memory stays
+    proportional to max(chunk_size, n_rows) whatever the number of samples. The (sample, row) pairs of the
+    batch are streamed in chunks of about `chunk_size` rows. For every chunk the design matrix is gathered
+    from the input block, the resampled columns are overwritten with the drawn weather rows, and the whole
+    chunk is predicted in a single call.
 
-    # If the weather_df is the same length as the input df
-    if len(weather_df) == len(df):
-        # Randomly sample indices from the input DataFrame
-        index_rows = np.random.choice(len(df), size=len(df), replace=replace)
-        # Resample the specified variables using the sampled indices
-        df[variables_resample] = df[variables_resample].iloc[index_rows].reset_index(drop=True)
-    else:
-        # Sample meteorological parameters from the provided weather DataFrame
-        sampled_meteorological_params = weather_df[variables_resample].sample(n=len(weather_df), replace=replace).reset_index(drop=True)
-        # Use the sampled parameters to resample the specified variables in the input DataFrame
-        df[variables_resample] = sampled_meteorological_params.sample(n=len(df), replace=replace).reset_index(drop=True)
+    Parameters:
+        X (numpy.ndarray or dict): Encoded input block of shape (n_rows, len(feature_names)), or its handle.
+        X_weather (numpy.ndarray or dict): Encoded weather block of shape (n_weather, len(resample_columns)),
+                                           or its handle.
+        seeds (array-like of int): Seed of every sample of the batch, e.g. from `spawn_seeds`.
+        model (object or dict): Trained ML model, or its handle from `model_session`.
+        feature_names (list of str): Column names of `X`.
+        resample_columns (list of int): Positions in `feature_names` of the resampled variables.
+        categories (dict): Mapping of categorical column name to its categories.
+        replace (bool, optional): Whether to sample with replacement. Default is True.
+        chunk_size (int, optional): Number of rows predicted per model call. Default is 500000.
+        accumulator (dict, optional): Per-date accumulator created by `init_accumulator`. If given, every chunk
+                                      is folded into it as it is predicted and the accumulator is returned
+                                      instead of the predictions. Default is None.
+        native (bool, optional): Whether to predict with the native estimator when it is supported, see
+                                 `native_predictor`. Default is True.
+        engine (str, optional): Prediction engine of the native estimator, see `native_predictor`.
+                                Default is 'booster'.
+        levels (list of tuple, optional): Pairs of (positions in `feature_names`, positions in the columns of
+                                          `X_weather`) of the variables resampled at each level. If given,
+                                          `resample_columns` is ignored and every chunk is predicted once per
+                                          level with the same weather rows; `accumulator` is then a list with
+                                          one accumulator per level. Default is None.
 
-    # Predict values using the model
-    value_predict = model.predict(df)
+    Returns:
+        numpy.ndarray or dict: Predictions of shape (n_batch, n_rows), or the updated accumulator. With `levels`,
+                               predictions of shape (n_levels, n_batch, n_rows) or the list of accumulators.
+    """
+    X, X_weather = load_shared(X), load_shared(X_weather)
+    model = load_model(model)
+    predictor = native_predictor(model, feature_names, categories, engine=engine) if native else None
+
+    multi_level = levels is not None
+    if not multi_level:
+        levels = [(resample_columns, slice(None))]
+        accumulator = [accumulator] if accumulator is not None else None
+
+    seeds = np.asarray(seeds)
+    n_batch, n_rows = len(seeds), len(X)
+    predictions = np.empty((len(levels), n_batch * n_rows), dtype=np.float64) if accumulator is None else None
+    buffer = None
+
+    # Draw the samples of one chunk at a time: several short samples per chunk, or one long sample split
+    # into several chunks
+    samples_per_chunk = max(1, chunk_size // max(n_rows, 1))
+
+    for first in range(0, n_batch, samples_per_chunk):
+        group = seeds[first:first + samples_per_chunk]
+        flat_indices = generate_resample_indices(n_rows, len(X_weather), group, replace).reshape(-1)
+        offset = first * n_rows
+
+        for start in range(0, len(group) * n_rows, chunk_size):
+            stop = min(start + chunk_size, len(group) * n_rows)
+            rows = np.arange(start, stop) % n_rows
+            base_block = X[rows]
+            weather_block = X_weather[flat_indices[start:stop]]
+
+            # Every level of the chunk shares the same resampled weather rows
+            for k, (level_columns, weather_columns) in enumerate(levels):
+                block = base_block.copy() if len(levels) > 1 else base_block
+                block[:, level_columns] = weather_block[:, weather_columns]
+
+                if predictor is not None:
+                    if buffer is None or len(buffer) != len(block):
+                        buffer = np.empty((len(block), len(predictor['positions'])), dtype=np.float64)
+                    value_predict = predict_native(predictor, block, out=buffer)
+                else:
+                    value_predict = model.predict(decode_features(block, feature_names, categories))
 
-    # Build a DataFrame containing the predictions along with the original dates, observed values, and seed
-    predictions = pd.DataFrame({
-        'date': df['date'],
-        'observed': df['value'],
-        'normalised': value_predict,
-        'seed': seed
-    })
+                if accumulator is None:
+                    predictions[k, offset + start:offset + stop] = value_predict
+                else:
+                    update_accumulator(accumulator[k], rows, value_predict)
 
-    return predictions
+    if accumulator is None:
+        predictions = predictions.reshape(len(levels), n_batch, n_rows)
+        return predictions if multi_level else predictions[0]
+    return accumulator if multi_level else accumulator[0]
 
 
 def normalise(df, model, feature_names, variables_resample=None, n_samples=300, replace=True,
-              aggregate=True, seed=7654321, n_cores=None, weather_df=None, verbose=True):
+              aggregate=True, seed=7654321, n_cores=None, weather_df=None, chunk_size=500000, uncertainty=False,
+              native=True, engine='booster', verbose=True):
     """
     Normalises the dataset using the trained model.
 
+    The feature and weather columns are encoded once into float blocks, and the resamples are predicted in
+    batches of `chunk_size` rows spread across the CPU cores. Every worker draws the resample indices of its
+    samples from their seeds as it goes, so no index matrix of all the samples is built.
+    When aggregating, the predictions are folded into running per-date statistics as they are produced,
+    so memory stays proportional to the number of rows whatever the number of samples.
+
     Parameters:
         df (pandas.DataFrame): Input DataFrame containing the dataset.
-        model (object): Trained ML model.
+        model (object): Trained ML model, or its handle from `model_session`.
         feature_names (list of str): List of feature names.
         variables_resample (list of str): List of resampling variables.
         n_samples (int, optional): Number of samples to normalise. Default is 300.
@@ -463,6 +1807,16 @@ def normalise(df, model, feature_names, variables_resample=None, n_samples=300,
         seed (int, optional): Random seed. Default is 7654321.
         n_cores (int, optional): Number of CPU cores to use. Default is total CPU cores minus one.
         weather_df (pandas.DataFrame, optional): DataFrame containing weather data for resampling. Default is None.
+        chunk_size (int, optional): Number of rows predicted per model call. Default is 500000.
+        uncertainty (bool, optional): Whether to also return the per-date standard deviation ('std') and
+                                      approximate 5th, 50th and 95th percentiles ('p5', 'p50', 'p95') of the
+                                      normalised predictions. Only used when `aggregate` is True. Default is False.
+        native (bool, optional): Whether to predict with the underlying estimator directly, bypassing
+                                 `AutoML.predict`, when it is supported. Default is True.
+        engine (str, optional): Prediction engine of the underlying estimator: 'booster' for its own predict,
+                                'numpy' or 'numpy32' for its trees flattened into NumPy node tables and
+                                evaluated in float64 or float32, see `flatten_trees`. Only used when
+                                `native` is True. Default is 'booster'.
         verbose (bool, optional): Whether to print progress messages. Default is True.
 
     Returns:
@@ -498,9 +1852,8 @@ def normalise(df, model, feature_names, variables_resample=None, n_samples=300,
     if not all(var in weather_df.columns for var in variables_resample):
         raise ValueError("The input weather_df does not contain all variables within `variables_resample`.")
 
-    # Generate random seeds for parallel processing
-    np.random.seed(seed)
-    random_seeds = np.random.choice(np.arange(1000001), size=n_samples, replace=False)
+    # Derive one independent seed per sample, so results do not depend on batching or the number of cores
+    random_seeds = spawn_seeds(seed, n_samples)
 
     # Determine number of CPU cores to use
     n_cores = n_cores if n_cores is not None else os.cpu_count() - 1
@@ -508,22 +1861,65 @@ def normalise(df, model, feature_names, variables_resample=None, n_samples=300,
     if verbose:
         print(pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'), ": Normalising the dataset using the trained model in parallel.")
 
-    # Perform normalisation using parallel processing
-    df_result = pd.concat(Parallel(n_jobs=n_cores)(delayed(normalise_worker)(
-            index=i, df=df, model=model, variables_resample=variables_resample, replace=replace,
-            seed=random_seeds[i], verbose=False, weather_df=weather_df) for i in range(n_samples)), axis=0)
+    # Encode the feature and weather columns once
+    X, categories = encode_features(df, feature_names)
+    X_weather, _ = encode_features(weather_df, variables_resample, categories)
+    resample_columns = [feature_names.index(var) for var in variables_resample]
+
+    # Perform normalisation using parallel processing, one batch of samples per task
+    batches = np.array_split(np.arange(n_samples), min(n_samples, effective_n_jobs(n_cores)))
+
+    with shared_folder() as folder:
+        # Publish the blocks once so that every task only receives handles and its sample positions
+        X_shared = share_array(X, folder)
+        X_weather_shared = share_array(X_weather, folder)
+
+        # Aggregate results if needed
+        if aggregate:
+            date_codes, dates = pd.factorize(df['date'], sort=True)
+
+            # Bin the quantile sketch over the range of the unresampled predictions, padded on both sides
+            edges = None
+            if uncertainty:
+                value_predict = model_predict(model, decode_features(X, feature_names, categories),
+                                              native=native, engine=engine)
+                lower, upper = np.min(value_predict), np.max(value_predict)
+                padding = max(upper - lower, 1e-9) / 2
+                edges = np.linspace(lower - padding, upper + padding, 201)
+
+            accumulator = init_accumulator(date_codes, len(dates), edges)
+            for batch_accumulator in Parallel(n_jobs=n_cores, return_as='generator')(delayed(normalise_batch_worker)(
+                    X=X_shared, X_weather=X_weather_shared, seeds=random_seeds[batch], model=model,
+                    feature_names=feature_names, resample_columns=resample_columns, categories=categories,
+                    replace=replace, chunk_size=chunk_size,
+                    accumulator=init_accumulator(date_codes, len(dates), edges),
+                    native=native, engine=engine) for batch in batches):
+                accumulator = merge_accumulators(accumulator, batch_accumulator)
+        else:
+            predictions = np.concatenate(Parallel(n_jobs=n_cores)(delayed(normalise_batch_worker)(
+                    X=X_shared, X_weather=X_weather_shared, seeds=random_seeds[batch], model=model,
+                    feature_names=feature_names, resample_columns=resample_columns, categories=categories,
+                    replace=replace, chunk_size=chunk_size, native=native, engine=engine) for batch in batches),
+                    axis=0)
 
-    # Aggregate results if needed
     if aggregate:
         if verbose:
             print(pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'), ": Aggregating", n_samples, "predictions...")
-        df_result = df_result.pivot_table(index='date', aggfunc='mean')[['observed', 'normalised']]
+        summary = finalise_accumulator(accumulator)
+        df_result = pd.DataFrame({'observed': df['value'].groupby(date_codes).mean().values,
+                                  'normalised': summary.pop('mean')}, index=pd.Index(dates, name='date'))
+        if uncertainty:
+            df_result = df_result.assign(**summary)
     else:
-        # Pivot table to reshape 'normalised' values by 'seed' and set 'date' as index
-        normalised_pivot = df_result.pivot_table(index='date', columns='seed', values='normalised')
+        # Reshape 'normalised' values by 'seed' and set 'date' as index
+        normalised_pivot = (pd.DataFrame(predictions.T, columns=pd.Index(random_seeds, name='seed'))
+                            .assign(date=df['date'].values)
+                            .groupby('date').mean()
+                            .sort_index(axis=1))
 
         # Select and drop duplicate rows based on 'date', keeping only 'observed' column
-        observed_unique = df_result[['date', 'observed']].drop_duplicates().set_index('date')
+        observed_unique = (df[['date', 'value']].rename(columns={'value': 'observed'})
+                           .drop_duplicates().set_index('date'))
 
         # Concatenate the pivoted 'normalised' values and unique 'observed' values
         df_result = pd.concat([observed_unique, normalised_pivot], axis=1)
@@ -533,8 +1929,99 @@ def normalise(df, model, feature_names, variables_resample=None, n_samples=300,
     return df_result
 
 
+def normalise_levels(df, model, feature_names, levels, n_samples=300, replace=True, seed=7654321, n_cores=None,
+                     weather_df=None, chunk_size=500000, native=True, engine='booster', verbose=True):
+    """
+    Normalises the dataset at several levels of resampled variables in a single pass.
+
+    Every sample draws one set of weather rows (common random numbers), which is used for all the levels,
+    and the levels of a batch of samples are predicted by the same task. The weather data is encoded and
+    published once, the model is kept resident in the workers with `model_session`, and differences between
+    levels are free of the resampling noise between samples.
+    Each level gives the same result as `normalise` with the same `seed` and its `variables_resample`.
+
+    Parameters:
+        df (pandas.DataFrame): Input DataFrame containing the dataset.
+        model (object): Trained ML model, or its handle from `model_session`.
+        feature_names (list of str): List of feature names.
+        levels (dict): Mapping of level name to the list of variables resampled at that level.
+        n_samples (int, optional): Number of samples to normalise. Default is 300.
+        replace (bool, optional): Whether to sample with replacement. Default is True.
+        seed (int, optional): Random seed. Default is 7654321.
+        n_cores (int, optional): Number of CPU cores to use. Default is total CPU cores minus one.
+        weather_df (pandas.DataFrame, optional): DataFrame containing weather data for resampling. Default is None.
+        chunk_size (int, optional): Number of rows predicted per model call. Default is 500000.
+        native (bool, optional): Whether to predict with the underlying estimator directly, bypassing
+                                 `AutoML.predict`, when it is supported. Default is True.
+        engine (str, optional): Prediction engine of the underlying estimator, see `normalise`. Default is 'booster'.
+        verbose (bool, optional): Whether to print progress messages. Default is True.
+
+    Returns:
+        pd.DataFrame: DataFrame indexed by date with the 'observed' values and one column of normalised
+                      values per level.
+
+    Example:
+        >>> levels = {'base': ['date_unix', 'temp', 'ws'], 'date_unix': ['temp', 'ws']}
+        >>> df_levels = normalise_levels(df, model, feature_names, levels, n_samples=100)
+    """
+
+    # Process input DataFrames
+    df = (df.pipe(process_date)
+            .pipe(check_data, feature_names, 'value'))
+
+    # If no weather_df is provided, use df as the weather data
+    if weather_df is None:
+        weather_df = df
+
+    # Resample the union of the variables of all levels from one weather block
+    weather_vars = [var for var in feature_names if any(var in level for level in levels.values())]
+    if not all(var in weather_df.columns for var in weather_vars):
+        raise ValueError("The input weather_df does not contain all variables within `levels`.")
+
+    level_columns = [([feature_names.index(var) for var in weather_vars if var in level],
+                      [j for j, var in enumerate(weather_vars) if var in level]) for level in levels.values()]
+
+    # Derive one independent seed per sample, so results do not depend on batching or the number of cores
+    random_seeds = spawn_seeds(seed, n_samples)
+
+    # Determine number of CPU cores to use
+    n_cores = n_cores if n_cores is not None else os.cpu_count() - 1
+
+    if verbose:
+        print(pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'), ": Normalising", len(levels),
+              "levels of the dataset using the trained model in parallel.")
+
+    X, categories = encode_features(df, feature_names)
+    X_weather, _ = encode_features(weather_df, weather_vars, categories)
+    date_codes, dates = pd.factorize(df['date'], sort=True)
+
+    batches = np.array_split(np.arange(n_samples), min(n_samples, effective_n_jobs(n_cores)))
+
+    # Keep the model resident in the workers, across calls too when `model` is the handle of a session
+    with shared_folder() as folder, model_session(model) as model_handle:
+        X_shared = share_array(X, folder)
+        X_weather_shared = share_array(X_weather, folder)
+
+        accumulators = [init_accumulator(date_codes, len(dates)) for _ in levels]
+        for batch_accumulators in Parallel(n_jobs=n_cores, return_as='generator')(delayed(normalise_batch_worker)(
+                X=X_shared, X_weather=X_weather_shared, seeds=random_seeds[batch], model=model_handle,
+                feature_names=feature_names, resample_columns=None, categories=categories, replace=replace,
+                chunk_size=chunk_size, accumulator=[init_accumulator(date_codes, len(dates)) for _ in levels],
+                native=native, engine=engine, levels=level_columns) for batch in batches):
+            accumulators = [merge_accumulators(acc, batch_acc)
+                            for acc, batch_acc in zip(accumulators, batch_accumulators)]
+
+    df_result = pd.DataFrame({'observed': df['value'].groupby(date_codes).mean().values},
+                             index=pd.Index(dates, name='date'))
+    for name, acc in zip(levels, accumulators):
+        df_result[name] = acc['mean']
+
+    return df_result
+
+
 def do_all(df=None, model=None, value=None, feature_names=None, variables_resample=None, split_method='random', fraction=0.75,
-           model_config=None, n_samples=300, seed=7654321, n_cores=None, aggregate=True, weather_df=None, verbose=True):
+           model_config=None, n_samples=300, seed=7654321, n_cores=None, aggregate=True, weather_df=None, cache_dir=None,
+           verbose=True):
     """
     Conducts data preparation, model training, and normalisation, returning the transformed dataset and model statistics.
 
@@ -554,6 +2041,8 @@ def do_all(df=None, model=None, value=None, feature_names=None, variables_resamp
         seed (int, optional): Seed for random operations. Default is 7654321.
         n_cores (int, optional): Number of CPU cores to be used for normalisation. Default is total CPU cores minus one.
         weather_df (pandas.DataFrame, optional): DataFrame containing weather data for resampling. Default is None.
+        cache_dir (str, optional): Directory of the on-disk model cache used when a new model is trained, see
+                                   `cached_prepare_train_model`. Default is None (no caching).
         verbose (bool, optional): Whether to print progress messages. Default is True.
 
     Returns:
@@ -570,10 +2059,11 @@ def do_all(df=None, model=None, value=None, feature_names=None, variables_resamp
     """
     # Train model if not provided
     if model is None:
-        df, model= prepare_train_model(df, value, feature_names, split_method, fraction, model_config, seed, verbose)
-
-    # Collect model statistics
-    mod_stats = modStats(df, model)
+        df, model, mod_stats = cached_prepare_train_model(df, value, feature_names, split_method, fraction, model_config,
+                                                          seed, verbose, cache_dir=cache_dir)
+    else:
+        # Collect model statistics
+        mod_stats = modStats(df, model)
 
     # Default logic for cpu cores
     n_cores = n_cores if n_cores is not None else os.cpu_count() - 1
@@ -586,10 +2076,21 @@ def do_all(df=None, model=None, value=None, feature_names=None, variables_resamp
 
 
 def do_all_unc(df=None, value=None, feature_names=None, variables_resample=None, split_method='random', fraction=0.75,
-               model_config=None, n_samples=300, n_models=10, confidence_level=0.95, seed=7654321, n_cores=None, weather_df=None, verbose=True):
+               model_config=None, n_samples=300, n_models=10, confidence_level=0.95, seed=7654321, n_cores=None, weather_df=None,
+               n_parallel_models=None, warm_start=None, fixed_config=False, verbose=True):
     """
     Performs uncertainty quantification by training multiple models with different random seeds and calculates statistical metrics.
 
+    The seed models are trained and normalised concurrently: the core budget `n_cores` is split between
+    `n_parallel_models` model tasks and the FLAML `n_jobs` and normalisation cores of each task, so that the
+    training of one model overlaps with the normalisation of another. Inside a model task, joblib runs the
+    `normalise` batches on its threading backend, so its share of the cores is only used by estimators that
+    release the GIL while predicting, such as LightGBM and XGBoost.
+
+    With `warm_start`, the hyperparameter search of every model starts from the best configs of the first
+    model's search (or of a stored model), and with `fixed_config` the later models are fitted once with the
+    best config instead of searching, so that a run costs one search plus `n_models` cheap fits.
+
     Parameters:
         df (pandas.DataFrame): Input dataframe containing the time series data.
         value (str): Column name of the target variable.
@@ -602,41 +2103,73 @@ def do_all_unc(df=None, value=None, feature_names=None, variables_resample=None,
         n_models (int, optional): Number of models to train for uncertainty quantification. Default is 10.
         confidence_level (float, optional): Confidence level for the uncertainty bounds. Default is 0.95.
         seed (int, optional): Random seed for reproducibility. Default is 7654321.
-        n_cores (int, optional): Number of cores to be used. Default is total CPU cores minus one.
+        n_cores (int, optional): Total number of cores to be used. Default is total CPU cores minus one.
         weather_df (pandas.DataFrame, optional): DataFrame containing weather data for resampling. Default is None.
+        n_parallel_models (int, optional): Number of models trained at the same time. If 1, the models are
+                                           trained one after another with all the cores. Default is
+                                           min(n_models, n_cores).
+        warm_start (bool, object or dict, optional): If True, the first model is searched as usual and its best
+                                                     configs warm-start the other models. An AutoML model or a
+                                                     mapping of estimator name to config warm-starts every model.
+                                                     Default is None.
+        fixed_config (bool, optional): Whether the warm-started models are fitted with the best config only,
+                                       skipping the search. Default is False.
         verbose (bool, optional): Whether to print progress messages. Default is True.
 
     Returns:
         tuple:
             - df_dew (pandas.DataFrame): Dataframe with observed values, mean, standard deviation, median, lower and upper bounds, and weighted values.
-            - mod_stats (pandas.DataFrame): Dataframe with model statistics.
+            - mod_stats (pandas.DataFrame): Dataframe with model statistics. The training and normalisation time of every
+                                            model, in seconds, are given in `mod_stats.attrs['timing']`.
     """
 
-    np.random.seed(seed)
-    random_seeds = np.random.choice(np.arange(1000001), size=n_models, replace=False)
+    # Derive one independent seed per model
+    random_seeds = spawn_seeds(seed, n_models)
+
+    # Split the core budget between the concurrent models and the cores of each model
+    n_cores = effective_n_jobs(n_cores if n_cores is not None else os.cpu_count() - 1)
+    n_parallel_models = min(n_models, n_cores) if n_parallel_models is None else max(1, min(n_parallel_models, n_models))
+    model_cores = max(1, n_cores // n_parallel_models)
+
+    # Give FLAML its share of the cores unless it is set explicitly
+    model_config = dict(model_config) if model_config is not None else {}
+    first_config = {**model_config, 'n_jobs': model_config.get('n_jobs', n_cores)}
+    model_config.setdefault('n_jobs', model_cores)
+
+    def run(seeds, n_jobs, model_config, warm_start):
+        tasks = (delayed(do_all_unc_worker)(df, value=value, feature_names=feature_names,
+                                            variables_resample=variables_resample, split_method=split_method,
+                                            fraction=fraction, model_config=model_config, n_samples=n_samples, seed=seed,
+                                            n_cores=max(1, n_cores // n_jobs), weather_df=weather_df,
+                                            warm_start=warm_start, fixed_config=fixed_config and warm_start is not None)
+                 for seed in seeds)
+        if n_jobs > 1:
+            return Parallel(n_jobs=n_jobs, return_as='generator')(tasks)
+        return (function(*args, **kwargs) for function, args, kwargs in tasks)
+
+    # Search the first model with all the cores, then warm-start the others from its best configs
+    if warm_start is True:
+        first = next(run(random_seeds[:1], 1, first_config, None))
+        configs, best_estimator = first[3], first[2]['best_estimator']
+        if fixed_config:
+            configs = {best_estimator: configs[best_estimator]}
+        results = chain([first], run(random_seeds[1:], n_parallel_models, model_config, configs))
+    else:
+        if warm_start is not None and hasattr(warm_start, 'best_config_per_estimator'):
+            warm_start = ({warm_start.best_estimator: warm_start.best_config} if fixed_config
+                          else warm_start.best_config_per_estimator)
+        results = run(random_seeds, n_parallel_models, model_config, warm_start or None)
 
     df_dew_list = []
     mod_stats_list = []
-
-    # Determine number of CPU cores to use
-    n_cores = n_cores if n_cores is not None else os.cpu_count() - 1
+    timing_list = []
 
     start_time = time.time()  # Record start time for ETA calculation
 
-    for i, seed in enumerate(random_seeds):
-        df_dew0, mod_stats0 = do_all(df, value=value, feature_names=feature_names,
-                                     variables_resample=variables_resample,
-                                     split_method=split_method, fraction=fraction,
-                                     model_config=model_config,
-                                     n_samples=n_samples, seed=seed, n_cores=n_cores,
-                                     weather_df=weather_df, verbose=False)
-
-        df_dew0.rename(columns={'normalised': f'normalised_{seed}'}, inplace=True)
-        df_dew0 = df_dew0[['observed', f'normalised_{seed}']]
+    for i, (df_dew0, mod_stats0, timing, _) in enumerate(results):
         df_dew_list.append(df_dew0)
-
-        mod_stats0['seed'] = seed
         mod_stats_list.append(mod_stats0)
+        timing_list.append(timing)
 
         if verbose:
             elapsed_time = time.time() - start_time
@@ -654,12 +2187,12 @@ def do_all_unc(df=None, value=None, feature_names=None, variables_resample=None,
                 remaining_str = "ETA: {:.2f} hours".format(remaining_time / 3600)
 
             print(pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'),
-                  ": Progress: {:.2f}% (Model {}/{})... {}".format(progress_percent, i + 1, n_models, remaining_str))
+                  ": Progress: {:.2f}% (Model {}/{}, trained in {:.1f} s, normalised in {:.1f} s)... {}".format(
+                      progress_percent, i + 1, n_models, timing['train_time'], timing['normalise_time'], remaining_str))
 
     df_dew = pd.concat(df_dew_list, axis=1)
 
     # Keep only the first 'observed' column and drop duplicates
-    observed_columns = [col for col in df_dew.columns if 'observed' in col]
     df_dew = df_dew.loc[:, ~df_dew.columns.duplicated()]
 
     mod_stats = pd.concat(mod_stats_list, ignore_index=True)
@@ -681,11 +2214,63 @@ def do_all_unc(df=None, value=None, feature_names=None, variables_resample=None,
     df_dew_weighted.iloc[:, 1:n_models + 1] = (df_dew.iloc[:, 1:n_models + 1].values * weighted_R2.values[np.newaxis, :]).astype(np.float32)
     df_dew.loc[:,'weighted'] = df_dew_weighted.iloc[:, 1:n_models + 1].sum(axis=1)
 
+    mod_stats.attrs['timing'] = pd.DataFrame(timing_list)
+
     return df_dew, mod_stats
 
 
+def do_all_unc_worker(df, value, feature_names, variables_resample, split_method, fraction, model_config,
+                      n_samples, seed, n_cores, weather_df=None, warm_start=None, fixed_config=False):
+    """
+    Worker function training and normalising one seed model of `do_all_unc`.
+
+    Parameters:
+        df (pandas.DataFrame): Input dataframe containing the time series data.
+        value (str): Column name of the target variable.
+        feature_names (list of str): List of feature column names.
+        variables_resample (list of str): List of sampled feature names for normalisation.
+        split_method (str): Method to split the data.
+        fraction (float): Fraction of data to be used for training.
+        model_config (dict): Configuration dictionary for model training parameters.
+        n_samples (int): Number of samples for normalisation.
+        seed (int): Random seed of the model.
+        n_cores (int): Number of cores used to normalise.
+        weather_df (pandas.DataFrame, optional): DataFrame containing weather data for resampling. Default is None.
+        warm_start (dict, optional): Mapping of estimator name to config to warm-start the search from. Default is None.
+        fixed_config (bool, optional): Whether to fit the config of `warm_start` without searching. Default is False.
+
+    Returns:
+        tuple:
+            - pd.DataFrame: The 'observed' and 'normalised_<seed>' values.
+            - pd.DataFrame: Model statistics with the 'seed' column.
+            - dict: The 'seed', 'best_estimator', 'train_time' and 'normalise_time' in seconds.
+            - dict: The best config of every estimator searched, keyed by estimator name.
+    """
+    start_time = time.time()
+    df, model = prepare_train_model(df, value, feature_names, split_method, fraction, model_config, seed, verbose=False,
+                                    warm_start=warm_start, fixed_config=fixed_config)
+    mod_stats = modStats(df, model)
+    train_time = time.time() - start_time
+
+    start_time = time.time()
+    df_dew = normalise(df, model, feature_names=feature_names, variables_resample=variables_resample, n_samples=n_samples,
+                       n_cores=n_cores, seed=seed, weather_df=weather_df, verbose=False)
+    normalise_time = time.time() - start_time
+
+    df_dew = df_dew.rename(columns={'normalised': f'normalised_{seed}'})[['observed', f'normalised_{seed}']]
+    mod_stats['seed'] = seed
+
+    timing = {'seed': seed, 'best_estimator': model.best_estimator, 'train_time': train_time,
+              'normalise_time': normalise_time}
+
+    best_configs = {estimator: config for estimator, config in model.best_config_per_estimator.items()
+                    if config is not None}
+
+    return df_dew, mod_stats, timing, best_configs
+
+
 def decom_emi(df=None, model=None, value=None, feature_names=None, split_method='random', fraction=0.75,
-             model_config=None, n_samples=300, seed=7654321, n_cores=None, verbose=True):
+             model_config=None, n_samples=300, seed=7654321, n_cores=None, cache_dir=None, verbose=True):
     """
     Decomposes a time series into different components using machine learning models.
 
@@ -700,6 +2285,8 @@ def decom_emi(df=None, model=None, value=None, feature_names=None, split_method=
         n_samples (int, optional): Number of samples for normalisation. Default is 300.
         seed (int, optional): Random seed for reproducibility. Default is 7654321.
         n_cores (int, optional): Number of cores to be used. Default is total CPU cores minus one.
+        cache_dir (str, optional): Directory of the on-disk model cache used when a new model is trained, see
+                                   `cached_prepare_train_model`. Default is None (no caching).
         verbose (bool, optional): Whether to print progress messages. Default is True.
 
     Returns:
@@ -714,10 +2301,11 @@ def decom_emi(df=None, model=None, value=None, feature_names=None, split_method=
         >>> df_dewc, mod_stats = decom_emi(df, value, feature_names)
     """
     if model is None:
-        df, model = prepare_train_model(df, value, feature_names, split_method, fraction, model_config, seed, verbose=True)
-
-    # Gather model statistics for testing, training, and all data
-    mod_stats = modStats(df, model)
+        df, model, mod_stats = cached_prepare_train_model(df, value, feature_names, split_method, fraction, model_config,
+                                                          seed, verbose=verbose, cache_dir=cache_dir)
+    else:
+        # Gather model statistics for testing, training, and all data
+        mod_stats = modStats(df, model)
 
     # Initialize the dataframe for decomposed components
     df_dew = df[['date', 'value']].set_index('date').rename(columns={'value': 'observed'})
@@ -725,31 +2313,21 @@ def decom_emi(df=None, model=None, value=None, feature_names=None, split_method=
     # Default logic for cpu cores
     n_cores = n_cores if n_cores is not None else os.cpu_count() - 1
 
-    # Decompose the time series by excluding different features
+    # Nested exclusion levels: each level stops resampling one more time variable
+    levels = {}
     var_names = feature_names
-    start_time = time.time()  # Initialize start time before the loop
+    for var_to_exclude in ['base', 'date_unix', 'day_julian', 'weekday', 'hour']:
+        var_names = [var for var in var_names if var != var_to_exclude]
+        levels[var_to_exclude] = var_names
 
-    for i, var_to_exclude in enumerate(['base', 'date_unix', 'day_julian', 'weekday', 'hour']):
-        if verbose:
-            if i == 0:
-                print(pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'), f": Subtracting {var_to_exclude}...")
-            else:
-                elapsed_time = time.time() - start_time
-                remaining_time = elapsed_time / i * (len(['base', 'date_unix', 'day_julian', 'weekday', 'hour']) - i)
-                if remaining_time < 60:
-                    eta_str = "ETA: {:.2f} seconds".format(remaining_time)
-                elif remaining_time < 3600:
-                    eta_str = "ETA: {:.2f} minutes".format(remaining_time / 60)
-                else:
-                    eta_str = "ETA: {:.2f} hours".format(remaining_time / 3600)
-                print(pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'), f": Subtracting {var_to_exclude}... {eta_str}")
-
-        var_names = list(set(var_names) - set([var_to_exclude]))
-
-        df_dew_temp = normalise(df, model, feature_names=feature_names, variables_resample=var_names,
-                                n_samples=n_samples, n_cores=n_cores, seed=seed, verbose=False)
+    if verbose:
+        print(pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'), f": Subtracting {', '.join(levels)}...")
 
-        df_dew[var_to_exclude] = df_dew_temp['normalised']
+    # Evaluate every level in one pass with the same resamples
+    df_levels = normalise_levels(df, model, feature_names=feature_names, levels=levels,
+                                 n_samples=n_samples, n_cores=n_cores, seed=seed, verbose=False)
+    for var_to_exclude in levels:
+        df_dew[var_to_exclude] = df_levels[var_to_exclude]
 
     # Adjust the decomposed components to create deweathered values
     df_dew['deweathered'] = df_dew['hour']
@@ -763,10 +2341,16 @@ def decom_emi(df=None, model=None, value=None, feature_names=None, split_method=
 
 
 def decom_met(df=None, model=None, value=None, feature_names=None, split_method='random', fraction=0.75,
-                model_config=None, n_samples=300, seed=7654321, importance_ascending=False, n_cores=None, verbose=True):
+                model_config=None, n_samples=300, seed=7654321, importance_ascending=False, n_cores=None, cache_dir=None,
+                method='resample', verbose=True):
     """
     Decomposes a time series into different components using machine learning models with feature importance ranking.
 
+    With `method='resample'` the contribution of every meteorological variable is the change of the normalised
+    series when the variable is no longer resampled, taking the variables in order of importance. With
+    `method='shap'` the contributions are the TreeSHAP values of the booster, see `native_contributions`, computed
+    in a single pass over the rows without resampling.
+
     Parameters:
         df (pandas.DataFrame): Input dataframe containing the time series data.
         model (object, optional): Pre-trained model to use for decomposition. If None, a new model will be trained. Default is None.
@@ -779,7 +2363,11 @@ def decom_met(df=None, model=None, value=None, feature_names=None, split_method=
         seed (int, optional): Random seed for reproducibility. Default is 7654321.
         importance_ascending (bool, optional): Sort order for feature importances. Default is False.
         n_cores (int, optional): Number of cores to be used. Default is total CPU cores minus one.
-        verbose (bool, optional): Whether to print progress messages. Default is False.
+        cache_dir (str, optional): Directory of the on-disk model cache used when a new model is trained, see
+                                   `cached_prepare_train_model`. Default is None (no caching).
+        method (str, optional): Attribution method, 'resample' or 'shap'. 'shap' requires a LightGBM or XGBoost
+                                best estimator. Default is 'resample'.
+        verbose (bool, optional): Whether to print progress messages. Default is True.
 
     Returns:
         df_dewwc (pandas.DataFrame): Dataframe with decomposed components.
@@ -790,47 +2378,61 @@ def decom_met(df=None, model=None, value=None, feature_names=None, split_method=
         >>> value = 'target'
         >>> feature_names = ['feature1', 'feature2', 'feature3']
         >>> df_dewwc, mod_stats = decom_met(df, value, feature_names)
+        >>> df_shap, mod_stats = decom_met(df, value=value, feature_names=feature_names, method='shap')
     """
-    if model is None:
-        df, model = prepare_train_model(df, value, feature_names, split_method, fraction, model_config, seed, verbose=True)
+    if method not in ('resample', 'shap'):
+        raise ValueError("`method` must be 'resample' or 'shap'.")
 
-    # Gather model statistics for testing, training, and all data
-    mod_stats = modStats(df, model)
+    if model is None:
+        df, model, mod_stats = cached_prepare_train_model(df, value, feature_names, split_method, fraction, model_config,
+                                                          seed, verbose=verbose, cache_dir=cache_dir)
+    else:
+        # Gather model statistics for testing, training, and all data
+        mod_stats = modStats(df, model)
 
     # Determine feature importances and sort them
-    modelfi = pd.DataFrame(data={'feature_importances': model.feature_importances_},
-                            index=model.feature_names_in_).sort_values('feature_importances', ascending=importance_ascending)
+    modelfi = pd.DataFrame(data={'feature_importances': load_model(model).feature_importances_},
+                            index=load_model(model).feature_names_in_).sort_values('feature_importances', ascending=importance_ascending)
 
     # Initialize the dataframe for decomposed components
     df_deww = df[['date', 'value']].set_index('date').rename(columns={'value': 'observed'})
     met_list = ['deweathered'] + [item for item in modelfi.index if item not in ['hour', 'weekday', 'day_julian', 'date_unix']]
     var_names = [item for item in modelfi.index if item not in ['hour', 'weekday', 'day_julian', 'date_unix']]
 
+    if method == 'shap':
+        if verbose:
+            print(pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'), ": Computing TreeSHAP contributions...")
+
+        # Per-row contributions, averaged per timestamp like the normalised series
+        contributions = native_contributions(model, df).groupby(df['date'].to_numpy()).mean()
+        contributions.index.name = 'date'
+        prediction = contributions.sum(axis=1)
+
+        df_dewwc = df_deww.groupby(level='date').mean()
+        df_dewwc['deweathered'] = prediction - contributions[var_names].sum(axis=1)
+        for param in var_names:
+            df_dewwc[param] = contributions[param]
+        df_dewwc['met_noise'] = df_dewwc['observed'] - prediction
+
+        return df_dewwc, mod_stats
+
     # Default logic for cpu cores
     n_cores = n_cores if n_cores is not None else os.cpu_count() - 1
 
-    # Decompose the time series by excluding different features based on their importance
-    start_time = time.time()  # Initialize start time before the loop
-    for i, var_to_exclude in enumerate(met_list):
-        if verbose:
-            if i == 0:
-                print(pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'), f": Subtracting {var_to_exclude}...")
-            else:
-                elapsed_time = time.time() - start_time
-                remaining_time = elapsed_time / i * (len(met_list) - i)
-                if remaining_time < 60:
-                    eta_str = "ETA: {:.2f} seconds".format(remaining_time)
-                elif remaining_time < 3600:
-                    eta_str = "ETA: {:.2f} minutes".format(remaining_time / 60)
-                else:
-                    eta_str = "ETA: {:.2f} hours".format(remaining_time / 3600)
-                print(pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'), f": Subtracting {var_to_exclude}... {eta_str}")
+    # Nested exclusion levels based on the importance of the meteorological features
+    levels = {}
+    for var_to_exclude in met_list:
+        var_names = [var for var in var_names if var != var_to_exclude]
+        levels[var_to_exclude] = var_names
 
-        var_names = list(set(var_names) - set([var_to_exclude]))
+    if verbose:
+        print(pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'), f": Subtracting {', '.join(levels)}...")
 
-        df_dew_temp = normalise(df, model, feature_names=feature_names, variables_resample=var_names,
-                                n_samples=n_samples, n_cores=n_cores, seed=seed, verbose=False)
-        df_deww[var_to_exclude] = df_dew_temp['normalised']
+    # Evaluate every level in one pass with the same resamples
+    df_levels = normalise_levels(df, model, feature_names=feature_names, levels=levels,
+                                 n_samples=n_samples, n_cores=n_cores, seed=seed, verbose=False)
+    for var_to_exclude in levels:
+        df_deww[var_to_exclude] = df_levels[var_to_exclude]
 
     # Adjust the decomposed components to create weather-independent values
     df_dewwc = df_deww.copy()
@@ -845,16 +2447,103 @@ def decom_met(df=None, model=None, value=None, feature_names=None, split_method=
     return df_dewwc, mod_stats
 
 
+def rolling_windows(dates, window_days=14, rolling_every=7):
+    """
+    Computes the row range of every rolling window of a date-sorted series in one pass.
+
+    Windows start on every `rolling_every`-th day present in the data and span `window_days` days after
+    their first day, inclusive. The bounds are found with `searchsorted` on the int64 timestamps.
+
+    Parameters:
+        dates (pandas.Series or numpy.ndarray): Sorted datetime values.
+        window_days (int, optional): Number of days for the rolling window. Default is 14.
+        rolling_every (int, optional): Rolling interval in days. Default is 7.
+
+    Returns:
+        pd.DataFrame: One row per window with its 'start' and 'stop' row positions and its first and last
+                      dates ('date_start', 'date_end').
+    """
+    timestamps = np.asarray(dates, dtype='datetime64[ns]').astype(np.int64)
+    day = np.int64(86400 * 10**9)
+    days = np.unique(timestamps - timestamps % day)
+
+    # Windows must start at least `window_days - 1` days before the last day
+    first_days = days[days <= days[-1] - (window_days - 1) * day][::rolling_every] if len(days) else days
+
+    starts = np.searchsorted(timestamps, first_days, side='left')
+    stops = np.searchsorted(timestamps, first_days + (window_days + 1) * day, side='left')
+
+    return pd.DataFrame({
+        'start': starts,
+        'stop': stops,
+        'date_start': pd.to_datetime(timestamps[starts]) if len(starts) else pd.to_datetime([]),
+        'date_end': pd.to_datetime(timestamps[stops - 1]) if len(stops) else pd.to_datetime([])
+    })
+
+
+def rolling_worker(X, model, feature_names, resample_columns, categories, date_codes, tasks, seeds, replace=True,
+                   chunk_size=500000, native=True, engine='booster'):
+    """
+    Worker function normalising a group of (rolling window, batch of samples) tasks.
+
+    The window rows are sliced from the shared input block and resampled within the window, with the
+    same draws as `normalise` on the window for the same seeds.
+
+    Parameters:
+        X (numpy.ndarray or dict): Encoded input block of the date-sorted data, or its handle.
+        model (object or dict): Trained ML model, or its handle from `model_session`.
+        feature_names (list of str): Column names of `X`.
+        resample_columns (list of int): Positions in `feature_names` of the resampled variables.
+        categories (dict): Mapping of categorical column name to its categories.
+        date_codes (numpy.ndarray): Sorted integer date code of every row of `X`.
+        tasks (list of tuple): (window, start, stop, samples) tuples.
+        seeds (numpy.ndarray): Seed of every sample.
+        replace (bool, optional): Whether to sample with replacement. Default is True.
+        chunk_size (int, optional): Number of rows predicted per model call. Default is 500000.
+        native (bool, optional): Whether to predict with the native estimator. Default is True.
+        engine (str, optional): Prediction engine of the native estimator, see `native_predictor`.
+                                Default is 'booster'.
+
+    Returns:
+        list of tuple: (window, accumulator, error) per task, with the accumulator over the window dates
+                       or the error message if the window failed.
+    """
+    X = load_shared(X)
+    results = []
+
+    for window, start, stop, samples in tasks:
+        try:
+            if stop <= start:
+                raise ValueError("The window contains no rows.")
+            X_window = X[start:stop]
+            codes = date_codes[start:stop] - date_codes[start]
+            accumulator = normalise_batch_worker(
+                X_window, X_window[:, resample_columns], seeds[samples], model, feature_names, resample_columns,
+                categories, replace=replace, chunk_size=chunk_size,
+                accumulator=init_accumulator(codes, codes[-1] + 1), native=native, engine=engine)
+            results.append((window, accumulator, None))
+        except Exception as e:
+            results.append((window, None, f"{type(e).__name__}: {e}"))
+
+    return results
+
+
 def rolling(df=None, model=None, value=None, feature_names=None, variables_resample=None, split_method='random', fraction=0.75,
-            model_config=None, n_samples=300, window_days=14, rolling_every=7, seed=7654321, n_cores=None, verbose=True):
+            model_config=None, n_samples=300, window_days=14, rolling_every=7, seed=7654321, n_cores=None, chunk_size=500000,
+            native=True, engine='booster', cache_dir=None, verbose=True):
     """
     Applies a rolling window approach to decompose the time series into different components using machine learning models.
 
+    The row range of every window is computed once on the date-sorted data (see `rolling_windows`), the
+    (window, batch of samples) tasks are spread across the cores, and the normalised means are written into
+    a preallocated (dates x windows) array. Each window gives the same result as `normalise` on its rows.
+
     Parameters:
         df (pandas.DataFrame): Input dataframe containing the time series data.
         model (object, optional): Pre-trained model to use for decomposition. If None, a new model will be trained. Default is None.
         value (str): Column name of the target variable.
         feature_names (list of str): List of feature column names.
+        variables_resample (list of str, optional): List of resampling variables. Default is all features except 'date_unix'.
         split_method (str, optional): Method to split the data ('random' or other methods). Default is 'random'.
         fraction (float, optional): Fraction of data to be used for training. Default is 0.75.
         model_config (dict, optional): Configuration dictionary for model training parameters.
@@ -863,10 +2552,20 @@ def rolling(df=None, model=None, value=None, feature_names=None, variables_resam
         rolling_every (int, optional): Rolling interval in days. Default is 7.
         seed (int, optional): Random seed for reproducibility. Default is 7654321.
         n_cores (int, optional): Number of cores to be used. Default is total CPU cores minus one.
+        chunk_size (int, optional): Number of rows predicted per model call. Default is 500000.
+        native (bool, optional): Whether to predict with the underlying estimator directly, bypassing
+                                 `AutoML.predict`, when it is supported. Default is True.
+        engine (str, optional): Prediction engine of the underlying estimator, see `normalise`. 'numpy' or
+                                'numpy32' evaluate the flattened trees of the model, which avoids the booster
+                                call overhead on the small windows. Default is 'booster'.
+        cache_dir (str, optional): Directory of the on-disk model cache used when a new model is trained, see
+                                   `cached_prepare_train_model`. Default is None (no caching).
         verbose (bool, optional): Whether to print progress messages. Default is True.
 
     Returns:
-        df_dew (pandas.DataFrame): Dataframe with decomposed components.
+        df_dew (pandas.DataFrame): Dataframe with the observed values and one 'rolling_<i>' column per window. The
+                                   failed windows are left as NaN and listed in `df_dew.attrs['errors']`, a
+                                   DataFrame with the 'window', its row range, dates and 'error' message.
         mod_stats (pandas.DataFrame): Dataframe with model statistics.
 
     Example:
@@ -876,63 +2575,222 @@ def rolling(df=None, model=None, value=None, feature_names=None, variables_resam
         >>> df_dew, mod_stats = rolling(df, value, feature_names, window_days=14, rolling_every=2)
     """
     if model is None:
-        df, model = prepare_train_model(df, value, feature_names, split_method, fraction, model_config, seed, verbose=True)
+        df, model, mod_stats = cached_prepare_train_model(df, value, feature_names, split_method, fraction, model_config,
+                                                          seed, verbose=verbose, cache_dir=cache_dir)
+    else:
+        # Gather model statistics for testing, training, and all data
+        mod_stats = modStats(df, model)
+
+    # Default logic for CPU cores
+    n_cores = n_cores if n_cores is not None else os.cpu_count() - 1
+
+    # Sort by date once so that every window is a contiguous range of rows
+    df = (df.pipe(process_date)
+            .pipe(check_data, feature_names, 'value')
+            .sort_values('date', kind='stable')
+            .reset_index(drop=True))
+
+    if variables_resample is None:
+        variables_resample = [var for var in feature_names if var != 'date_unix']
+
+    windows = rolling_windows(df['date'], window_days=window_days, rolling_every=rolling_every)
+    date_codes, dates = pd.factorize(df['date'], sort=True)
+
+    # Spread the (window, batch of samples) tasks over the cores, splitting the samples when windows are few
+    random_seeds = spawn_seeds(seed, n_samples)
+    n_jobs = effective_n_jobs(n_cores)
+    n_splits = min(n_samples, max(1, -(-n_jobs // max(len(windows), 1))))
+    tasks = [(w, start, stop, batch) for w, (start, stop) in enumerate(zip(windows['start'], windows['stop']))
+             for batch in np.array_split(np.arange(n_samples), n_splits)]
+    task_groups = [group for group in np.array_split(np.arange(len(tasks)), min(len(tasks), 4 * n_jobs)) if len(group)]
+
+    X, categories = encode_features(df, feature_names)
+    resample_columns = [feature_names.index(var) for var in variables_resample]
+
+    # Preallocated (dates x windows) results
+    normalised = np.full((len(dates), len(windows)), np.nan)
+    accumulators = {}
+    errors = {}
+
+    with shared_folder() as folder, model_session(model) as model_handle:
+        X_shared = share_array(X, folder)
+        for results in Parallel(n_jobs=n_cores, return_as='generator')(delayed(rolling_worker)(
+                X=X_shared, model=model_handle, feature_names=feature_names, resample_columns=resample_columns,
+                categories=categories, date_codes=date_codes, tasks=[tasks[t] for t in group], seeds=random_seeds,
+                chunk_size=chunk_size, native=native, engine=engine) for group in task_groups):
+            for window, accumulator, error in results:
+                if error is not None:
+                    errors[window] = error
+                elif window not in errors:
+                    accumulators[window] = (merge_accumulators(accumulators[window], accumulator)
+                                            if window in accumulators else accumulator)
+
+    for window, row in windows.iterrows():
+        if window in errors:
+            if verbose:
+                print(f"{time.strftime('%Y-%m-%d %H:%M:%S')}: Error during normalization for rolling window {window} from {row['date_start'].strftime('%Y-%m-%d')} to {row['date_end'].strftime('%Y-%m-%d')}: {errors[window]}")
+            continue
+        first = date_codes[row['start']]
+        normalised[first:first + len(accumulators[window]['mean']), window] = accumulators[window]['mean']
+        if verbose and (window % 10 == 0):
+            print(f"{time.strftime('%Y-%m-%d %H:%M:%S')}: Rolling window {window} from {row['date_start'].strftime('%Y-%m-%d')} to {row['date_end'].strftime('%Y-%m-%d')}")
+
+    # Keep the dates covered by at least one window
+    covered = np.zeros(len(dates), dtype=bool)
+    for start, stop in zip(windows['start'], windows['stop']):
+        covered[date_codes[start]:date_codes[stop - 1] + 1] = True
+
+    combined_results = pd.DataFrame(normalised[covered], index=pd.Index(dates[covered], name='date'),
+                                    columns=[f'rolling_{w}' for w in range(len(windows))])
+    combined_results.insert(0, 'observed', df['value'].groupby(date_codes).mean().values[covered])
+
+    # Structured table of the failed windows
+    combined_results.attrs['errors'] = (windows.loc[sorted(errors)]
+                                        .assign(error=[errors[w] for w in sorted(errors)])
+                                        .rename_axis('window').reset_index())
+
+    return combined_results, mod_stats
+
+
+def batch_all(df, value, feature_names, method='do_all', code_col='code', n_cores=None, n_parallel_sites=None,
+              result_dir=None, verbose=True, **kwargs):
+    """
+    Runs `do_all`, `decom_emi` or `decom_met` for every site of a long panel in parallel.
+
+    The sites are packed onto a process pool, largest first, and the core budget `n_cores` is split between
+    the `n_parallel_sites` concurrent sites, each site using its share for FLAML and the normalisation. A
+    failing site does not stop the others. Each site's results are written to `result_dir` as soon as it
+    completes.
+
+    Parameters:
+        df (pandas.DataFrame): Input DataFrame containing the data of all the sites.
+        value (str): Column name of the target variable.
+        feature_names (list of str): List of feature column names.
+        method (str, optional): Function applied to every site: 'do_all', 'decom_emi' or 'decom_met'.
+                                Default is 'do_all'.
+        code_col (str, optional): Name of the column containing the site codes. Default is 'code'.
+        n_cores (int, optional): Total number of CPU cores to use. Default is total CPU cores minus one.
+        n_parallel_sites (int, optional): Number of sites processed at the same time. Default is
+                                          min(number of sites, n_cores).
+        result_dir (str, optional): Directory where '<code>_<method>.csv' and '<code>_mod_stats.csv' are written
+                                    as every site completes. Default is None.
+        verbose (bool, optional): Whether to print progress messages. Default is True.
+        **kwargs: Other arguments passed to `method`, e.g. `model_config`, `n_samples` or `seed`.
+
+    Returns:
+        tuple:
+            - pd.DataFrame: Long-format results with columns `code_col`, 'date', 'variable' and 'value'.
+            - pd.DataFrame: Model statistics of every site, with the `code_col` column. The failed sites and their
+                            error messages are given in `attrs['errors']`.
+
+    Example Usage:
+        # Deweather every site of the panel, two sites at a time
+        df_long, mod_stats = batch_all(df, value='PM2.5', feature_names=feature_names, method='do_all',
+                                       n_cores=8, n_parallel_sites=2, model_config={'time_budget': 60})
+    """
+    methods = {'do_all': do_all, 'decom_emi': decom_emi, 'decom_met': decom_met}
+    if method not in methods:
+        raise ValueError("`method` must be one of 'do_all', 'decom_emi' or 'decom_met'.")
+
+    # Split the core budget between the concurrent sites
+    n_cores = effective_n_jobs(n_cores if n_cores is not None else os.cpu_count() - 1)
+    groups = df.groupby(code_col, sort=False)
+    sizes = groups.size().sort_values(ascending=False, kind='stable')
+    n_parallel_sites = min(len(sizes), n_cores) if n_parallel_sites is None else max(1, min(n_parallel_sites, len(sizes)))
+    site_cores = max(1, n_cores // max(n_parallel_sites, 1))
 
-    # Gather model statistics for testing, training, and all data
-    mod_stats = modStats(df, model)
+    if result_dir is not None:
+        os.makedirs(result_dir, exist_ok=True)
 
-    # Default logic for CPU cores
-    n_cores = n_cores if n_cores is not None else os.cpu_count() - 1
+    if verbose:
+        print(pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'), f": Running {method} for {len(sizes)} sites,",
+              n_parallel_sites, "at a time with", site_cores, "cores each...")
 
-    df['date_d'] =df['date'].dt.date
+    # Largest sites first, so that the small ones fill the gaps at the end
+    tasks = (delayed(batch_worker)(groups.get_group(code), code, methods[method], value, feature_names, site_cores, kwargs)
+             for code in sizes.index)
+    results = (Parallel(n_jobs=n_parallel_sites, return_as='generator_unordered')(tasks) if n_parallel_sites > 1
+               else (function(*args, **func_kwargs) for function, args, func_kwargs in tasks))
 
-    # Define the rolling window range
-    date_max = pd.to_datetime(df['date_d'].max() - pd.DateOffset(days=window_days - 1))
-    date_min = pd.to_datetime(df['date_d'].min() + pd.DateOffset(days=window_days - 1))
+    results_list = []
+    mod_stats_list = []
+    errors = []
 
-    rolling_dates = pd.to_datetime(df['date_d'][df['date_d'] <= date_max.date()]).unique()[::rolling_every]
+    for i, (code, df_result, mod_stats, error, elapsed_time) in enumerate(results):
+        if error is not None:
+            errors.append({code_col: code, 'error': error})
+            if verbose:
+                print(pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'), f": Site {code} failed: {error}")
+            continue
 
-    # Initialize a list to store the results of each rolling window
-    combined_results = pd.DataFrame()
+        df_long = (df_result.rename_axis('date').reset_index()
+                   .melt(id_vars='date', var_name='variable', value_name='value'))
+        df_long.insert(0, code_col, code)
+        mod_stats.insert(0, code_col, code)
+        results_list.append(df_long)
+        mod_stats_list.append(mod_stats)
 
-    # Apply the rolling window approach
-    for i, ds in enumerate(rolling_dates):
-        dfa = df[df['date_d'] >= ds.date()]
-        dfa = dfa[dfa['date_d'] <= (dfa['date_d'].min() + pd.DateOffset(days=window_days)).date()]
+        if result_dir is not None:
+            df_result.to_csv(os.path.join(result_dir, f"{code}_{method}.csv"))
+            mod_stats.to_csv(os.path.join(result_dir, f"{code}_mod_stats.csv"), index=False)
 
-        try:
-            # Normalize the data within the rolling window
-            dfar = normalise(dfa, model, feature_names=feature_names, variables_resample=variables_resample, n_samples=n_samples,
-                             n_cores=n_cores, seed=seed, verbose=False)
+        if verbose:
+            print(pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'),
+                  ": Site {} done in {:.1f} s ({}/{})".format(code, elapsed_time, i + 1, len(sizes)))
 
-            # Rename the 'normalised' column to include the rolling window index
-            dfar.rename(columns={'normalised': 'rolling_' + str(i)}, inplace=True)
+    df_all = (pd.concat(results_list, ignore_index=True) if results_list
+              else pd.DataFrame(columns=[code_col, 'date', 'variable', 'value']))
+    mod_stats_all = pd.concat(mod_stats_list, ignore_index=True) if mod_stats_list else pd.DataFrame(columns=[code_col])
+    mod_stats_all.attrs['errors'] = pd.DataFrame(errors, columns=[code_col, 'error'])
 
-            # Merge the results of the current rolling window with the overall results
-            if combined_results.empty:
-                combined_results = dfar
-            else:
-                combined_results = pd.concat([combined_results, dfar['rolling_' + str(i)]], axis=1)
+    return df_all, mod_stats_all
 
-            if verbose and (i % 10 == 0):
-                print(f"{time.strftime('%Y-%m-%d %H:%M:%S')}: Rolling window {i} from {dfa['date'].min().strftime('%Y-%m-%d')} to {dfa['date'].max().strftime('%Y-%m-%d')}")
 
-        except Exception as e:
-            if verbose:
-                print(f"{time.strftime('%Y-%m-%d %H:%M:%S')}: Error during normalization for rolling window {i} from {dfa['date'].min().strftime('%Y-%m-%d')} to {dfa['date'].max().strftime('%Y-%m-%d')}: {str(e)}")
+def batch_worker(df, code, function, value, feature_names, n_cores, kwargs):
+    """
+    Worker function running one site of `batch_all`, returning the error instead of raising it.
 
-    return combined_results, mod_stats
+    Parameters:
+        df (pandas.DataFrame): Data of the site.
+        code (str): Site code.
+        function (callable): `do_all`, `decom_emi` or `decom_met`.
+        value (str): Column name of the target variable.
+        feature_names (list of str): List of feature column names.
+        n_cores (int): Number of cores used by the site.
+        kwargs (dict): Other arguments passed to `function`.
+
+    Returns:
+        tuple: (code, results, model statistics, error message or None, elapsed time in seconds).
+    """
+    start_time = time.time()
+    kwargs = dict(kwargs)
+    kwargs['model_config'] = {'n_jobs': n_cores, **(kwargs.get('model_config') or {})}
 
+    # Keep a DatetimeIndex as the date column, as `process_date` does
+    df = df.reset_index() if isinstance(df.index, pd.DatetimeIndex) else df.reset_index(drop=True)
 
-def modStats(df, model, set=None, statistic=None):
+    try:
+        df_result, mod_stats = function(df=df, value=value, feature_names=feature_names,
+                                        n_cores=n_cores, verbose=False, **kwargs)
+    except Exception as e:
+        return code, None, None, f"{type(e).__name__}: {e}", time.time() - start_time
+
+    return code, df_result, mod_stats, None, time.time() - start_time
+
+
+def modStats(df, model, set=None, statistic=None, bootstrap=None, ci=0.95, seed=7654321):
     """
     Calculates statistics for model evaluation based on provided data.
 
     Parameters:
         df (pandas.DataFrame): Input DataFrame containing the dataset.
-        model (object): Trained ML model.
+        model (object): Trained ML model, or its handle from `model_session`.
         set (str, optional): Set type for which statistics are calculated ('training', 'testing', or 'all'). Default is None.
         statistic (list of str, optional): List of statistics to calculate. Default is ["n", "FAC2", "MB", "MGE", "NMB", "NMGE", "RMSE", "r", "COE", "IOA", "R2"].
+        bootstrap (int, optional): Number of bootstrap replicates for confidence intervals, see `bootstrap_stats`.
+                                   Default is None, point estimates only.
+        ci (float, optional): Confidence level of the bootstrap intervals. Default is 0.95.
+        seed (int, optional): Random seed of the bootstrap resampling. Default is 7654321.
 
     Returns:
         pd.DataFrame: DataFrame containing calculated statistics.
@@ -941,40 +2799,49 @@ def modStats(df, model, set=None, statistic=None):
         >>> df = pd.read_csv('timeseries_data.csv')
         >>> model = train_model(df, 'target', feature_names)
         >>> stats = modStats(df, model, set='testing')
+        >>> stats_ci = modStats(df, model, bootstrap=1000)
     """
-    if statistic is None:
-        statistic = ["n", "FAC2", "MB", "MGE", "NMB", "NMGE", "RMSE", "r", "COE", "IOA", "R2"]
-
-    def calculate_stats(df, set_name=None):
-        if set_name is not None:
-            if 'set' in df.columns:
-                df = df[df['set'] == set_name]
-            else:
-                raise ValueError(f"The DataFrame does not contain the 'set' column but 'set' parameter was provided as '{set_name}'.")
-
-        df = df.assign(value_predict=model.predict(df))
-        df_stats = Stats(df, mod="value_predict", obs="value", statistic=statistic).assign(set=set_name)
-        return df_stats
+    model = load_model(model)
 
     if set is None:
-        if 'set' in df.columns:
-            sets = df['set'].unique()
-            stats_list = [calculate_stats(df, s) for s in sets]
-            # Add statistics for the whole dataset with 'set' as "all"
-            df_all = df.copy()
-            df_all['set'] = 'all'
-            stats_list.append(calculate_stats(df_all, 'all'))
-            df_stats = pd.concat(stats_list, ignore_index=True)
-        else:
+        if 'set' not in df.columns:
             raise ValueError("The DataFrame does not contain the 'set' column and 'set' parameter was not provided.")
+        # Predict every row once and evaluate each set and the whole dataset from the same predictions
+        sets = df['set'].astype('category').cat.remove_unused_categories()
+        mod = model_predict(model, df)
+        obs = df['value'].to_numpy(dtype=np.float64)
+        codes = sets.cat.codes.to_numpy()
+        order = pd.unique(codes[codes >= 0])
+        set_names = [str(s) for s in sets.cat.categories[order]] + ['all']
+
+        df_stats = pd.concat([stats_frame(stats_kernel(mod, obs, codes, len(sets.cat.categories), statistic))
+                              .iloc[order],
+                              stats_frame(stats_kernel(mod, obs, statistic=statistic))],
+                             ignore_index=True)
+        set_values = [(mod[codes == code], obs[codes == code]) for code in order] + [(mod, obs)]
     else:
-        df_stats = calculate_stats(df, set)
+        if set != 'all':
+            if 'set' not in df.columns:
+                raise ValueError(f"The DataFrame does not contain the 'set' column but 'set' parameter was provided as '{set}'.")
+            df = df[set_mask(df, set)]
+        mod = model_predict(model, df)
+        obs = df['value'].to_numpy(dtype=np.float64)
+        set_names = [set]
+
+        df_stats = stats_frame(stats_kernel(mod, obs, statistic=statistic))
+        set_values = [(mod, obs)]
+
+    if bootstrap:
+        # Confidence intervals of every set from its own resamples
+        df_ci = pd.concat([bootstrap_stats(set_mod, set_obs, n_boot=bootstrap, ci=ci, seed=seed, statistic=statistic)
+                           for set_mod, set_obs in set_values], ignore_index=True)
+        df_stats = pd.concat([df_stats, df_ci], axis=1)
 
-    return df_stats
+    return df_stats.assign(set=set_names)
 
 
 def Stats(df, mod, obs,
-             statistic = None):
+             statistic = None, groupby = None):
     """
     Calculates specified statistics based on provided data.
 
@@ -983,55 +2850,195 @@ def Stats(df, mod, obs,
         mod (str): Column name of the model predictions.
         obs (str): Column name of the observed values.
         statistic (list): List of statistics to calculate.
+        groupby (str or list of str, optional): Column(s) to evaluate the statistics by, e.g. set, site, seed or
+                                                rolling window. Default is None.
 
     Returns:
-        DataFrame: DataFrame containing calculated statistics.
+        DataFrame: DataFrame containing calculated statistics, one row per group with the group columns last.
     """
+    mod_values = df[mod].to_numpy(dtype=np.float64)
+    obs_values = df[obs].to_numpy(dtype=np.float64)
 
+    if groupby is None:
+        return stats_frame(stats_kernel(mod_values, obs_values, statistic=statistic))
+
+    grouped = df.groupby(groupby, sort=False, observed=True)
+    keys = grouped.size().index.to_frame(index=False)
+    # Rows with a missing group key have no group and are skipped
+    codes = grouped.ngroup().fillna(-1).to_numpy(dtype=np.int64)
+    res = stats_kernel(mod_values, obs_values, codes, len(keys), statistic)
+
+    return pd.concat([stats_frame(res), keys], axis=1)
+
+
+def stats_kernel(mod, obs, groups=None, n_groups=None, statistic=None):
+    """
+    Calculates the model evaluation statistics of one or more groups from a single pair of arrays.
+
+    All statistics are derived from shared per-group sums: the sums of the values, of the differences and of
+    their absolute values in a first pass, and the centred squared and cross products and absolute deviations
+    in a second pass. Pairs where either value is missing are skipped.
+
+    Parameters:
+        mod (numpy.ndarray): Model predictions.
+        obs (numpy.ndarray): Observed values.
+        groups (numpy.ndarray, optional): Integer group code of every value, negative codes are skipped.
+                                          Default is None, a single group.
+        n_groups (int, optional): Number of groups. Default is None, inferred from `groups`.
+        statistic (list of str, optional): List of statistics to calculate. Default is ["n", "FAC2", "MB", "MGE",
+                                           "NMB", "NMGE", "RMSE", "r", "COE", "IOA", "R2"].
+
+    Returns:
+        dict: Array of every statistic with one value per group, plus 'p_value' and 'p_level' when 'r' is requested.
+    """
     if statistic is None:
-        statistic = ["n", "FAC2", "MB", "MGE", "NMB", "NMGE", "RMSE", "r", "COE", "IOA","R2"]
-    res = {}
-    if "n" in statistic:
-        res["n"] = n(df, mod, obs)
-    if "FAC2" in statistic:
-        res["FAC2"] = FAC2(df, mod, obs)
-    if "MB" in statistic:
-        res["MB"] = MB(df, mod, obs)
-    if "MGE" in statistic:
-        res["MGE"] = MGE(df, mod, obs)
-    if "NMB" in statistic:
-        res["NMB"] = NMB(df, mod, obs)
-    if "NMGE" in statistic:
-        res["NMGE"] = NMGE(df, mod, obs)
-    if "RMSE" in statistic:
-        res["RMSE"] = RMSE(df, mod, obs)
-    if "r" in statistic:
-        res["r"] = r(df, mod, obs)[0]
-        p_value = r(df, mod, obs)[1]
-        if p_value >= 0.1:
-            res["p_level"] = ""
-        elif p_value < 0.1 and p_value >= 0.05:
-            res["p_level"] = "+"
-        elif p_value < 0.05 and p_value >= 0.01:
-            res["p_level"] = "*"
-        elif p_value < 0.01 and p_value >= 0.001:
-            res["p_level"] = "**"
-        else:
-            res["p_level"] = "***"
-    if "COE" in statistic:
-        res["COE"] = COE(df, mod, obs)
-    if "IOA" in statistic:
-        res["IOA"] = IOA(df, mod, obs)
-    if "R2" in statistic:
-        res["R2"] = R2(df, mod, obs)
+        statistic = ["n", "FAC2", "MB", "MGE", "NMB", "NMGE", "RMSE", "r", "COE", "IOA", "R2"]
 
-    results = {'n':res['n'], 'FAC2':res['FAC2'], 'MB':res['MB'], 'MGE':res['MGE'], 'NMB':res['NMB'],
-               'NMGE':res['NMGE'],'RMSE':res['RMSE'], 'r':res['r'],'p_level':res['p_level'],
-               'COE':res['COE'], 'IOA':res['IOA'], 'R2':res['R2']}
+    mod = np.asarray(mod, dtype=np.float64).ravel()
+    obs = np.asarray(obs, dtype=np.float64).ravel()
+    valid = ~(np.isnan(mod) | np.isnan(obs))
+    if groups is None:
+        groups = np.zeros(mod.shape[0], dtype=np.int64)
+        n_groups = 1
+    else:
+        groups = np.asarray(groups, dtype=np.int64).ravel()
+        valid &= groups >= 0
+        if n_groups is None:
+            n_groups = int(groups.max()) + 1 if groups.size else 0
+
+    mod, obs, groups = mod[valid], obs[valid], groups[valid]
+
+    def group_sum(weights):
+        return np.bincount(groups, weights=weights, minlength=n_groups)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        count = np.bincount(groups, minlength=n_groups)
+        diff = mod - obs
+        abs_diff = np.abs(diff)
+
+        # First pass: counts and sums
+        sum_mod = group_sum(mod)
+        sum_obs = group_sum(obs)
+        sum_diff = group_sum(diff)
+        sum_abs_diff = group_sum(abs_diff)
+        sum_sq_diff = group_sum(diff * diff)
+        mean_mod = sum_mod / count
+        mean_obs = sum_obs / count
+
+        # Second pass: centred sums
+        dev_mod = mod - mean_mod[groups]
+        dev_obs = obs - mean_obs[groups]
+        sum_abs_dev_obs = group_sum(np.abs(dev_obs))
+
+        res = {}
+        if "n" in statistic:
+            res["n"] = count
+        if "FAC2" in statistic:
+            ratio = mod / obs
+            res["FAC2"] = (group_sum((ratio >= 0.5) & (ratio <= 2))
+                           / np.bincount(groups[~np.isnan(ratio)], minlength=n_groups))
+        if "MB" in statistic:
+            res["MB"] = sum_diff / count
+        if "MGE" in statistic:
+            res["MGE"] = sum_abs_diff / count
+        if "NMB" in statistic:
+            res["NMB"] = sum_diff / sum_obs
+        if "NMGE" in statistic:
+            res["NMGE"] = sum_abs_diff / sum_obs
+        if "RMSE" in statistic:
+            res["RMSE"] = np.sqrt(sum_sq_diff / count)
+        if "r" in statistic or "R2" in statistic:
+            corr = group_sum(dev_mod * dev_obs) / np.sqrt(group_sum(dev_mod * dev_mod) * group_sum(dev_obs * dev_obs))
+            corr = np.clip(corr, -1, 1)
+        if "r" in statistic:
+            res["r"] = corr
+            # Two-sided p-value of the t statistic of the correlation
+            dof = count - 2
+            t_stat = corr * np.sqrt(dof / ((1 - corr) * (1 + corr)))
+            p_value = np.where(dof > 0, 2 * stats.t.sf(np.abs(t_stat), np.maximum(dof, 1)), np.nan)
+            res["p_value"] = p_value
+            res["p_level"] = np.select([p_value < 0.001, p_value < 0.01, p_value < 0.05, p_value < 0.1],
+                                       ["***", "**", "*", "+"], "")
+        if "COE" in statistic:
+            res["COE"] = 1 - sum_abs_diff / sum_abs_dev_obs
+        if "IOA" in statistic:
+            rhs = 2 * sum_abs_dev_obs
+            res["IOA"] = np.where(sum_abs_diff <= rhs, 1 - sum_abs_diff / rhs, rhs / sum_abs_diff - 1)
+        if "R2" in statistic:
+            # Coefficient of determination of the ordinary least squares fit of mod on obs
+            res["R2"] = corr * corr
 
-    results = pd.DataFrame([results])
+    return res
 
-    return results
+
+def stats_frame(res):
+    """
+    Arranges the output of `stats_kernel` as a DataFrame of statistics.
+
+    Parameters:
+        res (dict): Output of `stats_kernel`.
+
+    Returns:
+        DataFrame: DataFrame containing the statistics, one row per group.
+    """
+    columns = ["n", "FAC2", "MB", "MGE", "NMB", "NMGE", "RMSE", "r", "p_level", "COE", "IOA", "R2"]
+    return pd.DataFrame({column: res[column] for column in columns if column in res})
+
+
+def bootstrap_stats(mod, obs, n_boot=1000, ci=0.95, seed=7654321, statistic=None, chunk_size=None):
+    """
+    Calculates percentile bootstrap confidence intervals of the model evaluation statistics.
+
+    The resample indices of `chunk_size` replicates are drawn at once and all statistics of these replicates are
+    evaluated together by `stats_kernel`, which bounds the memory to about `chunk_size` times the data length.
+
+    Parameters:
+        mod (numpy.ndarray): Model predictions.
+        obs (numpy.ndarray): Observed values.
+        n_boot (int, optional): Number of bootstrap replicates. Default is 1000.
+        ci (float, optional): Confidence level of the intervals. Default is 0.95.
+        seed (int, optional): Random seed of the resampling. Default is 7654321.
+        statistic (list of str, optional): List of statistics to calculate. Default is ["n", "FAC2", "MB", "MGE",
+                                           "NMB", "NMGE", "RMSE", "r", "COE", "IOA", "R2"].
+        chunk_size (int, optional): Number of replicates evaluated at once. Default is None, about 2**20 resampled
+                                    values per chunk.
+
+    Returns:
+        DataFrame: One row with the lower and upper bounds of every statistic, as '<statistic>_lower' and
+                   '<statistic>_upper' columns.
+    """
+    if statistic is None:
+        statistic = ["n", "FAC2", "MB", "MGE", "NMB", "NMGE", "RMSE", "r", "COE", "IOA", "R2"]
+    statistic = [s for s in statistic if s != "n"]
+
+    mod = np.asarray(mod, dtype=np.float64).ravel()
+    obs = np.asarray(obs, dtype=np.float64).ravel()
+    n_rows = mod.shape[0]
+    if chunk_size is None:
+        chunk_size = max(1, 2 ** 20 // max(n_rows, 1))
+
+    replicates = {s: np.full(n_boot, np.nan) for s in statistic}
+    if n_rows > 0:
+        rng = np.random.default_rng(seed)
+        for start in range(0, n_boot, chunk_size):
+            size = min(chunk_size, n_boot - start)
+            # Resample indices of all replicates of the chunk, evaluated as groups of one kernel call
+            idx = rng.integers(0, n_rows, size=(size, n_rows))
+            res = stats_kernel(mod[idx].ravel(), obs[idx].ravel(), np.repeat(np.arange(size), n_rows), size,
+                               statistic)
+            for s in statistic:
+                replicates[s][start:start + size] = res[s]
+
+    alpha = (1 - ci) / 2
+    bounds = {}
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        for s in statistic:
+            lower, upper = np.nanquantile(replicates[s], [alpha, 1 - alpha])
+            bounds[f"{s}_lower"] = lower
+            bounds[f"{s}_upper"] = upper
+
+    return pd.DataFrame([bounds])
 
 
 def extract_feature_names(model):
@@ -1053,83 +3060,311 @@ def extract_feature_names(model):
     else:
         raise AttributeError("The best estimator does not have identifiable feature names.")
 
-    return list(feature_names)
+    return [str(name) for name in feature_names]
 
-def pdp(df, model, variables=None, training_only=True, n_cores=None):
+
+def pdp(df, model, variables=None, training_only=True, n_cores=None, grid_resolution=100, percentiles=(0.05, 0.95),
+        subsample=None, seed=7654321, chunk_size=500000, native=True, engine='booster'):
     """
     Computes partial dependence plots for all specified features.
 
+    The features are encoded once into a shared float block. For every variable the rows are streamed in chunks:
+    each chunk is tiled over the grid, predicted in one call, and folded into running means and variances per grid
+    point, so memory is bounded by `chunk_size` whatever the size of the training set. Pairs of variables are
+    evaluated the same way over the cartesian product of their grids. Variables or pairs, and row batches of them
+    when there are more cores than variables, are spread across the CPU cores.
+
     Parameters:
-        model: AutoML model object.
         df (DataFrame): Input DataFrame containing the dataset.
-        feature_names (list): List of feature names to compute partial dependence plots for.
-        variables (list, optional): List of variables to compute partial dependence plots for. If None, defaults to feature_names.
+        model: AutoML model object, or its handle from `model_session`.
+        variables (list, optional): List of variables to compute partial dependence plots for, or of pairs of variables
+                                    (tuples) for two-way partial dependence. If None, defaults to feature_names.
         training_only (bool, optional): If True, computes partial dependence plots only for the training set. Default is True.
         n_cores (int, optional): Number of CPU cores to use. Default is total CPU cores minus one.
+        grid_resolution (int, optional): Number of grid points of numeric variables with more unique values. Default is 100.
+        percentiles (tuple of float, optional): Lower and upper percentiles bounding the grid of numeric variables.
+                                                Default is (0.05, 0.95).
+        subsample (int or float, optional): Number, or fraction, of rows used for the individual (ICE) curves.
+                                            Default is None, all rows.
+        seed (int, optional): Random seed of the subsampling. Default is 7654321.
+        chunk_size (int, optional): Number of grid points times rows predicted per model call. Default is 500000.
+        native (bool, optional): Whether to predict with the native estimator when it is supported, see
+                                 `native_predictor`. Default is True.
+        engine (str, optional): Prediction engine of the native estimator, see `native_predictor`. Default is 'booster'.
 
     Returns:
-        DataFrame: DataFrame containing the computed partial dependence plots for all specified features.
+        DataFrame: DataFrame containing the computed partial dependence plots for all specified features, with the
+                   mean ('pdp_mean') and standard deviation ('pdp_std') of the individual curves at every grid value.
+                   For pairs, a DataFrame with 'var_a', 'var_b', 'value_a', 'value_b', 'mean' and 'std' columns with
+                   one row per point of the two-way grid.
 
     Example Usage:
         # Compute Partial Dependence Plots for All Features
-        df_predict = pdp(model, df, feature_names=['feature1', 'feature2', 'feature3'])
+        df_predict = pdp(df, model, variables=['feature1', 'feature2', 'feature3'])
+
+        # Interaction surfaces on a 30 x 30 grid
+        df_surface = pdp(df, model, variables=[('ws', 'wd'), ('temp', 'hour')], grid_resolution=30)
     """
 
     # Extract feature names from the best estimator
-    feature_names = extract_feature_names(model)
+    feature_names = extract_feature_names(load_model(model))
 
     if variables is None:
         variables = feature_names
 
     if training_only:
-        df = df[df["set"] == "training"]
+        df = df[set_mask(df, 'training')]
+
+    X, categories = encode_features(df, feature_names)
+
+    # Rows of the individual curves
+    rows = np.arange(len(X))
+    if subsample is not None:
+        n_rows = int(subsample * len(X)) if isinstance(subsample, float) else int(subsample)
+        if n_rows < len(X):
+            rows = np.sort(np.random.default_rng(seed).choice(len(X), size=n_rows, replace=False))
+
+    # Single variables, or pairs of variables for two-way partial dependence
+    items = [tuple(var) if isinstance(var, (tuple, list)) else (var,) for var in variables]
+    two_way = any(len(item) == 2 for item in items)
+    if any(len(item) != (2 if two_way else 1) for item in items):
+        raise ValueError("`variables` must contain either single variables or pairs of variables, not both.")
 
-    X_train, y_train = df[feature_names], df['value']
+    grids = {var: pdp_grid(X[rows, feature_names.index(var)], grid_resolution, percentiles, var in categories)
+             for var in dict.fromkeys(chain.from_iterable(items))}
+    # Two-way grids are the cartesian product of the grids of the pair
+    item_grids = {item: np.stack([g.ravel() for g in np.meshgrid(*[grids[var] for var in item], indexing='ij')],
+                                 axis=1)
+                  for item in items}
+
+    def decode_grid(var, values):
+        return categories[var][values.astype(np.int64)] if var in categories else values
 
     # Default logic for cpu cores
     n_cores = n_cores if n_cores is not None else os.cpu_count() - 1
+    n_splits = min(len(rows), max(1, -(-effective_n_jobs(n_cores) // max(len(items), 1))))
+    tasks = [(item, batch) for item in items for batch in np.array_split(rows, n_splits)]
+
+    # Publish the training features once and hand every worker only the handle
+    accumulators = {}
+    with shared_folder() as folder, model_session(model) as model_handle:
+        X_shared = share_array(X, folder)
+        results = Parallel(n_jobs=n_cores, return_as='generator')(delayed(pdp_worker)(
+            X=X_shared, model=model_handle, feature_names=feature_names, categories=categories,
+            columns=[feature_names.index(var) for var in item], grid=item_grids[item], rows=batch,
+            chunk_size=chunk_size, native=native, engine=engine) for item, batch in tasks)
+        for (item, _), accumulator in zip(tasks, results):
+            accumulators[item] = (merge_accumulators(accumulators[item], accumulator)
+                                  if item in accumulators else accumulator)
+
+    frames = []
+    for item in items:
+        grid, accumulator = item_grids[item], accumulators[item]
+        pdp_mean, pdp_std = accumulator['mean'], np.sqrt(accumulator['M2'] / accumulator['count'])
+        if two_way:
+            frames.append(pd.DataFrame({"var_a": item[0], "var_b": item[1],
+                                        "value_a": decode_grid(item[0], grid[:, 0]),
+                                        "value_b": decode_grid(item[1], grid[:, 1]),
+                                        "mean": pdp_mean, "std": pdp_std}))
+        else:
+            frames.append(pd.DataFrame({"variable": item[0], "value": decode_grid(item[0], grid[:, 0]),
+                                        "pdp_mean": pdp_mean, "pdp_std": pdp_std}))
 
-    results = Parallel(n_jobs=n_cores)(delayed(pdp_worker)(X_train, model, var) for var in variables)
-    df_predict = pd.concat(results)
+    df_predict = pd.concat(frames)
     df_predict.reset_index(drop=True, inplace=True)
     return df_predict
 
 
-def pdp_worker(X_train, model, variable, training_only=True):
+def pdp_grid(values, grid_resolution=100, percentiles=(0.05, 0.95), categorical=False):
     """
-    Worker function for computing partial dependence plots for a single feature.
+    Builds the grid of a variable for partial dependence plots.
+
+    Categorical variables, and numeric variables with fewer than `grid_resolution` unique values, use their
+    unique values. Other variables use `grid_resolution` equally spaced values between the `percentiles`, estimated
+    with `scipy.stats.mstats.mquantiles` like scikit-learn's `partial_dependence`.
 
     Parameters:
-        model: AutoML model object.
-        X_train (DataFrame): Input DataFrame containing the training data.
-        variable (str): Name of the feature to compute partial dependence plot for.
-        training_only (bool, optional): If True, computes partial dependence plot only for the training set. Default is True.
+        values (numpy.ndarray): Encoded values of the variable.
+        grid_resolution (int, optional): Number of grid points. Default is 100.
+        percentiles (tuple of float, optional): Lower and upper percentiles bounding the grid. Default is (0.05, 0.95).
+        categorical (bool, optional): Whether the values are category codes. Default is False.
 
     Returns:
-        DataFrame: DataFrame containing the computed partial dependence plot for the specified feature.
+        numpy.ndarray: Grid values.
     """
-    results = partial_dependence(estimator=model, X=X_train, features=variable, kind='individual')
+    values = values[values >= 0] if categorical else values[~np.isnan(values)]
+    unique = np.unique(values)
+    if categorical or len(unique) < grid_resolution:
+        return unique
 
-    df_predict = pd.DataFrame({"value": results['grid_values'][0],
-                               "pdp_mean": np.mean(results['individual'][0], axis=0),
-                               'pdp_std': np.std(results['individual'][0], axis=0)})
-    df_predict["variable"] = variable
-    df_predict = df_predict[["variable", "value", "pdp_mean", "pdp_std"]]
+    lower, upper = stats.mstats.mquantiles(values, prob=percentiles)
+    if lower == upper:
+        return unique
+    return np.linspace(lower, upper, grid_resolution)
 
-    return df_predict
 
+def pdp_worker(X, model, feature_names, categories, columns, grid, rows=None, chunk_size=500000, native=True,
+               engine='booster'):
+    """
+    Worker function accumulating the individual conditional expectation curves of a grid over a batch of rows.
+
+    The rows are streamed in chunks of about `chunk_size / len(grid)` rows. Every chunk is tiled once per grid
+    point, the grid values are written into `columns`, and the whole block is predicted in a single call.
+
+    Parameters:
+        X (numpy.ndarray or dict): Encoded feature block of shape (n_rows, len(feature_names)), or its handle from
+                                   `share_array`.
+        model (object or dict): Trained ML model, or its handle from `model_session`.
+        feature_names (list of str): Column names of `X`.
+        categories (dict): Mapping of categorical column name to its categories.
+        columns (list of int): Positions in `feature_names` of the variables set to the grid values.
+        grid (numpy.ndarray): Encoded grid of shape (n_grid, len(columns)), e.g. the cartesian product of two grids
+                              for a pair of variables.
+        rows (numpy.ndarray, optional): Rows of `X` to average over. If None, every row is used. Default is None.
+        chunk_size (int, optional): Number of grid points times rows predicted per model call. Default is 500000.
+        native (bool, optional): Whether to predict with the native estimator when it is supported, see
+                                 `native_predictor`. Default is True.
+        engine (str, optional): Prediction engine of the native estimator, see `native_predictor`. Default is 'booster'.
+
+    Returns:
+        dict: Accumulator of the predictions per grid point, see `init_accumulator`.
+    """
+    X, model = load_shared(X), load_model(model)
+    predictor = native_predictor(model, feature_names, categories, engine=engine) if native else None
+    rows = np.arange(len(X)) if rows is None else rows
+
+    n_grid = len(grid)
+    accumulator = init_accumulator(np.arange(n_grid), n_grid)
+    step = max(1, chunk_size // max(n_grid, 1))
+    buffer = None
+
+    for start in range(0, len(rows), step):
+        chunk = X[rows[start:start + step]]
+        # Grid-major design matrix: every row of the chunk once per grid point
+        block = np.tile(chunk, (n_grid, 1))
+        block[:, columns] = np.repeat(grid, len(chunk), axis=0)
+
+        if predictor is not None:
+            if buffer is None or len(buffer) != len(block):
+                buffer = np.empty((len(block), len(predictor['positions'])), dtype=np.float64)
+            value_predict = predict_native(predictor, block, out=buffer)
+        else:
+            value_predict = model.predict(decode_features(block, feature_names, categories))
+
+        update_accumulator(accumulator, np.repeat(np.arange(n_grid), len(chunk)), value_predict)
+
+    return accumulator
+
+
+def nearest_controls(df, code_col, treat_target=None, control_pool=None, k=None, radius=None, location_type=None,
+                     lat_col='latitude', lon_col='longitude', type_col='location_type'):
+    """
+    Selects the control stations of every treatment target from a spatial index of the sites.
+
+    The sites are indexed once in a BallTree on the haversine distance of their coordinates, and the controls of
+    every target are its `k` nearest candidate sites, the candidate sites within `radius` km, or the `k` nearest
+    within `radius` km when both are given.
+
+    Parameters:
+        df (DataFrame): Input DataFrame containing the dataset, with the coordinates of every site.
+        code_col (str): Name of the column containing the code data.
+        treat_target (str or list, optional): Code, or list of codes, of the treatment targets. Default is None,
+                                              every site.
+        control_pool (list, optional): Codes of the candidate control sites. Default is None, every site.
+        k (int, optional): Number of nearest controls of every target. Default is None.
+        radius (float, optional): Search radius in km. Default is None.
+        location_type (str or list, optional): Location type(s) of the candidate control sites, e.g.
+                                               'Urban Background'. Default is None, any type.
+        lat_col (str, optional): Name of the latitude column. Default is 'latitude'.
+        lon_col (str, optional): Name of the longitude column. Default is 'longitude'.
+        type_col (str, optional): Name of the location type column. Default is 'location_type'.
+
+    Returns:
+        dict: Mapping of every treatment target to the codes of its controls, nearest first. It can be passed as
+              `control_pool` to `scm`, `scm_all` and `scm_placebo`.
+
+    Example Usage:
+        # The 10 nearest urban background sites of every site
+        control_pool = nearest_controls(df, code_col='code', k=10, location_type='Urban Background')
+        synthetic_all = scm_all(df, poll_col='PM2.5', code_col='code', control_pool=control_pool,
+                                cutoff_date='2020-03-23')
+    """
+    if k is None and radius is None:
+        raise ValueError("At least one of `k` and `radius` must be given.")
+
+    earth_radius = 6371.0088
+    columns = [lat_col, lon_col] + ([type_col] if location_type is not None else [])
+    sites = df.groupby(code_col, sort=False)[columns].first().dropna(subset=[lat_col, lon_col])
+
+    targets = list(sites.index) if treat_target is None else (
+        [treat_target] if np.isscalar(treat_target) else list(treat_target))
+    missing = [target for target in targets if target not in sites.index]
+    if missing:
+        raise ValueError(f"No coordinates for the treatment targets {missing}.")
+
+    # Candidate control sites
+    candidates = sites if control_pool is None else sites[sites.index.isin(control_pool)]
+    if location_type is not None:
+        types = [location_type] if isinstance(location_type, str) else list(location_type)
+        candidates = candidates[candidates[type_col].isin(types)]
+    codes = candidates.index.to_numpy()
+    if len(codes) == 0:
+        return {target: [] for target in targets}
+
+    tree = BallTree(np.radians(candidates[[lat_col, lon_col]].to_numpy(dtype=np.float64)), metric='haversine')
+    points = np.radians(sites.loc[targets, [lat_col, lon_col]].to_numpy(dtype=np.float64))
+
+    if radius is not None:
+        neighbours, _ = tree.query_radius(points, r=radius / earth_radius, return_distance=True, sort_results=True)
+    else:
+        # One more neighbour than needed, in case the target itself is a candidate
+        _, neighbours = tree.query(points, k=min(k + 1, len(codes)))
+
+    controls = {}
+    for target, index in zip(targets, neighbours):
+        selected = [code for code in codes[index] if code != target]
+        controls[target] = selected[:k] if k is not None else selected
+
+    return controls
+
+
+def target_controls(control_pool, target):
+    """
+    Returns the control pool of a treatment target.
 
-def scm_all(df, poll_col, code_col, control_pool, cutoff_date, n_cores=None):
+    Parameters:
+        control_pool (list or dict): List of control pool codes, or mapping of every target to its own list, see
+                                     `nearest_controls`.
+        target (str): Code of the treatment target.
+
+    Returns:
+        list: Control pool codes of the target.
+    """
+    if isinstance(control_pool, dict):
+        return list(control_pool.get(target, []))
+    return list(control_pool)
+
+
+def scm_all(df, poll_col, code_col, control_pool, cutoff_date, n_cores=None, cv=5, time_ordered=False):
     """
     Performs Synthetic Control Method (SCM) in parallel for multiple treatment targets.
 
+    The panel is pivoted once into a date x station matrix. The treatment targets are solved together by
+    `scm_fit_batch`, which shares one cross-product matrix of the panel per fold between all targets with the
+    same pre-treatment dates. With several cores the targets are split in batches across the workers, which
+    attach the shared matrix.
+
     Parameters:
         df (DataFrame): Input DataFrame containing the dataset.
         poll_col (str): Name of the column containing the poll data.
         code_col (str): Name of the column containing the code data.
-        control_pool (list): List of control pool codes.
+        control_pool (list or dict): List of control pool codes, or mapping of every target to its own list, see
+                                     `nearest_controls`. With a mapping only its targets are treated.
         cutoff_date (str): Date for splitting pre- and post-treatment datasets.
         n_cores (int, optional): Number of CPU cores to use. Default is total CPU cores minus one.
+        cv (int or str, optional): Cross-validation of the Ridge penalty, see `scm_fit`. Default is 5.
+        time_ordered (bool, optional): Whether the cross-validation folds are time ordered, see `scm_fit`.
+                                       Default is False.
 
     Returns:
         DataFrame: DataFrame containing synthetic control results for all treatment targets.
@@ -1142,17 +3377,262 @@ def scm_all(df, poll_col, code_col, control_pool, cutoff_date, n_cores=None):
     # Default logic for cpu cores
     n_cores = n_cores if n_cores is not None else os.cpu_count() - 1
     treatment_pool = df[code_col].unique()
-    synthetic_all = pd.concat(Parallel(n_jobs=n_cores)(delayed(scm)(
-                    df=df,
-                    poll_col=poll_col,
-                    code_col=code_col,
-                    treat_target=code,
-                    control_pool=control_pool,
-                    cutoff_date=cutoff_date) for code in treatment_pool))
+    if isinstance(control_pool, dict):
+        # Per-target control pools, e.g. from `nearest_controls`, also name the treatment targets
+        treatment_pool = treatment_pool[pd.Index(treatment_pool).isin(list(control_pool))]
+
+    # Pivot the panel once into a date x station matrix
+    dfp = process_date(df).pivot_table(index='date', columns=code_col, values=poll_col, dropna=False)
+
+    # One batch of targets per worker
+    batches = [list(batch) for batch in np.array_split(treatment_pool, min(len(treatment_pool),
+                                                                           effective_n_jobs(n_cores)))]
+
+    # Publish the matrix once and hand every worker only the handle and the date/station labels
+    with shared_folder() as folder:
+        panel = share_array(dfp.values.astype(np.float64), folder)
+        synthetic_all = pd.concat(Parallel(n_jobs=n_cores)(delayed(scm_worker)(
+                        panel=panel,
+                        dates=dfp.index.values,
+                        codes=list(dfp.columns),
+                        poll_col=poll_col,
+                        code_col=code_col,
+                        treat_target=batch,
+                        control_pool=control_pool,
+                        cutoff_date=cutoff_date,
+                        cv=cv,
+                        time_ordered=time_ordered) for batch in batches))
     return synthetic_all
 
 
-def scm(df, poll_col, code_col, treat_target, control_pool, cutoff_date):
+def scm_worker(panel, dates, codes, poll_col, code_col, treat_target, control_pool, cutoff_date, cv=5,
+               time_ordered=False):
+    """
+    Worker function performing the Synthetic Control Method (SCM) for one or more treatment targets on a
+    date x station matrix.
+
+    Targets whose complete pre-treatment dates coincide are fitted together with `scm_fit_batch`.
+
+    Parameters:
+        panel (numpy.ndarray or dict): Matrix of shape (len(dates), len(codes)) holding the poll data, or its
+                                       handle from `share_array`.
+        dates (numpy.ndarray): Dates of the rows of `panel`.
+        codes (list): Station codes of the columns of `panel`.
+        poll_col (str): Name of the column containing the poll data.
+        code_col (str): Name of the column containing the code data.
+        treat_target (str or list): Code, or list of codes, of the treatment targets.
+        control_pool (list or dict): List of control pool codes, or mapping of every target to its own list, see
+                                     `nearest_controls`.
+        cutoff_date (str): Date for splitting pre- and post-treatment datasets.
+        cv (int or str, optional): Cross-validation of the Ridge penalty, see `scm_fit`. Default is 5.
+        time_ordered (bool, optional): Whether the cross-validation folds are time ordered. Default is False.
+
+    Returns:
+        DataFrame: DataFrame containing synthetic control results for the specified treatment targets.
+    """
+    panel = load_shared(panel)
+    dates = pd.DatetimeIndex(dates, name='date')
+    targets = [treat_target] if np.isscalar(treat_target) else list(treat_target)
+
+    treat_indices = [codes.index(target) for target in targets]
+    pools = [set(target_controls(control_pool, target)) for target in targets]
+    control_indices = [[j for j, code in enumerate(codes) if code != target and code in pool]
+                       for target, pool in zip(targets, pools)]
+    fits = scm_fit_panel(panel, dates < pd.Timestamp(cutoff_date), treat_indices, control_indices, cv=cv,
+                         time_ordered=time_ordered)
+
+    data_list = []
+    for target, treat_index, control_index, (w, intercept, _) in zip(targets, treat_indices, control_indices, fits):
+
+        # Combining synthetic control results with actual data
+        y = panel[:, treat_index]
+        observed = np.isfinite(y)
+        data = pd.DataFrame({code_col: target,
+                             poll_col: y[observed],
+                             'synthetic': panel[observed][:, control_index] @ w + intercept}, index=dates[observed])
+        data['effects'] = data[poll_col] - data['synthetic']
+        data_list.append(data)
+
+    return pd.concat(data_list)
+
+
+def scm_fit(x_pre_control, y_pre_treat, alphas=None, cv=5, time_ordered=False):
+    """
+    Fits the Ridge regression weights of the synthetic control on the pre-treatment period.
+
+    The penalty is chosen from `alphas` by cross-validation. Every fold is solved for the whole alpha path from
+    one SVD of its centred control matrix, and the final weights come from the SVD of the full pre-treatment
+    matrix. With the default `cv=5` the folds, the R2 scoring and the chosen alpha are those of
+    `GridSearchCV(Ridge(), cv=5)`.
+
+    Parameters:
+        x_pre_control (numpy.ndarray): Pre-treatment control data of shape (n_dates, n_controls).
+        y_pre_treat (numpy.ndarray): Pre-treatment data of the treatment target of shape (n_dates,).
+        alphas (list of float, optional): Candidate penalties. Default is 0.1 to 10.0 in steps of 0.1.
+        cv (int or str, optional): Number of contiguous folds, or 'loo' for the exact leave-one-out error from the
+                                   single SVD of the full matrix. Default is 5.
+        time_ordered (bool, optional): Whether the folds only train on dates before their test dates
+                                       (forward chaining). Default is False.
+
+    Returns:
+        tuple:
+            - numpy.ndarray: Weights of the control stations.
+            - float: Intercept of the synthetic control.
+            - float: Chosen alpha.
+    """
+    x = np.asarray(x_pre_control, dtype=np.float64)
+    y = np.asarray(y_pre_treat, dtype=np.float64).reshape(-1)
+    alphas = np.array([i / 10 for i in range(1, 101)] if alphas is None else alphas, dtype=np.float64)
+
+    def ridge_path(x_train, y_train):
+        # Centred SVD solve of the whole alpha path: coefficients of shape (n_controls, n_alphas)
+        x_mean, y_mean = x_train.mean(axis=0), y_train.mean()
+        U, s, Vt = np.linalg.svd(x_train - x_mean, full_matrices=False)
+        d = s[:, None] / (s[:, None] ** 2 + alphas[None, :])
+        coef = Vt.T @ (d * (U.T @ (y_train - y_mean))[:, None])
+        return coef, y_mean - x_mean @ coef, U, s
+
+    if cv == 'loo':
+        # Exact leave-one-out residuals from the diagonal of the hat matrix
+        coef, intercept, U, s = ridge_path(x, y)
+        shrink = s[:, None] ** 2 / (s[:, None] ** 2 + alphas[None, :])
+        hat = 1 / len(y) + (U ** 2) @ shrink
+        residuals = (y[:, None] - x @ coef - intercept) / (1 - hat)
+        best = int(np.argmin(np.mean(residuals ** 2, axis=0)))
+        return coef[:, best], float(intercept[best]), float(alphas[best])
+
+    splitter = TimeSeriesSplit(n_splits=cv) if time_ordered else KFold(n_splits=cv)
+    scores = []
+    for train, test in splitter.split(x):
+        coef, intercept, _, _ = ridge_path(x[train], y[train])
+        residual = ((y[test, None] - x[test] @ coef - intercept) ** 2).sum(axis=0)
+        total = ((y[test] - y[test].mean()) ** 2).sum()
+        # R2 of every alpha, with scikit-learn's convention for a constant test target
+        scores.append(1 - residual / total if total > 0 else np.where(residual == 0, 1.0, 0.0))
+    best = int(np.argmax(np.mean(scores, axis=0)))
+
+    coef, intercept, _, _ = ridge_path(x, y)
+    return coef[:, best], float(intercept[best]), float(alphas[best])
+
+
+def scm_fit_panel(panel, before, targets, controls, cv=5, time_ordered=False):
+    """
+    Fits the synthetic controls of several treatment targets on a date x station matrix with missing values.
+
+    Every target is fitted on the pre-treatment dates where it and all its controls are observed. Targets
+    sharing these dates are solved together with `scm_fit_batch`.
+
+    Parameters:
+        panel (numpy.ndarray): Matrix of shape (n_dates, n_stations) holding the poll data.
+        before (numpy.ndarray): Boolean mask of the pre-treatment dates.
+        targets (list of int): Columns of the treatment targets.
+        controls (list of list of int): Columns of the control stations of every target.
+        cv (int or str, optional): Cross-validation of the Ridge penalty, see `scm_fit`. Default is 5.
+        time_ordered (bool, optional): Whether the cross-validation folds are time ordered. Default is False.
+
+    Returns:
+        list of tuple: Weights, intercept and chosen alpha of every target, see `scm_fit`.
+    """
+    finite = np.isfinite(panel)
+
+    # Group the targets by their complete pre-treatment dates
+    groups = {}
+    for k, (t, c) in enumerate(zip(targets, controls)):
+        pre_treatment = before & finite[:, t] & finite[:, c].all(axis=1)
+        groups.setdefault(pre_treatment.tobytes(), (pre_treatment, []))[1].append(k)
+
+    fits = [None] * len(targets)
+    for pre_treatment, members in groups.values():
+        # Only the stations used by the group enter its cross-products, which keeps small control pools cheap
+        columns = sorted(set(targets[k] for k in members).union(*(controls[k] for k in members)))
+        position = {column: j for j, column in enumerate(columns)}
+        results = scm_fit_batch(panel[np.ix_(pre_treatment, columns)], [position[targets[k]] for k in members],
+                                [[position[j] for j in controls[k]] for k in members], cv=cv,
+                                time_ordered=time_ordered)
+        for k, result in zip(members, results):
+            fits[k] = result
+
+    return fits
+
+
+def scm_fit_batch(panel, targets, controls, alphas=None, cv=5, time_ordered=False):
+    """
+    Fits the Ridge regression weights of the synthetic controls of several treatment targets on the same dates.
+
+    All targets share one factorisation per fold: the centred cross-product matrix of every station of the panel.
+    The normal equations of a target are the sub-matrices of its controls, solved for the whole alpha path from
+    one eigendecomposition, and the fold errors follow from the cross-products of the test dates, so no target
+    needs its own pass over the data. The folds, scoring and chosen alpha are those of `scm_fit`.
+
+    Parameters:
+        panel (numpy.ndarray): Pre-treatment data of shape (n_dates, n_stations), complete for the targets and
+                               their controls.
+        targets (list of int): Columns of the treatment targets.
+        controls (list of list of int): Columns of the control stations of every target.
+        alphas (list of float, optional): Candidate penalties. Default is 0.1 to 10.0 in steps of 0.1.
+        cv (int or str, optional): Number of contiguous folds, or 'loo' for the exact leave-one-out error.
+                                   Default is 5.
+        time_ordered (bool, optional): Whether the folds only train on dates before their test dates
+                                       (forward chaining). Default is False.
+
+    Returns:
+        list of tuple: Weights, intercept and chosen alpha of every target, see `scm_fit`.
+    """
+    panel = np.asarray(panel, dtype=np.float64)
+    alphas = np.array([i / 10 for i in range(1, 101)] if alphas is None else alphas, dtype=np.float64)
+
+    def moments(rows):
+        # Means and centred cross-products of every station over the rows
+        mean = panel[rows].mean(axis=0)
+        centred = panel[rows] - mean
+        return mean, centred.T @ centred
+
+    def ridge_path(gram, t, c):
+        # Eigendecomposition of the controls' normal equations and the coefficients of every alpha
+        eigenvalues, V = np.linalg.eigh(gram[np.ix_(c, c)])
+        shrink = 1 / (np.maximum(eigenvalues, 0)[:, None] + alphas[None, :])
+        return V @ (shrink * (V.T @ gram[c, t])[:, None]), eigenvalues, V
+
+    n_rows = len(panel)
+    if cv == 'loo':
+        mean, gram = moments(slice(None))
+        results = []
+        for t, c in zip(targets, controls):
+            coef, eigenvalues, V = ridge_path(gram, t, c)
+            # Exact leave-one-out residuals from the diagonal of the hat matrix
+            projected = (panel[:, c] - mean[c]) @ V
+            hat = 1 / n_rows + (projected ** 2) @ (1 / (np.maximum(eigenvalues, 0)[:, None] + alphas[None, :]))
+            residuals = ((panel[:, t] - mean[t])[:, None] - (panel[:, c] - mean[c]) @ coef) / (1 - hat)
+            best = int(np.argmin(np.mean(residuals ** 2, axis=0)))
+            results.append((coef[:, best], float(mean[t] - mean[c] @ coef[:, best]), float(alphas[best])))
+        return results
+
+    splitter = TimeSeriesSplit(n_splits=cv) if time_ordered else KFold(n_splits=cv)
+    scores = np.zeros((len(targets), len(alphas)))
+    n_folds = 0
+    for train, test in splitter.split(panel):
+        mean, gram = moments(train)
+        # Cross-products of the test dates around the training means
+        shifted = panel[test] - mean
+        test_gram, test_sum = shifted.T @ shifted, shifted.sum(axis=0)
+        for k, (t, c) in enumerate(zip(targets, controls)):
+            coef, _, _ = ridge_path(gram, t, c)
+            residual = (test_gram[t, t] - 2 * coef.T @ test_gram[c, t]
+                        + np.sum(coef * (test_gram[np.ix_(c, c)] @ coef), axis=0))
+            total = test_gram[t, t] - test_sum[t] ** 2 / len(test)
+            scores[k] += 1 - residual / total if total > 0 else np.where(residual <= 0, 1.0, 0.0)
+        n_folds += 1
+
+    mean, gram = moments(slice(None))
+    results = []
+    for k, (t, c) in enumerate(zip(targets, controls)):
+        best = int(np.argmax(scores[k] / n_folds))
+        coef, _, _ = ridge_path(gram, t, c)
+        results.append((coef[:, best], float(mean[t] - mean[c] @ coef[:, best]), float(alphas[best])))
+    return results
+
+
+def scm(df, poll_col, code_col, treat_target, control_pool, cutoff_date, cv=5, time_ordered=False):
     """
     Performs Synthetic Control Method (SCM) for a single treatment target.
 
@@ -1161,8 +3641,12 @@ def scm(df, poll_col, code_col, treat_target, control_pool, cutoff_date):
         poll_col (str): Name of the column containing the poll data.
         code_col (str): Name of the column containing the code data.
         treat_target (str): Code of the treatment target.
-        control_pool (list): List of control pool codes.
+        control_pool (list or dict): List of control pool codes, or mapping of every target to its own list, see
+                                     `nearest_controls`.
         cutoff_date (str): Date for splitting pre- and post-treatment datasets.
+        cv (int or str, optional): Cross-validation of the Ridge penalty, see `scm_fit`. Default is 5.
+        time_ordered (bool, optional): Whether the cross-validation folds are time ordered, see `scm_fit`.
+                                       Default is False.
 
     Returns:
         DataFrame: DataFrame containing synthetic control results for the specified treatment target.
@@ -1173,6 +3657,7 @@ def scm(df, poll_col, code_col, treat_target, control_pool, cutoff_date):
                              treat_target='T1', control_pool=['C1', 'C2'], cutoff_date='2020-01-01')
     """
     df = process_date(df)
+    control_pool = target_controls(control_pool, treat_target)
 
     # Splitting the dataset into pre- and post-treatment periods
     pre_treatment_df = df[df['date'] < cutoff_date]
@@ -1190,18 +3675,8 @@ def scm(df, poll_col, code_col, treat_target, control_pool, cutoff_date):
                         .groupby('date')[poll_col]
                         .mean())
 
-    # Grid search to find the best alpha parameter for Ridge regression
-    param_grid = {'alpha': [i / 10 for i in range(1, 101)]}
-    ridge = Ridge()
-    grid_search = GridSearchCV(ridge, param_grid, cv=5)
-    grid_search.fit(x_pre_control, y_pre_treat_mean.values.reshape(-1, 1))
-    best_alpha = grid_search.best_params_['alpha']
-
-    # Final Ridge regression model with the best alpha parameter, including intercept
-    ridge_final = Ridge(alpha=best_alpha, fit_intercept=True)
-    ridge_final.fit(x_pre_control, y_pre_treat_mean.values.reshape(-1, 1))
-    w = ridge_final.coef_.flatten()
-    intercept = ridge_final.intercept_.item()
+    # Fit the Ridge regression weights on the pre-treatment period
+    w, intercept, _ = scm_fit(x_pre_control, y_pre_treat_mean.values, cv=cv, time_ordered=time_ordered)
 
     # Preparing control data for synthetic control calculation
     sc = (df[(df[code_col] != treat_target) & (df[code_col].isin(control_pool))]
@@ -1216,82 +3691,417 @@ def scm(df, poll_col, code_col, treat_target, control_pool, cutoff_date):
     return data
 
 
-def mlsc(df, poll_col, code_col, treat_target, control_pool, cutoff_date, model_config):
+def scm_placebo(df, poll_col, code_col, treat_target, control_pool, cutoff_date, n_cores=None, cv=5,
+                time_ordered=False):
+    """
+    Performs in-space placebo inference for the Synthetic Control Method (SCM).
+
+    For every treated site, every station of its donor pool is in turn treated as if it were treated and fitted
+    on the other donors. The ratio of the post- to pre-treatment root mean squared prediction error (RMSPE) of the
+    treated site is ranked among the ratios of its placebos to give a permutation p-value. All placebo fits of a
+    batch of treated sites are solved together by `scm_fit_panel`, and the batches are spread across the CPU
+    cores, which attach the panel as a shared matrix.
+
+    Parameters:
+        df (DataFrame): Input DataFrame containing the dataset.
+        poll_col (str): Name of the column containing the poll data.
+        code_col (str): Name of the column containing the code data.
+        treat_target (str or list): Code, or list of codes, of the treated sites.
+        control_pool (list or dict): List of control pool codes, or mapping of every target to its own list, see
+                                     `nearest_controls`.
+        cutoff_date (str): Date for splitting pre- and post-treatment datasets.
+        n_cores (int, optional): Number of CPU cores to use. Default is total CPU cores minus one.
+        cv (int or str, optional): Cross-validation of the Ridge penalty, see `scm_fit`. Default is 5.
+        time_ordered (bool, optional): Whether the cross-validation folds are time ordered, see `scm_fit`.
+                                       Default is False.
+
+    Returns:
+        DataFrame: One row per treated site with its 'pre_rmspe', 'post_rmspe', 'ratio', 'n_placebos', 'rank' of
+                   the ratio among the treated site and its placebos (1 is the largest) and 'p_value'. The RMSPE
+                   of every placebo is in `.attrs['placebos']`.
+
+    Example Usage:
+        # Placebo inference for two treated sites
+        inference = scm_placebo(df, poll_col='Poll', code_col='Code', treat_target=['T1', 'T2'],
+                                control_pool=['C1', 'C2', 'C3', 'C4'], cutoff_date='2020-01-01')
+    """
+    # Default logic for cpu cores
+    n_cores = n_cores if n_cores is not None else os.cpu_count() - 1
+    treat_targets = [treat_target] if np.isscalar(treat_target) else list(treat_target)
+
+    # Pivot the panel once into a date x station matrix
+    dfp = process_date(df).pivot_table(index='date', columns=code_col, values=poll_col, dropna=False)
+    batches = [list(batch) for batch in np.array_split(np.array(treat_targets, dtype=object),
+                                                       min(len(treat_targets), effective_n_jobs(n_cores)))]
+
+    with shared_folder() as folder:
+        panel = share_array(dfp.values.astype(np.float64), folder)
+        placebos = pd.concat(Parallel(n_jobs=n_cores)(delayed(scm_placebo_worker)(
+                             panel=panel,
+                             dates=dfp.index.values,
+                             codes=list(dfp.columns),
+                             treat_targets=batch,
+                             control_pool=control_pool,
+                             cutoff_date=cutoff_date,
+                             cv=cv,
+                             time_ordered=time_ordered) for batch in batches), ignore_index=True)
+
+    summary = []
+    for target, group in placebos.groupby('treated', sort=False):
+        ratio = group.loc[~group['placebo'], 'ratio'].iloc[0]
+        treated = group[~group['placebo']].iloc[0]
+        summary.append({code_col: target,
+                        'pre_rmspe': treated['pre_rmspe'],
+                        'post_rmspe': treated['post_rmspe'],
+                        'ratio': ratio,
+                        'n_placebos': int(group['placebo'].sum()),
+                        'rank': int((group['ratio'] >= ratio).sum()),
+                        'p_value': (group['ratio'] >= ratio).mean()})
+
+    df_inference = pd.DataFrame(summary)
+    df_inference.attrs['placebos'] = placebos.rename(columns={'code': code_col})
+    return df_inference
+
+
+def scm_placebo_worker(panel, dates, codes, treat_targets, control_pool, cutoff_date, cv=5, time_ordered=False):
+    """
+    Worker function computing the pre- and post-treatment RMSPE of treated sites and their in-space placebos.
+
+    The synthetic controls of all treated sites and placebos of the batch are fitted together, and placebos
+    shared between treated sites with the same donor pool are fitted once.
+
+    Parameters:
+        panel (numpy.ndarray or dict): Matrix of shape (len(dates), len(codes)) holding the poll data, or its
+                                       handle from `share_array`.
+        dates (numpy.ndarray): Dates of the rows of `panel`.
+        codes (list): Station codes of the columns of `panel`.
+        treat_targets (list): Codes of the treated sites.
+        control_pool (list or dict): List of control pool codes, or mapping of every target to its own list, see
+                                     `nearest_controls`.
+        cutoff_date (str): Date for splitting pre- and post-treatment datasets.
+        cv (int or str, optional): Cross-validation of the Ridge penalty, see `scm_fit`. Default is 5.
+        time_ordered (bool, optional): Whether the cross-validation folds are time ordered. Default is False.
+
+    Returns:
+        DataFrame: One row per treated site and placebo with the 'treated' site, the 'code' of the unit, whether
+                   it is a 'placebo', and its 'pre_rmspe', 'post_rmspe' and 'ratio'.
+    """
+    panel = load_shared(panel)
+    before = pd.DatetimeIndex(dates) < pd.Timestamp(cutoff_date)
+
+    # Every unit to fit, keyed by its column and controls so that shared placebos are fitted once
+    units = {}
+    rows = []
+    for target in treat_targets:
+        pool = set(target_controls(control_pool, target))
+        donors = [j for j, code in enumerate(codes) if code != target and code in pool]
+        for unit in [codes.index(target)] + donors:
+            controls = tuple(j for j in donors if j != unit)
+            units.setdefault((unit, controls), len(units))
+            rows.append((target, unit, controls))
+
+    keys = list(units)
+    fits = scm_fit_panel(panel, before, [unit for unit, _ in keys], [list(controls) for _, controls in keys], cv=cv,
+                         time_ordered=time_ordered)
+
+    errors = {}
+    for (unit, controls), (w, intercept, _) in zip(keys, fits):
+        residual = panel[:, unit] - (panel[:, list(controls)] @ w + intercept)
+        pre_rmspe = np.sqrt(np.nanmean(residual[before] ** 2)) if np.isfinite(residual[before]).any() else np.nan
+        post_rmspe = np.sqrt(np.nanmean(residual[~before] ** 2)) if np.isfinite(residual[~before]).any() else np.nan
+        errors[(unit, controls)] = (pre_rmspe, post_rmspe)
+
+    return pd.DataFrame([{'treated': target,
+                          'code': codes[unit],
+                          'placebo': unit != codes.index(target),
+                          'pre_rmspe': errors[(unit, controls)][0],
+                          'post_rmspe': errors[(unit, controls)][1],
+                          'ratio': errors[(unit, controls)][1] / errors[(unit, controls)][0]}
+                         for target, unit, controls in rows])
+
+
+def mlsc(df, poll_col, code_col, treat_target, control_pool, cutoff_date, model_config=None, seed=7654321,
+         cache_dir=None, verbose=True):
     """
     Performs synthetic control using machine learning regression models.
 
+    An AutoML model of the treatment target on its control stations is trained on the pre-treatment dates, and
+    predicts the synthetic control on all dates.
+
     Parameters:
         df (DataFrame): Input DataFrame containing the dataset.
         poll_col (str): Name of the column containing the poll data.
         code_col (str): Name of the column containing the code data.
         treat_target (str): Code of the treatment target.
-        control_pool (list): List of control pool codes.
+        control_pool (list or dict): List of control pool codes, or mapping of every target to its own list, see
+                                     `nearest_controls`.
         cutoff_date (str): Date for splitting pre- and post-treatment datasets.
-        training_time (int, optional): Total running time in seconds for the AutoML model. Default is 60.
+        model_config (dict, optional): Configuration dictionary for model training parameters, see `train_model`.
+                                       Default is None.
+        seed (int, optional): Random seed for reproducibility. Default is 7654321.
+        cache_dir (str, optional): Directory of the model cache, see `mlsc_model`. Default is None (no caching).
+        verbose (bool, optional): If True, print progress messages. Default is True.
 
     Returns:
-        DataFrame: DataFrame containing synthetic control results for the specified treatment target.
+        DataFrame: DataFrame containing synthetic control results for the specified treatment target. Whether
+                   the model was loaded from the cache is given in `attrs['cached_model']`.
 
     Example Usage:
         # Perform synthetic control using ML regression models
-        synthetic_data = ml_syn(df, poll_col='Poll', code_col='Code',
-                                treat_target='T1', control_pool=['C1', 'C2'], cutoff_date='2020-01-01')
+        synthetic_data = mlsc(df, poll_col='Poll', code_col='Code', treat_target='T1', control_pool=['C1', 'C2'],
+                              cutoff_date='2020-01-01', model_config={'time_budget': 60})
     """
-    from flaml import AutoML
-    automl = AutoML()
     df = process_date(df)
-    dfp = (df[df[code_col].isin(control_pool + [treat_target])]).pivot_table(index='date', columns=code_col, values=poll_col)
-    pre_dataset = dfp[dfp.index < cutoff_date]
-    post_dataset = dfp[dfp.index >= cutoff_date]
-    # Update default configuration with user-provided config
-    if model_config is not None:
-        default_model_config.update(model_config)
+    controls = target_controls(control_pool, treat_target)
+    dfp = (df[df[code_col].isin(controls + [treat_target])]
+           .pivot_table(index='date', columns=code_col, values=poll_col, dropna=False))
 
-    automl.fit(dataframe=pre_dataset, label=treat_target, **default_model_config)
-    pre_pred = automl.predict(pre_dataset)
+    return mlsc_worker(panel=dfp.values.astype(np.float64), dates=dfp.index.values, codes=list(dfp.columns),
+                       poll_col=poll_col, code_col=code_col, treat_target=treat_target, control_pool=controls,
+                       cutoff_date=cutoff_date, model_config=model_config, seed=seed, cache_dir=cache_dir,
+                       verbose=verbose)
 
-    data = (df
-            [df[code_col] == treat_target][['date', code_col, poll_col]]
-            .assign(synthetic=automl.predict(dfp))).set_index('date')
-    data['effects'] = data[poll_col] - data['synthetic']
-    return data
 
-
-def mlsc_all(df, poll_col, code_col, control_pool, cutoff_date, training_time=60, n_cores=None):
+def mlsc_all(df, poll_col, code_col, control_pool, cutoff_date, training_time=60, n_cores=None, time_budget=None,
+             n_parallel_sites=None, model_config=None, seed=7654321, cache_dir=None, verbose=True):
     """
     Performs synthetic control using machine learning regression models in parallel for multiple treatment targets.
 
+    The panel is pivoted once into a date x station matrix shared with the workers. The core budget `n_cores` is
+    split between the `n_parallel_sites` concurrent targets, each AutoML fit using its share, so the workers do not
+    oversubscribe the cores. With `time_budget` the fits share a global time budget, every target getting its slice.
+    A failing target does not stop the others.
+
     Parameters:
         df (DataFrame): Input DataFrame containing the dataset.
         poll_col (str): Name of the column containing the poll data.
         code_col (str): Name of the column containing the code data.
-        control_pool (list): List of control pool codes.
+        control_pool (list or dict): List of control pool codes, or mapping of every target to its own list, see
+                                     `nearest_controls`. With a mapping only its targets are treated.
         cutoff_date (str): Date for splitting pre- and post-treatment datasets.
-        training_time (int, optional): Total running time in seconds for the AutoML model. Default is 60.
-        n_cores (int, optional): Number of CPU cores to use. Default is total CPU cores minus one.
+        training_time (int, optional): Running time in seconds of the AutoML model of every target, unless
+                                       `model_config` gives a 'time_budget'. Default is 60.
+        n_cores (int, optional): Total number of CPU cores to use. Default is total CPU cores minus one.
+        time_budget (float, optional): Total running time in seconds of all the AutoML models. If given, every
+                                       target gets time_budget * n_parallel_sites / n_targets seconds instead of
+                                       `training_time`. It cannot be combined with a 'time_budget' in `model_config`.
+                                       Default is None.
+        n_parallel_sites (int, optional): Number of targets fitted at the same time. Default is
+                                          min(number of targets, n_cores).
+        model_config (dict, optional): Configuration dictionary for model training parameters, see `train_model`.
+                                       Default is None.
+        seed (int, optional): Random seed for reproducibility. Default is 7654321.
+        cache_dir (str, optional): Directory of the model cache, see `mlsc_model`. Default is None (no caching).
+        verbose (bool, optional): Whether to print progress messages. Default is True.
 
     Returns:
-        DataFrame: DataFrame containing synthetic control results for all treatment targets.
+        DataFrame: DataFrame containing synthetic control results for all treatment targets. The targets that
+                   failed or have no observed dates, with their error messages, are given in `attrs['errors']`,
+                   and the targets predicted with a cached model in `attrs['cached']`.
+
+    Raises:
+        ValueError: If the time budget is given both as `time_budget` and in `model_config`.
 
     Example Usage:
-        # Perform synthetic control using ML regression models in parallel
-        synthetic_all = ml_syn_parallel(df, poll_col='Poll', code_col='Code',
-                                        control_pool=['A', 'B', 'C'], cutoff_date='2020-01-01', training_time=120, n_cores=4)
+        # Perform synthetic control using ML regression models in parallel, within 20 minutes in total
+        synthetic_all = mlsc_all(df, poll_col='Poll', code_col='Code', control_pool=['A', 'B', 'C'],
+                                 cutoff_date='2020-01-01', n_cores=8, time_budget=1200, cache_dir='mlsc_models')
     """
-    # Default logic for cpu cores
-    n_cores = n_cores if n_cores is not None else os.cpu_count() - 1
+    # Split the core budget between the concurrent targets
+    n_cores = effective_n_jobs(n_cores if n_cores is not None else os.cpu_count() - 1)
     treatment_pool = df[code_col].unique()
-    synthetic_all = pd.concat(Parallel(n_jobs=n_cores)(delayed(ml_syn)(
-                    df=df,
-                    poll_col=poll_col,
-                    code_col=code_col,
-                    treat_target=code,
-                    control_pool=control_pool,
-                    cutoff_date=cutoff_date,
-                    training_time=training_time) for code in treatment_pool))
+    if isinstance(control_pool, dict):
+        treatment_pool = treatment_pool[pd.Index(treatment_pool).isin(list(control_pool))]
+    n_parallel_sites = (min(len(treatment_pool), n_cores) if n_parallel_sites is None
+                        else max(1, min(n_parallel_sites, len(treatment_pool))))
+    site_cores = max(1, n_cores // max(n_parallel_sites, 1))
+
+    # A time budget given in `model_config` wins over `training_time`, otherwise every target gets its slice of
+    # the global time budget, running in one of the concurrent slots
+    model_config = {'n_jobs': site_cores, **(model_config or {})}
+    if 'time_budget' in model_config:
+        if time_budget is not None:
+            raise ValueError("Give the time budget either as `time_budget` or in `model_config`, not both.")
+        training_time = model_config['time_budget']
+    elif time_budget is not None:
+        training_time = time_budget * n_parallel_sites / max(len(treatment_pool), 1)
+    model_config['time_budget'] = training_time
+
+    # Pivot the panel once into a date x station matrix
+    dfp = process_date(df).pivot_table(index='date', columns=code_col, values=poll_col, dropna=False)
+
+    if verbose:
+        print(pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'), f": Fitting {len(treatment_pool)} targets,",
+              n_parallel_sites, "at a time with", site_cores, "cores and {:.0f} s each...".format(training_time))
+
+    # Publish the matrix once and hand every worker only the handle and the date/station labels
+    with shared_folder() as folder:
+        panel = share_array(dfp.values.astype(np.float64), folder)
+        tasks = (delayed(mlsc_batch_worker)(
+                 panel=panel,
+                 dates=dfp.index.values,
+                 codes=list(dfp.columns),
+                 poll_col=poll_col,
+                 code_col=code_col,
+                 treat_target=code,
+                 control_pool=control_pool,
+                 cutoff_date=cutoff_date,
+                 model_config=model_config,
+                 seed=seed,
+                 cache_dir=cache_dir,
+                 verbose=False) for code in treatment_pool)
+        results = (Parallel(n_jobs=n_parallel_sites, return_as='generator_unordered')(tasks) if n_parallel_sites > 1
+                   else (function(*args, **kwargs) for function, args, kwargs in tasks))
+
+        synthetic = {}
+        errors = []
+        cached = []
+        for i, (code, data, error, elapsed_time) in enumerate(results):
+            if error is None and len(data) == 0:
+                error = "ValueError: The target has no observed dates."
+            if error is not None:
+                errors.append({code_col: code, 'error': error})
+                if verbose:
+                    print(pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'), f": Target {code} failed: {error}")
+                continue
+
+            synthetic[code] = data
+            if data.attrs.pop('cached_model', False):
+                cached.append(code)
+            if verbose:
+                print(pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'),
+                      ": Target {} done in {:.1f} s{} ({}/{})".format(code, elapsed_time,
+                                                                    " with its cached model" if code in cached else "",
+                                                                    i + 1, len(treatment_pool)))
+
+    synthetic_all = (pd.concat([synthetic[code] for code in treatment_pool if code in synthetic]) if synthetic
+                     else pd.DataFrame(columns=[code_col, poll_col, 'synthetic', 'effects'],
+                                       index=pd.DatetimeIndex([], name='date')))
+    synthetic_all.attrs['errors'] = pd.DataFrame(errors, columns=[code_col, 'error'])
+    synthetic_all.attrs['cached'] = cached
+
+    if verbose:
+        print(pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'),
+              f": {len(synthetic)} targets done, {len(cached)} with cached models, {len(errors)} failed.")
+
     return synthetic_all
 
 
+def mlsc_batch_worker(treat_target, **kwargs):
+    """
+    Worker function running one target of `mlsc_all`, returning the error instead of raising it.
+
+    Parameters:
+        treat_target (str): Code of the treatment target.
+        **kwargs: Other arguments passed to `mlsc_worker`.
+
+    Returns:
+        tuple: (target, results, error message or None, elapsed time in seconds).
+    """
+    start_time = time.time()
+
+    try:
+        data = mlsc_worker(treat_target=treat_target, **kwargs)
+    except Exception as e:
+        return treat_target, None, f"{type(e).__name__}: {e}", time.time() - start_time
+
+    return treat_target, data, None, time.time() - start_time
+
+
+def mlsc_worker(panel, dates, codes, poll_col, code_col, treat_target, control_pool, cutoff_date, model_config=None,
+                seed=7654321, cache_dir=None, verbose=True):
+    """
+    Worker function performing synthetic control using machine learning regression models for one treatment
+    target on a date x station matrix.
+
+    Parameters:
+        panel (numpy.ndarray or dict): Matrix of shape (len(dates), len(codes)) holding the poll data, or its
+                                       handle from `share_array`.
+        dates (numpy.ndarray): Dates of the rows of `panel`.
+        codes (list): Station codes of the columns of `panel`.
+        poll_col (str): Name of the column containing the poll data.
+        code_col (str): Name of the column containing the code data.
+        treat_target (str): Code of the treatment target.
+        control_pool (list or dict): List of control pool codes, or mapping of every target to its own list, see
+                                     `nearest_controls`.
+        cutoff_date (str): Date for splitting pre- and post-treatment datasets.
+        model_config (dict, optional): Configuration dictionary for model training parameters. Default is None.
+        seed (int, optional): Random seed for reproducibility. Default is 7654321.
+        cache_dir (str, optional): Directory of the model cache, see `mlsc_model`. Default is None.
+        verbose (bool, optional): If True, print progress messages. Default is True.
+
+    Returns:
+        DataFrame: DataFrame containing synthetic control results for the specified treatment target. Whether
+                   the model was loaded from the cache is given in `attrs['cached_model']`.
+    """
+    panel = load_shared(panel)
+    dates = pd.DatetimeIndex(dates, name='date')
+
+    pool = set(target_controls(control_pool, treat_target))
+    control_index = [j for j, code in enumerate(codes) if code != treat_target and code in pool]
+    y = panel[:, codes.index(treat_target)]
+    observed = np.isfinite(y)
+    x = pd.DataFrame(panel[:, control_index], columns=[str(codes[j]) for j in control_index], index=dates)
+
+    # Train on the observed pre-treatment dates of the target
+    pre_treatment = observed & (dates < pd.Timestamp(cutoff_date))
+    model, cached = mlsc_model(x[pre_treatment].assign(value=y[pre_treatment]), list(x.columns),
+                               model_config=model_config, seed=seed, cache_dir=cache_dir, verbose=verbose)
+
+    # Combining synthetic control results with actual data
+    data = pd.DataFrame({code_col: treat_target,
+                         poll_col: y[observed],
+                         'synthetic': model_predict(model, x[observed])}, index=dates[observed])
+    data['effects'] = data[poll_col] - data['synthetic']
+    data.attrs['cached_model'] = cached
+
+    return data
+
+
+def mlsc_model(df, feature_names, model_config=None, seed=7654321, cache_dir=None, verbose=True):
+    """
+    Trains the AutoML model of a synthetic control, reusing a model cached on disk when possible.
+
+    The cache key covers the training data, the features, the model configuration without its time budget and
+    the seed. A cached model is reused when it was trained with a time budget at least as large as the requested
+    one, e.g. to re-predict the post-treatment period or in placebo runs; otherwise the model is retrained with
+    the larger budget and replaces the cached one.
+
+    Parameters:
+        df (pandas.DataFrame): Training data with the 'value' column and the control stations.
+        feature_names (list of str): Control station columns.
+        model_config (dict, optional): Configuration dictionary for model training parameters. Default is None.
+        seed (int, optional): Random seed for reproducibility. Default is 7654321.
+        cache_dir (str, optional): Directory of the model cache. If None, the model is trained without caching.
+                                   Default is None.
+        verbose (bool, optional): If True, print progress messages. Default is True.
+
+    Returns:
+        tuple:
+            - object: Trained AutoML model.
+            - bool: Whether the model was loaded from the cache.
+    """
+    if cache_dir is None:
+        return train_model(df, value='value', variables=feature_names, model_config=model_config, seed=seed,
+                           verbose=verbose), False
+
+    # A negative FLAML time budget means no time limit
+    time_budget = merge_model_config(model_config)['time_budget']
+    time_budget = np.inf if time_budget is None or time_budget < 0 else time_budget
+
+    config = {key: val for key, val in (model_config or {}).items() if key != 'time_budget'}
+    key = model_cache_key(df, feature_names, 'mlsc', None, config, seed)
+    entry = read_model_cache(cache_dir, key, min_time_budget=time_budget, verbose=verbose)
+    if entry is not None:
+        return entry['model'], True
+
+    model = train_model(df, value='value', variables=feature_names, model_config=model_config, seed=seed,
+                        verbose=verbose)
+    write_model_cache(cache_dir, key, {'model': model, 'time_budget': time_budget})
+
+    return model, False
+
+
 ## number of valid readings
 def n(x, mod, obs):
     """
@@ -1,7 +1,7 @@
 from setuptools import setup, find_packages
 
 required_packages = [
-    "pandas", "numpy", "scipy", "joblib", "flaml",
+    "pandas", "numpy", "scipy", "joblib>=1.3.0", "flaml",
      "scikit-learn>=1.3.0", "statsmodels",
 ]
 
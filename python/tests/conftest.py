@@ -0,0 +1,32 @@
+import os
+
+import pandas as pd
+import pytest
+
+import normet as nm
+
+
+DATA = os.path.join(os.path.dirname(__file__), '..', 'docs', 'notebooks', 'data', 'MY1.csv')
+FEATURES = ['temp', 'ws', 'wd', 'AT10', 'AP10', 'date_unix', 'day_julian', 'weekday', 'hour']
+
+
+@pytest.fixture(scope='session')
+def my1():
+    """MY1 hourly data shipped with the documentation notebooks."""
+    return pd.read_csv(DATA, parse_dates=['date'])
+
+
+@pytest.fixture(scope='session')
+def trained(my1):
+    """Trains, once per session, a small AutoML model of PM2.5 with a single estimator."""
+    models = {}
+
+    def train(estimator):
+        if estimator not in models:
+            models[estimator] = nm.prepare_train_model(
+                my1, 'PM2.5', FEATURES, 'random', 0.75,
+                {'time_budget': 5, 'max_iter': 5, 'estimator_list': [estimator], 'n_jobs': 1, 'verbose': 0},
+                seed=7654321, verbose=False)
+        return models[estimator]
+
+    return train
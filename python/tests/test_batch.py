@@ -0,0 +1,43 @@
+import pandas as pd
+import pytest
+
+import normet as nm
+from conftest import FEATURES
+
+
+CONFIG = {'time_budget': 5, 'max_iter': 3, 'estimator_list': ['lgbm'], 'n_jobs': 1}
+
+
+@pytest.mark.parametrize('method', ['do_all', 'decom_emi', 'decom_met', 'rolling'])
+def test_training_is_silent_without_verbose(my1, method, capsys):
+    df = my1.iloc[:24 * 40]
+    kwargs = dict(window_days=14, rolling_every=14) if method == 'rolling' else {}
+
+    getattr(nm, method)(df=df, value='PM2.5', feature_names=FEATURES, model_config=CONFIG, n_samples=2, n_cores=1,
+                        verbose=False, **kwargs)
+
+    assert capsys.readouterr().out == ''
+
+
+def test_batch_all_runs_every_site_silently(my1, capsys):
+    df = pd.concat([my1.iloc[:24 * 30].assign(code=code) for code in ['A', 'B']], ignore_index=True)
+
+    df_long, mod_stats = nm.batch_all(df, value='PM2.5', feature_names=FEATURES, method='decom_emi', n_cores=1,
+                                      verbose=False, model_config=CONFIG, n_samples=2)
+
+    assert sorted(df_long['code'].unique()) == ['A', 'B']
+    assert mod_stats.attrs['errors'].empty
+    assert capsys.readouterr().out == ''
+
+
+def test_batch_all_keeps_a_datetime_index(my1):
+    df = pd.concat([my1.iloc[:24 * 30].assign(code=code) for code in ['A', 'B']], ignore_index=True)
+
+    df_long, mod_stats = nm.batch_all(df.set_index('date'), value='PM2.5', feature_names=FEATURES, method='do_all',
+                                      n_cores=1, verbose=False, model_config=CONFIG, n_samples=2)
+    expected, _ = nm.batch_all(df, value='PM2.5', feature_names=FEATURES, method='do_all', n_cores=1,
+                               verbose=False, model_config=CONFIG, n_samples=2)
+
+    assert mod_stats.attrs['errors'].empty
+    assert sorted(df_long['code'].unique()) == ['A', 'B']
+    pd.testing.assert_frame_equal(df_long, expected)
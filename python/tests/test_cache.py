@@ -0,0 +1,109 @@
+import os
+import sys
+
+import pytest
+
+import normet as nm
+from conftest import FEATURES
+
+
+CONFIG = {'time_budget': 5, 'max_iter': 3, 'estimator_list': ['lgbm'], 'n_jobs': 1, 'verbose': 0}
+
+
+@pytest.fixture(scope='module')
+def prepared(my1):
+    return nm.prepare_data(my1.iloc[:24 * 60], 'PM2.5', ['temp', 'ws', 'wd'])
+
+
+def key(df, **changes):
+    args = dict(feature_names=FEATURES, split_method='random', fraction=0.75, model_config=CONFIG, seed=7654321)
+    return nm.model_cache_key(df, **{**args, **changes})
+
+
+def entries(cache_dir, n, start=1000000000):
+    """Writes `n` small entries with increasing last-used times and returns their keys."""
+    keys = [f'k{i}' for i in range(n)]
+    for i, k in enumerate(keys):
+        path = nm.write_model_cache(str(cache_dir), k, {'model': i, 'padding': b'x' * 1000})
+        os.utime(path, (start + i, start + i))
+    return keys
+
+
+def test_model_cache_key_covers_data_and_training_settings(prepared):
+    reference = key(prepared)
+
+    assert key(prepared.copy()) == reference
+    assert key(prepared[prepared.columns[::-1]]) == reference
+    assert key(prepared, model_config={**CONFIG, 'n_jobs': 4, 'verbose': 3}) == reference
+
+    changed = prepared.copy()
+    changed.loc[changed.index[0], 'temp'] += 1
+    others = [key(changed), key(prepared, feature_names=FEATURES[:-1]), key(prepared, split_method='ts'),
+              key(prepared, fraction=0.8), key(prepared, model_config={**CONFIG, 'time_budget': 6}),
+              key(prepared, seed=1)]
+    assert len({reference, *others}) == len(others) + 1
+
+
+def test_cached_training_hits_on_the_second_call(my1, tmp_path, monkeypatch):
+    df = my1.iloc[:24 * 60]
+    stats = nm.model_cache_report(str(tmp_path)).attrs
+
+    df_first, model, mod_stats = nm.cached_prepare_train_model(df, 'PM2.5', FEATURES, 'random', 0.75, CONFIG, 7654321,
+                                                               verbose=False, cache_dir=str(tmp_path))
+    after_miss = nm.model_cache_report(str(tmp_path))
+    assert len(after_miss) == 1
+    assert after_miss.attrs['misses'] == stats['misses'] + 1
+
+    # A hit must not train again
+    def fail(*args, **kwargs):
+        raise AssertionError("The model was trained again.")
+    monkeypatch.setattr(sys.modules['normet.normet'], 'train_model', fail)
+
+    df_second, cached, cached_stats = nm.cached_prepare_train_model(df, 'PM2.5', FEATURES, 'random', 0.75, CONFIG,
+                                                                    7654321, verbose=False, cache_dir=str(tmp_path))
+    assert nm.model_cache_report(str(tmp_path)).attrs['hits'] == stats['hits'] + 1
+    assert cached.best_config == model.best_config
+    assert (cached.predict(df_second[FEATURES]) == model.predict(df_first[FEATURES])).all()
+    assert cached_stats.equals(mod_stats)
+
+    # Another seed is a miss
+    with pytest.raises(AssertionError, match='trained again'):
+        nm.cached_prepare_train_model(df, 'PM2.5', FEATURES, 'random', 0.75, CONFIG, 1, verbose=False,
+                                      cache_dir=str(tmp_path))
+
+
+def test_read_model_cache_treats_missing_and_corrupt_entries_as_misses(tmp_path):
+    assert nm.read_model_cache(str(tmp_path), 'absent', verbose=False) is None
+
+    (tmp_path / 'corrupt.pkl').write_bytes(b'not a pickle')
+    assert nm.read_model_cache(str(tmp_path), 'corrupt', verbose=False) is None
+
+
+def test_eviction_removes_the_least_recently_used_models(tmp_path):
+    keys = entries(tmp_path, 4)
+
+    # Reading an entry marks it as recently used
+    assert nm.read_model_cache(str(tmp_path), keys[0], verbose=False)['model'] == 0
+    nm.write_model_cache(str(tmp_path), 'new', {'model': 'new'}, max_models=3)
+
+    assert sorted(nm.model_cache_report(str(tmp_path))['key']) == sorted([keys[0], keys[3], 'new'])
+
+
+def test_eviction_by_size_keeps_the_entry_just_written(tmp_path):
+    entries(tmp_path, 3)
+    size = nm.model_cache_report(str(tmp_path))['bytes'].max()
+
+    nm.write_model_cache(str(tmp_path), 'large', {'model': 'large', 'padding': b'x' * 10 * size}, max_bytes=size)
+
+    assert list(nm.model_cache_report(str(tmp_path))['key']) == ['large']
+    assert nm.evict_model_cache(str(tmp_path), max_models=0, keep=str(tmp_path / 'large.pkl')) == []
+
+
+def test_failed_write_leaves_no_partial_files(tmp_path):
+    entries(tmp_path, 1)
+
+    with pytest.raises(Exception):
+        nm.write_model_cache(str(tmp_path), 'k0', {'model': lambda x: x})
+
+    assert sorted(os.listdir(tmp_path)) == ['k0.pkl']
+    assert nm.read_model_cache(str(tmp_path), 'k0', verbose=False)['model'] == 0
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+import normet as nm
+from conftest import FEATURES
+
+
+@pytest.mark.parametrize('estimator', ['lgbm', 'xgboost'])
+def test_contributions_add_up_to_prediction(trained, estimator):
+    df, model = trained(estimator)
+
+    contributions = nm.native_contributions(model, df)
+    prediction = model.predict(df[FEATURES])
+
+    assert set(contributions.columns) == set(FEATURES) | {'bias'}
+    np.testing.assert_allclose(contributions.drop(columns='bias').sum(axis=1),
+                               prediction - contributions['bias'], rtol=1e-5, atol=1e-4)
+
+
+@pytest.mark.parametrize('estimator', ['lgbm', 'xgboost'])
+def test_decom_met_shap_components_add_up_to_prediction(trained, estimator):
+    df, model = trained(estimator)
+
+    components, _ = nm.decom_met(df, model=model, value='value', feature_names=FEATURES, method='shap', verbose=False)
+    prediction = df.assign(prediction=model.predict(df[FEATURES])).groupby('date')['prediction'].mean()
+    met_vars = [var for var in FEATURES if var not in ('date_unix', 'day_julian', 'weekday', 'hour')]
+
+    assert list(components.columns) == ['observed', 'deweathered'] + [
+        var for var in components.columns if var in met_vars] + ['met_noise']
+    np.testing.assert_allclose(components[['deweathered'] + met_vars].sum(axis=1), prediction, rtol=1e-5, atol=1e-4)
+    np.testing.assert_allclose(components['met_noise'], components['observed'] - prediction, rtol=1e-5, atol=1e-4)
+
+
+def test_decom_met_shap_rejects_forests(trained):
+    df, model = trained('rf')
+
+    with pytest.raises(ValueError):
+        nm.decom_met(df, model=model, value='value', feature_names=FEATURES, method='shap', verbose=False)
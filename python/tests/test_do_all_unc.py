@@ -0,0 +1,20 @@
+import pandas as pd
+
+import normet as nm
+from conftest import FEATURES
+
+
+# A fixed number of iterations and threads, so that every model is the same whatever the schedule
+CONFIG = {'time_budget': -1, 'max_iter': 3, 'estimator_list': ['lgbm'], 'n_jobs': 1, 'verbose': 0}
+
+
+def test_parallel_models_match_serial_run(my1):
+    kwargs = dict(df=my1.iloc[:24 * 40], value='PM2.5', feature_names=FEATURES, model_config=CONFIG, n_samples=4,
+                  n_models=3, n_cores=2, verbose=False)
+
+    serial, serial_stats = nm.do_all_unc(n_parallel_models=1, **kwargs)
+    parallel, parallel_stats = nm.do_all_unc(n_parallel_models=2, **kwargs)
+
+    pd.testing.assert_frame_equal(parallel, serial)
+    pd.testing.assert_frame_equal(parallel_stats, serial_stats)
+    assert list(parallel_stats.attrs['timing']['seed']) == list(serial_stats.attrs['timing']['seed'])
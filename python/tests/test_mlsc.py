@@ -0,0 +1,69 @@
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import normet as nm
+
+
+CONFIG = {'max_iter': 3, 'estimator_list': ['lgbm'], 'verbose': 0}
+
+
+@pytest.fixture(scope='module')
+def panel():
+    """Daily panel of six stations sharing two factors, with one station never observed."""
+    rng = np.random.default_rng(0)
+    dates = pd.date_range('2019-01-01', periods=300, freq='D')
+    codes = [f's{i}' for i in range(6)]
+    values = rng.normal(size=(300, 2)) @ rng.normal(size=(2, 6)) + rng.normal(scale=0.3, size=(300, 6)) + 10
+    values[:, 5] = np.nan
+    return pd.DataFrame({'date': np.repeat(dates, 6), 'code': np.tile(codes, 300), 'PM2.5': values.ravel()})
+
+
+def run(panel, control_pool, **kwargs):
+    return nm.mlsc_all(panel, 'PM2.5', 'code', control_pool, '2019-10-01', n_cores=1, verbose=False, **kwargs)
+
+
+def test_mlsc_all_isolates_failing_targets(panel):
+    control_pool = {'s0': ['s1', 's2', 's3'], 's1': ['s0', 's2', 's3'], 's4': [], 's5': ['s0', 's1']}
+
+    result = run(panel, control_pool, training_time=1, model_config=CONFIG)
+
+    assert list(result['code'].unique()) == ['s0', 's1']
+    assert np.isfinite(result['synthetic']).all()
+    assert sorted(result.attrs['errors']['code']) == ['s4', 's5']
+
+
+def test_mlsc_all_returns_empty_frame_when_every_target_fails(panel):
+    result = run(panel, {'s4': [], 's5': ['s0']}, training_time=1, model_config=CONFIG)
+
+    assert result.empty
+    assert list(result.columns) == ['code', 'PM2.5', 'synthetic', 'effects']
+    assert sorted(result.attrs['errors']['code']) == ['s4', 's5']
+
+
+def test_mlsc_all_time_budget_in_model_config_wins(panel, tmp_path):
+    run(panel, {'s0': ['s1', 's2']}, training_time=60, model_config={**CONFIG, 'time_budget': 1},
+        cache_dir=str(tmp_path))
+
+    (name,) = os.listdir(tmp_path)
+    with open(tmp_path / name, 'rb') as f:
+        assert pickle.load(f)['time_budget'] == 1
+
+    with pytest.raises(ValueError):
+        run(panel, {'s0': ['s1', 's2']}, time_budget=10, model_config={**CONFIG, 'time_budget': 1})
+
+
+def test_mlsc_cache_only_reuses_models_with_a_large_enough_budget(panel, tmp_path):
+    control_pool = {'s0': ['s1', 's2', 's3']}
+
+    first = run(panel, control_pool, training_time=1, model_config=CONFIG, cache_dir=str(tmp_path))
+    longer = run(panel, control_pool, training_time=2, model_config=CONFIG, cache_dir=str(tmp_path))
+    shorter = run(panel, control_pool, training_time=1, model_config=CONFIG, cache_dir=str(tmp_path))
+
+    assert first.attrs['cached'] == [] and longer.attrs['cached'] == []
+    assert shorter.attrs['cached'] == ['s0']
+    np.testing.assert_array_equal(shorter['synthetic'], longer['synthetic'])
+    assert len(os.listdir(tmp_path)) == 1
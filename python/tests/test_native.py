@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+import normet as nm
+from conftest import FEATURES
+
+
+@pytest.mark.parametrize('estimator', ['lgbm', 'xgboost', 'rf', 'extra_tree'])
+def test_native_predictor_matches_automl_predict(trained, estimator):
+    df, model = trained(estimator)
+    X = df[FEATURES].copy()
+    X.loc[X.index[::7], 'ws'] = np.nan
+    X.loc[X.index[::11], 'weekday'] = np.nan
+
+    assert X['weekday'].dtype == 'category'
+    assert nm.native_predictor(model) is not None
+
+    expected = model.predict(X)
+    np.testing.assert_allclose(nm.model_predict(model, X), expected, rtol=1e-10, atol=1e-10)
+    np.testing.assert_allclose(nm.model_predict(model, X, native=False), expected, rtol=0, atol=0)
+
+
+@pytest.mark.parametrize('estimator', ['lgbm', 'xgboost', 'rf', 'extra_tree'])
+def test_native_normalise_matches_automl_predict(trained, estimator):
+    df, model = trained(estimator)
+    df = df.iloc[:500].reset_index(drop=True)
+    kwargs = dict(n_samples=3, aggregate=False, n_cores=1, verbose=False)
+
+    native = nm.normalise(df, model, FEATURES, **kwargs)
+    automl = nm.normalise(df, model, FEATURES, native=False, **kwargs)
+
+    np.testing.assert_allclose(native.to_numpy(dtype=float), automl.to_numpy(dtype=float), rtol=1e-10, atol=1e-10)
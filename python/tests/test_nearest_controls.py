@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import normet as nm
+
+
+EARTH_RADIUS = 6371.0088
+
+
+@pytest.fixture(scope='module')
+def sites():
+    """Long-format data of 40 sites scattered over Great Britain, three dates each, with two location types."""
+    rng = np.random.default_rng(0)
+    coordinates = pd.DataFrame({'code': [f'S{i:02d}' for i in range(40)],
+                                'latitude': rng.uniform(50.5, 55.5, size=40),
+                                'longitude': rng.uniform(-4.5, 1.0, size=40),
+                                'location_type': rng.choice(['Urban Background', 'Urban Traffic'], size=40)})
+    dates = pd.date_range('2020-01-01', periods=3, freq='D')
+    return coordinates.merge(pd.DataFrame({'date': dates}), how='cross')
+
+
+def brute_force(sites, target, control_pool=None, k=None, radius=None, location_type=None):
+    """Controls of a target from the haversine distances to every candidate, nearest first."""
+    coordinates = sites.groupby('code').first()
+    lat, lon = np.radians(coordinates['latitude']), np.radians(coordinates['longitude'])
+    lat0, lon0 = lat[target], lon[target]
+    distance = 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.sin((lat - lat0) / 2) ** 2
+                                                    + np.cos(lat0) * np.cos(lat) * np.sin((lon - lon0) / 2) ** 2))
+
+    candidates = coordinates.index != target
+    if control_pool is not None:
+        candidates &= coordinates.index.isin(control_pool)
+    if location_type is not None:
+        candidates &= coordinates['location_type'] == location_type
+    if radius is not None:
+        candidates &= distance <= radius
+
+    selected = distance[candidates].sort_values().index.tolist()
+    return selected[:k] if k is not None else selected
+
+
+@pytest.mark.parametrize('k, radius', [(5, None), (None, 100), (5, 100), (60, None)])
+@pytest.mark.parametrize('location_type', [None, 'Urban Background'])
+def test_nearest_controls_match_brute_force_distances(sites, k, radius, location_type):
+    result = nm.nearest_controls(sites, 'code', k=k, radius=radius, location_type=location_type)
+
+    assert list(result) == list(sites['code'].unique())
+    for target, controls in result.items():
+        assert controls == brute_force(sites, target, k=k, radius=radius, location_type=location_type)
+
+
+def test_nearest_controls_of_given_targets_from_a_control_pool(sites):
+    control_pool = [f'S{i:02d}' for i in range(0, 40, 2)]
+
+    result = nm.nearest_controls(sites, 'code', treat_target=['S01', 'S02'], control_pool=control_pool, k=4)
+
+    assert list(result) == ['S01', 'S02']
+    for target, controls in result.items():
+        assert controls == brute_force(sites, target, control_pool=control_pool, k=4)
+
+
+def test_nearest_controls_requires_k_or_radius(sites):
+    with pytest.raises(ValueError):
+        nm.nearest_controls(sites, 'code')
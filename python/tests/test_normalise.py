@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import normet as nm
+from conftest import FEATURES
+
+
+@pytest.fixture(scope='module')
+def lgbm(trained):
+    df, model = trained('lgbm')
+    return df.iloc[:600].reset_index(drop=True), model
+
+
+@pytest.mark.parametrize('replace', [True, False])
+def test_normalise_matches_normalise_worker(lgbm, replace):
+    df, model = lgbm
+    variables = [var for var in FEATURES if var != 'date_unix']
+    seeds = nm.spawn_seeds(7654321, 3)
+
+    result = nm.normalise(df, model, FEATURES, n_samples=3, replace=replace, aggregate=False, n_cores=1,
+                          chunk_size=250, verbose=False)
+
+    for seed in seeds:
+        expected = (nm.normalise_worker(0, df, model, variables, replace, seed, verbose=False)
+                    .groupby('date')['normalised'].mean())
+        np.testing.assert_allclose(result[seed].to_numpy(), expected.to_numpy(), rtol=1e-10)
+
+
+@pytest.mark.parametrize('chunk_size', [100, 600, 1000, 5000])
+def test_normalise_does_not_depend_on_chunk_size(lgbm, chunk_size):
+    df, model = lgbm
+    kwargs = dict(n_samples=7, n_cores=1, uncertainty=True, verbose=False)
+
+    expected = nm.normalise(df, model, FEATURES, chunk_size=10 ** 6, **kwargs)
+    result = nm.normalise(df, model, FEATURES, chunk_size=chunk_size, **kwargs)
+
+    pd.testing.assert_frame_equal(result, expected, rtol=1e-10)
+
+
+@pytest.mark.parametrize('replace', [True, False])
+def test_normalise_levels_match_normalise_per_level(lgbm, replace):
+    df, model = lgbm
+    levels = {'deweathered': [var for var in FEATURES if var != 'date_unix'],
+              'temp': ['ws', 'wd', 'AT10', 'AP10', 'day_julian', 'weekday', 'hour'],
+              'ws': ['wd', 'AT10', 'hour'],
+              'hour': ['hour']}
+
+    result = nm.normalise_levels(df, model, FEATURES, levels, n_samples=6, replace=replace, n_cores=2,
+                                 chunk_size=700, verbose=False)
+
+    assert list(result.columns) == ['observed'] + list(levels)
+    for level, variables in levels.items():
+        expected = nm.normalise(df, model, FEATURES, variables_resample=variables, n_samples=6, replace=replace,
+                                n_cores=1, verbose=False)
+        pd.testing.assert_series_equal(result[level], expected['normalised'].rename(level), rtol=1e-10)
+    pd.testing.assert_series_equal(result['observed'], expected['observed'])
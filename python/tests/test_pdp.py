@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats.mstats import mquantiles
+
+import normet as nm
+
+
+def brute_force_ice(model, X, assignments):
+    """Predictions of every row of `X` with the variables set to each assignment of the grid, one call per point."""
+    curves = []
+    for assignment in assignments:
+        X_point = X.copy()
+        for var, value in assignment.items():
+            X_point[var] = pd.Series(value, index=X.index).astype(X[var].dtype)
+        curves.append(model.predict(X_point))
+    return np.array(curves)
+
+
+def expected_grid(values, grid_resolution=100, percentiles=(0.05, 0.95)):
+    """Grid rule of scikit-learn's `partial_dependence`."""
+    unique = np.unique(values)
+    if isinstance(values.dtype, pd.CategoricalDtype) or len(unique) < grid_resolution:
+        return unique
+    return np.linspace(*mquantiles(values, prob=percentiles), grid_resolution)
+
+
+@pytest.mark.parametrize('variable', ['wd', 'temp', 'hour', 'weekday'])
+def test_pdp_matches_brute_force_ice_averaging(trained, variable):
+    df, model = trained('lgbm')
+    X = df.loc[df['set'] == 'training', nm.extract_feature_names(model)]
+
+    result = nm.pdp(df, model, variables=[variable], n_cores=1, chunk_size=20000)
+    grid = expected_grid(X[variable])
+    curves = brute_force_ice(model, X, [{variable: value} for value in grid])
+
+    assert list(result['variable'].unique()) == [variable]
+    np.testing.assert_allclose(result['value'].to_numpy(dtype=float), np.asarray(grid, dtype=float), rtol=1e-12)
+    np.testing.assert_allclose(result['pdp_mean'], curves.mean(axis=1), rtol=1e-9, atol=1e-9)
+    np.testing.assert_allclose(result['pdp_std'], curves.std(axis=1), rtol=1e-7, atol=1e-7)
+
+
+def test_pdp_subsample_matches_brute_force_on_the_same_rows(trained):
+    df, model = trained('xgboost')
+    X = df.loc[df['set'] == 'training', nm.extract_feature_names(model)]
+    rows = np.sort(np.random.default_rng(3).choice(len(X), size=500, replace=False))
+
+    result = nm.pdp(df, model, variables=['ws'], n_cores=1, grid_resolution=20, subsample=500, seed=3)
+    grid = expected_grid(X['ws'].iloc[rows], grid_resolution=20)
+    curves = brute_force_ice(model, X.iloc[rows], [{'ws': value} for value in grid])
+
+    np.testing.assert_allclose(result['value'], grid, rtol=1e-12)
+    np.testing.assert_allclose(result['pdp_mean'], curves.mean(axis=1), rtol=1e-6, atol=1e-6)
+
+
+@pytest.mark.parametrize('pair', [('temp', 'weekday'), ('weekday', 'ws')])
+def test_two_way_pdp_matches_brute_force_ice_averaging(trained, pair):
+    df, model = trained('lgbm')
+    X = df.loc[df['set'] == 'training', nm.extract_feature_names(model)]
+
+    result = nm.pdp(df, model, variables=[pair], n_cores=1, grid_resolution=12, chunk_size=50000)
+    grid_a, grid_b = (expected_grid(X[var], grid_resolution=12) for var in pair)
+    assignments = [{pair[0]: a, pair[1]: b} for a in grid_a for b in grid_b]
+    curves = brute_force_ice(model, X, assignments)
+
+    assert len(result) == len(grid_a) * len(grid_b)
+    assert (result['var_a'] == pair[0]).all() and (result['var_b'] == pair[1]).all()
+    np.testing.assert_allclose(result['value_a'].to_numpy(dtype=float),
+                               [float(point[pair[0]]) for point in assignments], rtol=1e-12)
+    np.testing.assert_allclose(result['value_b'].to_numpy(dtype=float),
+                               [float(point[pair[1]]) for point in assignments], rtol=1e-12)
+    np.testing.assert_allclose(result['mean'], curves.mean(axis=1), rtol=1e-9, atol=1e-9)
+    np.testing.assert_allclose(result['std'], curves.std(axis=1), rtol=1e-7, atol=1e-7)
+
+
+def test_pdp_rejects_mixed_variables_and_pairs(trained):
+    df, model = trained('lgbm')
+
+    with pytest.raises(ValueError):
+        nm.pdp(df, model, variables=['temp', ('ws', 'wd')], n_cores=1)
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import normet as nm
+from conftest import FEATURES
+
+
+def rowwise_prepare_data(df, value, feature_names, na_rm=True, split_method='random', fraction=0.75, seed=7654321):
+    """Row-wise reference of `prepare_data`: per-column fills, `apply` date variables and concatenated sets."""
+    df = nm.check_data(nm.process_date(df), feature_names, value)
+
+    if na_rm:
+        df = df.dropna(subset=['value']).reset_index(drop=True)
+    for col in df.select_dtypes(include=[np.number]).columns:
+        df = df.fillna({col: df[col].median()})
+    for col in df.select_dtypes(include=['object', 'category']).columns:
+        df = df.fillna({col: df[col].mode()[0]})
+
+    df['date_unix'] = df['date'].apply(lambda x: x.timestamp())
+    df['day_julian'] = df['date'].apply(lambda x: x.timetuple().tm_yday)
+    df['weekday'] = df['date'].apply(lambda x: x.weekday() + 1).astype('category')
+    df['hour'] = df['date'].apply(lambda x: x.hour)
+
+    df = df.reset_index().rename(columns={'index': 'rowid'})
+    if split_method == 'random':
+        training = df.sample(frac=fraction, random_state=seed)
+        sets = [training, df[~df['rowid'].isin(training['rowid'])]]
+    elif split_method == 'ts':
+        split_index = int(fraction * len(df))
+        sets = [df.iloc[:split_index], df.iloc[split_index:]]
+    else:
+        month = df['date'].dt.month
+        groups = month.map(lambda m: {12: 0, 1: 0, 2: 0}.get(m, (m // 3))) if split_method == 'season' else month
+        parts = [df[groups == group] for group in sorted(groups.unique())]
+        sets = [pd.concat([part.iloc[:int(fraction * len(part))] for part in parts]),
+                pd.concat([part.iloc[int(fraction * len(part)):] for part in parts])]
+
+    return (pd.concat([sets[0].assign(set='training'), sets[1].assign(set='testing')])
+            .sort_values(by='date', kind='stable').reset_index(drop=True))
+
+
+@pytest.fixture(scope='module')
+def raw(my1):
+    """MY1 with missing targets, numeric features and whole missing days injected."""
+    df = my1.copy()
+    df.loc[df.index[::13], 'PM2.5'] = np.nan
+    df.loc[df.index[::5], 'temp'] = np.nan
+    df.loc[df.index[::17], 'ws'] = np.nan
+    df.loc[df.index[200:224], ['temp', 'ws', 'wd']] = np.nan
+    return df
+
+
+@pytest.mark.parametrize('split_method', ['random', 'ts', 'season', 'month'])
+@pytest.mark.parametrize('na_rm', [True, False])
+def test_prepare_data_matches_rowwise_reference(raw, split_method, na_rm):
+    variables = [var for var in FEATURES if var not in ('date_unix', 'day_julian', 'weekday', 'hour')]
+
+    result = nm.prepare_data(raw, 'PM2.5', variables, na_rm=na_rm, split_method=split_method)
+    expected = rowwise_prepare_data(raw, 'PM2.5', variables, na_rm=na_rm, split_method=split_method)
+
+    assert len(result) == (raw['PM2.5'].notna().sum() if na_rm else len(raw))
+    assert result['value'].notna().all() if na_rm else result[variables].notna().all().all()
+
+    result = result.assign(set=result['set'].astype(str))[expected.columns]
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False, check_categorical=False)
+
+
+def test_split_into_sets_rejects_unknown_method(raw):
+    with pytest.raises(ValueError):
+        nm.prepare_data(raw, 'PM2.5', ['temp'], split_method='unknown')
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import normet as nm
+from conftest import FEATURES
+
+
+@pytest.fixture(scope='module')
+def lgbm(trained):
+    """Six weeks of prepared data, in date order, with three missing days."""
+    df, model = trained('lgbm')
+    days = df['date'].dt.floor('D')
+    first = days.min()
+    df = df[(days < first + pd.Timedelta(days=42))
+            & ~days.between(first + pd.Timedelta(days=20), first + pd.Timedelta(days=22))]
+    return df.reset_index(drop=True), model
+
+
+def window_slices(df, window_days, rolling_every):
+    """Rows of every window: from every `rolling_every`-th day present to `window_days` days after it."""
+    days = df['date'].dt.floor('D')
+    last_start = days.max() - pd.Timedelta(days=window_days - 1)
+    starts = np.sort(days[days <= last_start].unique())[::rolling_every]
+    return [df[(days >= start) & (days <= start + pd.Timedelta(days=window_days))] for start in starts]
+
+
+@pytest.mark.parametrize('window_days, rolling_every', [(14, 7), (10, 3)])
+def test_rolling_windows_match_normalise_on_each_window(lgbm, window_days, rolling_every):
+    df, model = lgbm
+    variables = [var for var in FEATURES if var != 'date_unix']
+
+    result, _ = nm.rolling(df, model, feature_names=FEATURES, n_samples=5, window_days=window_days,
+                           rolling_every=rolling_every, n_cores=1, verbose=False)
+    windows = window_slices(df, window_days, rolling_every)
+
+    assert list(result.columns) == ['observed'] + [f'rolling_{w}' for w in range(len(windows))]
+    assert result.attrs['errors'].empty
+    for w, window in enumerate(windows):
+        expected = nm.normalise(window, model, FEATURES, variables_resample=variables, n_samples=5, n_cores=1,
+                                verbose=False)
+        column = result[f'rolling_{w}']
+        pd.testing.assert_series_equal(column.dropna(), expected['normalised'].rename(column.name),
+                                       check_index_type=False, rtol=1e-10)
+    observed = df.groupby('date')['value'].mean()
+    pd.testing.assert_series_equal(result['observed'], observed.loc[result.index].rename('observed'))
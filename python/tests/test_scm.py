@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import Ridge, RidgeCV
+from sklearn.model_selection import GridSearchCV
+
+import normet as nm
+
+
+ALPHAS = [i / 10 for i in range(1, 101)]
+
+
+def pre_treatment(seed, n_dates=150, n_controls=8):
+    """Control stations sharing two factors with the treatment target, plus noise."""
+    rng = np.random.default_rng(seed)
+    factors = rng.normal(size=(n_dates, 2))
+    x = factors @ rng.normal(size=(2, n_controls)) + rng.normal(scale=0.5, size=(n_dates, n_controls)) + 10
+    y = x @ rng.dirichlet(np.ones(n_controls)) + rng.normal(scale=0.3, size=n_dates)
+    return x, y
+
+
+@pytest.mark.parametrize('alpha', ALPHAS[::9])
+def test_scm_fit_weights_match_ridge(alpha):
+    x, y = pre_treatment(0)
+
+    w, intercept, chosen = nm.scm_fit(x, y, alphas=[alpha])
+    ridge = Ridge(alpha=alpha).fit(x, y)
+
+    assert chosen == alpha
+    np.testing.assert_allclose(w, ridge.coef_, rtol=1e-8, atol=1e-10)
+    np.testing.assert_allclose(intercept, ridge.intercept_, rtol=1e-8)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_scm_fit_alpha_matches_grid_search(seed):
+    x, y = pre_treatment(seed, n_dates=60)
+
+    w, intercept, alpha = nm.scm_fit(x, y)
+    search = GridSearchCV(Ridge(), {'alpha': ALPHAS}, cv=5).fit(x, y)
+
+    assert alpha == search.best_params_['alpha']
+    np.testing.assert_allclose(w, search.best_estimator_.coef_, rtol=1e-8, atol=1e-10)
+    np.testing.assert_allclose(intercept, search.best_estimator_.intercept_, rtol=1e-8)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_scm_fit_leave_one_out_matches_ridge_cv(seed):
+    x, y = pre_treatment(seed, n_dates=60)
+
+    w, intercept, alpha = nm.scm_fit(x, y, cv='loo')
+    ridge = RidgeCV(alphas=ALPHAS).fit(x, y)
+
+    assert alpha == pytest.approx(ridge.alpha_)
+    np.testing.assert_allclose(w, ridge.coef_, rtol=1e-8, atol=1e-10)
+
+
+def panel(seed, n_dates=120, n_stations=10):
+    """Long-format daily panel of stations sharing two factors, plus noise."""
+    rng = np.random.default_rng(seed)
+    factors = rng.normal(size=(n_dates, 2))
+    values = factors @ rng.normal(size=(2, n_stations)) + rng.normal(scale=0.5, size=(n_dates, n_stations)) + 10
+    dates = pd.date_range('2020-01-01', periods=n_dates, freq='D')
+    codes = [f'S{j}' for j in range(n_stations)]
+    return pd.DataFrame({'date': np.repeat(dates, n_stations), 'code': np.tile(codes, n_dates),
+                         'poll': values.ravel()})
+
+
+@pytest.mark.parametrize('cv', [5, 'loo'])
+@pytest.mark.parametrize('time_ordered', [False, True])
+def test_scm_fit_batch_matches_scm_fit_per_target(cv, time_ordered):
+    values = panel(1).pivot(index='date', columns='code', values='poll').to_numpy()
+    targets = [0, 3, 7]
+    controls = [[j for j in range(values.shape[1]) if j != t] for t in targets]
+    controls[1] = controls[1][:5]
+
+    fits = nm.scm_fit_batch(values, targets, controls, cv=cv, time_ordered=time_ordered)
+
+    for t, c, (w, intercept, alpha) in zip(targets, controls, fits):
+        w_expected, intercept_expected, alpha_expected = nm.scm_fit(values[:, c], values[:, t], cv=cv,
+                                                                    time_ordered=time_ordered)
+        assert alpha == alpha_expected
+        np.testing.assert_allclose(w, w_expected, rtol=1e-8, atol=1e-10)
+        assert intercept == pytest.approx(intercept_expected, rel=1e-8)
+
+
+@pytest.mark.parametrize('cv', [5, 'loo'])
+@pytest.mark.parametrize('time_ordered', [False, True])
+def test_scm_all_matches_scm_per_target(cv, time_ordered):
+    df = panel(2)
+    codes = list(df['code'].unique())
+    control_pool = codes[2:]
+
+    result = nm.scm_all(df, 'poll', 'code', control_pool, '2020-03-15', n_cores=1, cv=cv, time_ordered=time_ordered)
+    expected = pd.concat([nm.scm(df, 'poll', 'code', code, control_pool, '2020-03-15', cv=cv,
+                                 time_ordered=time_ordered) for code in codes])
+
+    assert sorted(result['code'].unique()) == sorted(codes)
+    pd.testing.assert_frame_equal(result.reset_index().sort_values(['code', 'date']).reset_index(drop=True),
+                                  expected.reset_index().sort_values(['code', 'date']).reset_index(drop=True),
+                                  rtol=1e-8)
+
+
+def test_scm_fit_panel_fits_each_target_on_its_complete_dates():
+    values = panel(3).pivot(index='date', columns='code', values='poll').to_numpy(copy=True)
+    values[5:9, 1] = np.nan
+    values[40, 4] = np.nan
+    before = np.arange(len(values)) < 90
+    targets = [0, 1, 2]
+    controls = [[3, 4, 5, 6], [3, 5, 6, 7], [5, 6, 7, 8]]
+
+    fits = nm.scm_fit_panel(values, before, targets, controls)
+
+    for t, c, (w, intercept, alpha) in zip(targets, controls, fits):
+        rows = before & np.isfinite(values[:, [t] + c]).all(axis=1)
+        w_expected, intercept_expected, alpha_expected = nm.scm_fit(values[rows][:, c], values[rows, t])
+        assert alpha == alpha_expected
+        np.testing.assert_allclose(w, w_expected, rtol=1e-8, atol=1e-10)
+        assert intercept == pytest.approx(intercept_expected, rel=1e-8)
+
+
+def rmspe(data, cutoff_date):
+    """Pre- and post-treatment root mean squared prediction errors of a `scm` result."""
+    before = data.index < pd.Timestamp(cutoff_date)
+    return np.sqrt(np.mean(data['effects'][before] ** 2)), np.sqrt(np.mean(data['effects'][~before] ** 2))
+
+
+@pytest.mark.parametrize('cv', [5, 'loo'])
+def test_scm_placebo_matches_scm_with_each_donor_treated(cv):
+    df = panel(4)
+    control_pool = ['S2', 'S3', 'S4', 'S5', 'S6', 'S7', 'S8', 'S9']
+    treated = ['S0', 'S1']
+
+    result = nm.scm_placebo(df, 'poll', 'code', treated, control_pool, '2020-03-15', n_cores=1, cv=cv)
+    placebos = result.attrs['placebos'].set_index(['treated', 'code'])
+
+    for target in treated:
+        units = [(target, control_pool)] + [(donor, [c for c in control_pool if c != donor]) for donor in control_pool]
+        for unit, pool in units:
+            pre, post = rmspe(nm.scm(df, 'poll', 'code', unit, pool, '2020-03-15', cv=cv), '2020-03-15')
+            row = placebos.loc[(target, unit)]
+            assert row['placebo'] == (unit != target)
+            assert row['pre_rmspe'] == pytest.approx(pre, rel=1e-9)
+            assert row['post_rmspe'] == pytest.approx(post, rel=1e-9)
+
+        ratios = placebos.loc[target, 'ratio']
+        summary = result.set_index('code').loc[target]
+        assert summary['n_placebos'] == len(control_pool)
+        assert summary['rank'] == (ratios >= ratios[target]).sum()
+        assert summary['p_value'] == pytest.approx((ratios >= ratios[target]).mean())
@@ -0,0 +1,139 @@
+import contextlib
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import normet as nm
+
+
+def shm_available():
+    """Whether `shared_folder` places its folders in /dev/shm on this machine."""
+    if not (os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK)):
+        return False
+    shm_stats = os.statvfs('/dev/shm')
+    return shm_stats.f_bavail * shm_stats.f_frsize >= 2e9
+
+
+def shm_folders():
+    return {name for name in os.listdir('/dev/shm') if name.startswith('normet_')} if shm_available() else set()
+
+
+@pytest.fixture(autouse=True)
+def no_leftover_folders():
+    """Every test must remove the shared folders it creates in /dev/shm."""
+    before = shm_folders()
+    yield
+    assert shm_folders() == before
+
+
+def test_shared_folder_is_removed_on_exit():
+    with nm.shared_folder() as folder:
+        assert os.path.isdir(folder)
+        if shm_available():
+            assert os.path.dirname(folder) == '/dev/shm'
+    assert not os.path.exists(folder)
+
+
+def test_shared_folder_is_removed_on_error(tmp_path):
+    with pytest.raises(RuntimeError):
+        with nm.shared_folder(str(tmp_path)) as folder:
+            nm.share_array(np.arange(4), folder)
+            raise RuntimeError
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.parametrize('array, dtype', [(np.random.default_rng(0).normal(size=(50, 3)), None),
+                                          (np.arange(24, dtype=np.int64).reshape(6, 4), None),
+                                          (np.asfortranarray(np.random.default_rng(1).normal(size=(20, 5))), None),
+                                          (np.random.default_rng(2).normal(size=(50, 3)), np.float32)])
+def test_share_array_round_trip(array, dtype):
+    with nm.shared_folder() as folder:
+        handle = nm.share_array(array, folder, dtype=dtype)
+        shared = nm.load_shared(handle)
+
+        assert isinstance(shared, np.memmap)
+        assert not shared.flags.writeable
+        assert shared.dtype == (array.dtype if dtype is None else dtype)
+        np.testing.assert_array_equal(shared, array.astype(shared.dtype))
+        del shared
+    assert not os.path.exists(handle['path'])
+
+
+def test_share_frame_round_trip():
+    df = pd.DataFrame({'temp': [1.5, 2.5, np.nan, 4.0], 'wd': [10, 20, 30, 40],
+                       'site': pd.Categorical(['a', 'b', 'a', None])})
+
+    with nm.shared_folder() as folder:
+        shared = nm.load_shared(nm.share_frame(df, ['temp', 'wd', 'site'], folder))
+
+    pd.testing.assert_frame_equal(shared, df, check_dtype=False)
+
+
+def test_load_shared_returns_other_objects_unchanged():
+    array = np.arange(3)
+
+    assert nm.load_shared(array) is array
+    assert nm.load_shared({'columns': ['a']}) == {'columns': ['a']}
+
+
+@pytest.fixture
+def empty_model_cache():
+    nm.clear_model_cache()
+    yield
+    nm.clear_model_cache()
+
+
+def test_model_session_round_trip(trained, empty_model_cache):
+    df, model = trained('lgbm')
+
+    with nm.model_session(model) as session:
+        assert os.path.isfile(session['model_path'])
+        assert nm.load_model(session) is model
+
+        # A fresh process has to load the model from the pickle file
+        nm.clear_model_cache()
+        loaded = nm.load_model(session)
+        assert loaded is not model
+        assert nm.load_model(session) is loaded
+        np.testing.assert_array_equal(loaded.predict(df[model.feature_names_in_]),
+                                      model.predict(df[model.feature_names_in_]))
+        pd.testing.assert_frame_equal(nm.modStats(df, session), nm.modStats(df, model))
+
+
+def test_model_session_removes_the_model_file_on_exit(trained, tmp_path, empty_model_cache):
+    _, model = trained('lgbm')
+
+    with nm.model_session(model, temp_folder=str(tmp_path)) as session:
+        assert os.listdir(tmp_path) == [os.path.basename(os.path.dirname(session['model_path']))]
+    assert os.listdir(tmp_path) == []
+
+    with pytest.raises(RuntimeError):
+        with nm.model_session(model, temp_folder=str(tmp_path)):
+            raise RuntimeError
+    assert os.listdir(tmp_path) == []
+
+
+def test_nested_model_session_yields_the_enclosing_handle(trained, tmp_path, empty_model_cache):
+    _, model = trained('lgbm')
+
+    with nm.model_session(model, temp_folder=str(tmp_path)) as session:
+        with nm.model_session(session) as inner:
+            assert inner is session
+        # Leaving the inner session must not remove the model of the enclosing one
+        assert os.path.isfile(session['model_path'])
+    assert not os.path.exists(session['model_path'])
+
+
+def test_model_session_evicts_the_least_recently_used_models(trained, empty_model_cache):
+    _, model = trained('lgbm')
+    models = [model, *[pd.Series(range(i)) for i in range(1, 4)]]
+
+    with contextlib.ExitStack() as stack:
+        sessions = [stack.enter_context(nm.model_session(m, max_models=2)) for m in models]
+
+        assert nm.load_model(sessions[3]) is models[3]
+        assert nm.load_model(sessions[2]) is models[2]
+        # The first model was evicted and comes back from its file
+        assert nm.load_model(sessions[0]) is not model
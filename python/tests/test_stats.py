@@ -0,0 +1,115 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import normet as nm
+
+
+STATISTICS = ['n', 'FAC2', 'MB', 'MGE', 'NMB', 'NMGE', 'RMSE', 'r', 'COE', 'IOA', 'R2']
+
+
+@pytest.fixture(scope='module')
+def pairs():
+    """Observations and model predictions with missing values in both, in three sites."""
+    rng = np.random.default_rng(0)
+    obs = rng.gamma(2.0, 10.0, size=3000)
+    df = pd.DataFrame({'obs': obs, 'mod': obs * rng.normal(1.0, 0.3, size=obs.size) + rng.normal(0, 5, size=obs.size),
+                       'site': rng.choice(['A', 'B', 'C'], size=obs.size)})
+    df.loc[df.index[::17], 'obs'] = np.nan
+    df.loc[df.index[::23], 'mod'] = np.nan
+    return df
+
+
+def reference(df, statistic):
+    """Value of a statistic from its retained single-statistic function."""
+    value = getattr(nm, statistic)(df, 'mod', 'obs')
+    return value[0] if statistic == 'r' else value
+
+
+@pytest.mark.parametrize('statistic', STATISTICS)
+def test_stats_matches_single_statistic_functions(pairs, statistic):
+    result = nm.Stats(pairs, 'mod', 'obs', statistic=[statistic])
+
+    assert result[statistic].iloc[0] == pytest.approx(reference(pairs, statistic), rel=1e-12, abs=1e-14)
+
+
+@pytest.mark.parametrize('statistic', STATISTICS)
+def test_grouped_stats_match_single_statistic_functions(pairs, statistic):
+    result = nm.Stats(pairs, 'mod', 'obs', statistic=[statistic], groupby='site').set_index('site')
+
+    for site, group in pairs.groupby('site'):
+        assert result.loc[site, statistic] == pytest.approx(reference(group, statistic), rel=1e-12, abs=1e-14)
+
+
+def test_stats_kernel_p_value_matches_pearsonr(pairs):
+    res = nm.stats_kernel(pairs['mod'].to_numpy(), pairs['obs'].to_numpy(), statistic=['r'])
+
+    assert res['p_value'][0] == pytest.approx(nm.r(pairs, 'mod', 'obs')[1], rel=1e-8)
+
+
+def test_stats_skips_missing_group_keys(pairs):
+    df = pairs.assign(site=pairs['site'].where(pairs.index % 7 != 0))
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        result = nm.Stats(df, 'mod', 'obs', groupby='site')
+    expected = nm.Stats(df.dropna(subset=['site']), 'mod', 'obs', groupby='site')
+
+    pd.testing.assert_frame_equal(result, expected)
+
+
+@pytest.mark.parametrize('set_name', ['training', 'testing', 'all'])
+def test_modstats_matches_single_statistic_functions(trained, set_name):
+    df, model = trained('lgbm')
+    rows = df if set_name == 'all' else df[df['set'] == set_name]
+    pairs = pd.DataFrame({'mod': model.predict(rows[model.feature_names_in_]), 'obs': rows['value'].to_numpy()})
+
+    result = nm.modStats(df, model).set_index('set').loc[set_name]
+
+    for statistic in STATISTICS:
+        assert result[statistic] == pytest.approx(reference(pairs, statistic), rel=1e-9, abs=1e-12)
+
+
+def test_bootstrap_is_reproducible(pairs):
+    first = nm.bootstrap_stats(pairs['mod'], pairs['obs'], n_boot=200, seed=11)
+    second = nm.bootstrap_stats(pairs['mod'], pairs['obs'], n_boot=200, seed=11)
+    other = nm.bootstrap_stats(pairs['mod'], pairs['obs'], n_boot=200, seed=12)
+
+    pd.testing.assert_frame_equal(first, second)
+    assert not first.equals(other)
+
+
+def test_bootstrap_intervals_contain_the_point_estimate(pairs):
+    point = nm.Stats(pairs, 'mod', 'obs').iloc[0]
+    bounds = nm.bootstrap_stats(pairs['mod'], pairs['obs'], n_boot=500).iloc[0]
+
+    for statistic in STATISTICS[1:]:
+        assert bounds[f'{statistic}_lower'] < point[statistic] < bounds[f'{statistic}_upper']
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 64, 1000])
+def test_bootstrap_does_not_depend_on_the_chunk_size(pairs, chunk_size):
+    # An odd number of rows, so that no draw of the resample indices is a multiple of two
+    pairs = pairs.iloc[:-1]
+
+    expected = nm.bootstrap_stats(pairs['mod'], pairs['obs'], n_boot=100)
+    result = nm.bootstrap_stats(pairs['mod'], pairs['obs'], n_boot=100, chunk_size=chunk_size)
+
+    pd.testing.assert_frame_equal(result, expected, rtol=1e-12)
+
+
+def test_modstats_bootstrap_adds_intervals_of_every_set(trained):
+    df, model = trained('lgbm')
+
+    result = nm.modStats(df, model, bootstrap=200)
+    expected = nm.modStats(df, model)
+
+    pd.testing.assert_frame_equal(result[expected.columns], expected)
+    assert ((result['RMSE_lower'] < result['RMSE']) & (result['RMSE'] < result['RMSE_upper'])).all()
+    for set_name in ['training', 'testing']:
+        rows = df[df['set'] == set_name]
+        bounds = nm.bootstrap_stats(model.predict(rows[model.feature_names_in_]), rows['value'], n_boot=200)
+        pd.testing.assert_frame_equal(result.loc[result['set'] == set_name, bounds.columns].reset_index(drop=True),
+                                      bounds, rtol=1e-9)
@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+import normet as nm
+from conftest import FEATURES
+
+
+@pytest.mark.parametrize('engine', ['numpy', 'numpy32'])
+@pytest.mark.parametrize('estimator', ['lgbm', 'xgboost', 'rf', 'extra_tree'])
+def test_flattened_trees_match_model_predict(trained, estimator, engine):
+    df, model = trained(estimator)
+    X = df[FEATURES].copy()
+    X.loc[X.index[::7], 'ws'] = np.nan
+
+    expected = model.predict(X)
+    predicted = nm.model_predict(model, X, engine=engine)
+
+    np.testing.assert_allclose(predicted, expected, rtol=1e-5, atol=1e-3)
+
+
+def test_float32_thresholds_keep_lightgbm_branches(trained):
+    df, model = trained('lgbm')
+    tables = nm.flatten_trees(model.model.estimator, float32=True)
+    threshold = nm.flatten_trees(model.model.estimator)['threshold']
+    split = tables['left'] != np.arange(len(tables['left']))
+
+    # The float64 values just below a `<=` threshold go left, and must still do so once cast to float32
+    below = np.nextafter(threshold[split], -np.inf).astype(np.float32)
+    assert (below <= tables['threshold'][split]).all()
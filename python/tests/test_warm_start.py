@@ -0,0 +1,107 @@
+import sys
+
+import pytest
+
+import normet as nm
+from conftest import FEATURES
+
+
+CONFIG = {'time_budget': 5, 'max_iter': 4, 'estimator_list': ['lgbm'], 'n_jobs': 1, 'verbose': 0}
+
+
+@pytest.fixture
+def fit_calls(monkeypatch):
+    """Records the keyword arguments of every `AutoML.fit` call."""
+    calls = []
+    automl = sys.modules['normet.normet'].AutoML
+    fit = automl.fit
+
+    def spy(self, *args, **kwargs):
+        calls.append(kwargs)
+        return fit(self, *args, **kwargs)
+
+    monkeypatch.setattr(automl, 'fit', spy)
+    return calls
+
+
+@pytest.fixture
+def train_calls(monkeypatch):
+    """Records the warm start of every `train_model` call and the best config of the trained model."""
+    calls = []
+    module = sys.modules['normet.normet']
+    train_model = module.train_model
+
+    def spy(*args, **kwargs):
+        model = train_model(*args, **kwargs)
+        calls.append({'warm_start': kwargs.get('warm_start'), 'fixed_config': kwargs.get('fixed_config'),
+                      'best_estimator': model.best_estimator, 'best_config': model.best_config})
+        return model
+
+    monkeypatch.setattr(module, 'train_model', spy)
+    return calls
+
+
+def test_warm_start_passes_the_best_configs_as_starting_points(trained, fit_calls):
+    df, model = trained('lgbm')
+    fit_calls.clear()
+    configs = {'lgbm': model.best_config, 'rf': {'n_estimators': 10}}
+
+    nm.train_model(df, variables=FEATURES, model_config=CONFIG, verbose=False, warm_start=model)
+    nm.train_model(df, variables=FEATURES, model_config=CONFIG, verbose=False, warm_start=configs)
+
+    assert fit_calls[0]['starting_points'] == {'lgbm': model.best_config}
+    # Configs of estimators outside the search are dropped
+    assert fit_calls[1]['starting_points'] == {'lgbm': model.best_config}
+    assert fit_calls[0]['max_iter'] == CONFIG['max_iter']
+
+
+def test_fixed_config_fits_the_best_config_once(trained, fit_calls):
+    df, model = trained('lgbm')
+    fit_calls.clear()
+
+    fixed = nm.train_model(df, variables=FEATURES, model_config={**CONFIG, 'estimator_list': ['lgbm', 'rf']},
+                           verbose=False, warm_start=model, fixed_config=True)
+
+    assert fit_calls[0]['max_iter'] == 1
+    assert fit_calls[0]['estimator_list'] == ['lgbm']
+    assert fixed.best_estimator == 'lgbm'
+    assert fixed.best_config == model.best_config
+
+
+def test_fixed_config_requires_a_warm_start(trained):
+    df, _ = trained('lgbm')
+
+    with pytest.raises(ValueError):
+        nm.train_model(df, variables=FEATURES, model_config=CONFIG, verbose=False, fixed_config=True)
+    with pytest.raises(ValueError):
+        nm.train_model(df, variables=FEATURES, model_config=CONFIG, verbose=False, fixed_config=True,
+                       warm_start={'lgbm': {'n_estimators': 4}, 'rf': {'n_estimators': 4}})
+
+
+def test_do_all_unc_fixed_config_reuses_the_first_best_config(my1, train_calls):
+    df_dew, mod_stats = nm.do_all_unc(df=my1.iloc[:24 * 40], value='PM2.5', feature_names=FEATURES,
+                                      model_config=CONFIG, n_samples=2, n_models=3, n_cores=1,
+                                      warm_start=True, fixed_config=True, verbose=False)
+
+    first, *others = train_calls
+    assert first['warm_start'] is None and not first['fixed_config']
+    for call in others:
+        assert call['warm_start'] == {first['best_estimator']: first['best_config']}
+        assert call['fixed_config']
+        assert call['best_estimator'] == first['best_estimator']
+        assert call['best_config'] == first['best_config']
+    assert len(others) == 2
+    assert list(mod_stats.attrs['timing']['best_estimator']) == [first['best_estimator']] * 3
+
+
+def test_do_all_unc_warm_starts_every_model_from_a_given_model(my1, trained, train_calls):
+    _, model = trained('lgbm')
+    train_calls.clear()
+
+    nm.do_all_unc(df=my1.iloc[:24 * 40], value='PM2.5', feature_names=FEATURES, model_config=CONFIG, n_samples=2,
+                  n_models=2, n_cores=1, warm_start=model, verbose=False)
+
+    assert len(train_calls) == 2
+    for call in train_calls:
+        assert call['warm_start'] == model.best_config_per_estimator
+        assert not call['fixed_config']